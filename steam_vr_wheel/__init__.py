@@ -137,19 +137,72 @@ DEFAULT_CONFIG = OrderedDict([
     ('j_r_up_button', True),
     ('j_r_down_button', True),
     ('axis_deadzone', 20),
+    # Joystick as POV hat: "Off", "Continuous", "8-way" or "4-way"
+    # vJoy POVs must be set up as continuous, or as discrete for "4-way"
+    ('j_l_pov', "Off"),
+    ('j_r_pov', "Off"),
+
+    ## Response curves
+    # deadzone, saturation and smoothing in percent; bezier is [x1, y1, x2, y2] and overrides gamma
+    # Joystick deadzone follows axis_deadzone unless set here
+    ('axis_curve_joystick', {"saturation": 100, "gamma": 1.0, "bezier": [], "smoothing": 0}),
+    ('axis_curve_trigger', {"deadzone": 0, "saturation": 100, "gamma": 1.0, "bezier": [], "smoothing": 0}),
+    ('axis_curve_steering', {"deadzone": 0, "saturation": 100, "gamma": 1.0, "bezier": [], "smoothing": 0}),
 
     # Wheel
     ('wheel_center', [0, -0.4, -0.35]),
     ('wheel_size', 0.48),
     ('wheel_grabbed_by_grip', True),
     ('wheel_grabbed_by_grip_toggle', True),
+    # Frames of each hand's grip the wheel angle is fitted over, more is steadier when hands shake
+    ('wheel_grip_samples', 8),
     ('wheel_degrees', 1440),
+    # Degrees of wheel turn before the lock over which it is slowed down and pushed back
+    ('wheel_soft_lock', 15),
     ('wheel_centerforce', 100),
     ('wheel_alpha', 100),
     ('wheel_pitch', 0),
     ('wheel_transparent_center', False),
+    # Wheel physics steps per second, independent of the update rate
+    ('wheel_physics_hz', 240),
+    # "Kinematic": the hands set the wheel angle; "Torque": the hands pull the rim through springs
+    # and it is turned by torques as in wheel_torque, stepped at 500 Hz or more
+    ('wheel_physics_model', "Kinematic"),
+    # inertia in kg m^2, damping in N m per rad/s, friction (Coulomb) in N m,
+    # hand_stiffness in N m per rad and hand_damping in N m per rad/s between hands and rim,
+    # ffb_torque in N m at full FFB force, centering in N m per rad without FFB;
+    # both are scaled by wheel_centerforce in percent
+    ('wheel_torque', {"inertia": 0.1, "damping": 0.3, "friction": 0.02, "hand_stiffness": 40.0,
+                      "hand_damping": 2.0, "ffb_torque": 20.0, "centering": 0.5}),
+    # Steering ratio and centering that follow the vehicle speed from game telemetry:
+    # "SCS" (ETS2/ATS telemetry plugin), "AC" (Assetto Corsa UDP server) or "Off"
+    ('wheel_speed_source', "Off"),
+    # [km/h, percent] points, linear in between: steering multiplies the wheel's turn of the axis,
+    # centering multiplies wheel_centerforce
+    ('wheel_speed_steering', [[0, 150], [30, 120], [80, 100], [130, 80]]),
+    ('wheel_speed_centering', [[0, 40], [30, 80], [80, 100], [130, 130]]),
     ('wheel_ffb', True),
     ('wheel_ffb_haptic', False),
+    # Tell road texture from impacts for FFB haptics, impacts get a stronger pulse
+    ('wheel_ffb_haptic_bands', False),
+    # FFB force smoothing: "EMA", "Biquad" or "Off", with its time constant in milliseconds
+    # (the biquad cutoff is 1 / (2 pi time constant)); 47 ms matches the older per frame smoothing at 60 Hz
+    ('wheel_ffb_filter', "EMA"),
+    ('wheel_ffb_filter_ms', 47.0),
+    # FFB output shaping, the profile named by wheel_ffb_profile is used
+    # gain, deadband, lift (minimum force) and soft_clip (knee, 100 is a hard clip) in percent;
+    # gamma and bezier as in the response curves; keys left out take their value in Default
+    ('wheel_ffb_profile', "Default"),
+    ('wheel_ffb_profiles', {
+        "Default": {"gain": 100, "deadband": 0, "lift": 0, "gamma": 1.0, "bezier": [], "soft_clip": 100},
+        "Strong": {"gain": 60, "deadband": 0, "lift": 0, "gamma": 1.0, "bezier": [], "soft_clip": 80},
+        "Weak": {"gain": 180, "deadband": 2, "lift": 8, "gamma": 0.8, "bezier": [], "soft_clip": 80},
+    }),
+    # Seconds between FFB statistics lines printed to the console, 0 disables them
+    ('wheel_ffb_stats_interval', 0.0),
+    # File name in the config directory to capture raw FFB packets to, empty disables it
+    # Replay a capture with: python -m steam_vr_wheel.bench replay <path>
+    ('wheel_ffb_capture', ""),
 
     ## Shifter
     ('shifter_center', [0.25, -0.57, -0.15]),
@@ -158,6 +211,22 @@ DEFAULT_CONFIG = OrderedDict([
     ('shifter_scale', 100),
     ('shifter_sequential', False),
     ('shifter_reverse_orientation', "Bottom Left"),
+    # Gate layout, the one named by shifter_layout is used and Sequential in sequential mode
+    # gates: [top, bottom] vJoy button of each column from left to right, null for no gate;
+    # neutral: index of the column the stick rests in; locked: columns at the left end behind
+    # the reverse lock, moved by shifter_reverse_orientation; spring: back to neutral when let go;
+    # image: slot texture in the media directory, drawn from the gates when left out
+    # Buttons 49 and 50 are the splitter and range toggles on the knob
+    ('shifter_layout', "6+R"),
+    ('shifter_layouts', {
+        "6+R": {"gates": [[None, 51], [43, 44], [45, 46], [47, 48]], "neutral": 2, "locked": 1,
+                "image": "h_shifter_slot_7.png"},
+        "8+R": {"gates": [[None, 51], [43, 44], [45, 46], [47, 48], [52, 53]], "neutral": 2, "locked": 1},
+        "Dog-leg 5": {"gates": [[51, 43], [44, 45], [46, 47]], "neutral": 1, "locked": 0},
+        "18-speed": {"gates": [[51, 54], [43, 44], [45, 46]], "neutral": 1, "locked": 0},
+        "Sequential": {"gates": [[45, 46]], "neutral": 0, "locked": 0, "spring": True,
+                       "image": "h_shifter_slot_seq.png"},
+    }),
 
     ## Bike
     ('bike_center', [0, -0.4, -0.35]),
@@ -320,4 +389,4 @@ def make_property(key):
     return property(getter, setter)
 
 for key in DEFAULT_CONFIG.keys():
-    setattr(PadConfig, key, make_property(key))
\ No newline at end of file
+    setattr(PadConfig, key, make_property(key))
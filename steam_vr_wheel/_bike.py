@@ -15,6 +15,8 @@ import struct
 from . import check_result, rotation_matrix, bezier_curve, Point, MEDIA_DIR, IMAGE_DATA
 from steam_vr_wheel.wheel import wheel_main_done
 from steam_vr_wheel._virtualpad import VirtualPad, HandsImage
+from steam_vr_wheel._collision import CollisionWorld, Box
+from steam_vr_wheel.util import AxisCurve, vjoy_centered
 from steam_vr_wheel.pyvjoy.vjoydevice import HID_USAGE_RZ, HID_USAGE_X
 from steam_vr_wheel.i18n import _I
 
@@ -249,6 +251,15 @@ class Bike(VirtualPad):
         self.size_height = size / 1800 * 735
 
         self.base_pitch = 20
+
+        # Handlebar bounds, 10cm deep, pitched as the handlebar is at rest
+        self.collision = CollisionWorld()
+        self._handlebar_collider = Box(size / 2, self.size_height / 2, 0.10)
+        self._pitch_cos = cos(self.base_pitch * pi / 180)
+        self._pitch_sin = sin(self.base_pitch * pi / 180)
+        self._handlebar_collider.place(Point(*self.center), self._pitch_cos, self._pitch_sin)
+        self.collision.add('handlebar', self._handlebar_collider)
+
         self._reset_handlebar()
         self.handlebar_image.move_rotate(pitch_yaw_roll=[self.pitch, self.yaw, 0])
         self.lean = 0
@@ -260,6 +271,7 @@ class Bike(VirtualPad):
 
         self.max_steer = self.config.bike_max_steer
         self.max_lean = self.config.bike_max_lean
+        self._lean_curve = AxisCurve.from_config(self.config.axis_curve_steering, out=vjoy_centered)
         self.angle_deadzone = self.config.bike_angle_deadzone
         self.handlebar_height = self.config.bike_handlebar_height / 100.0
         self.handlebar_hand_offset = size/2 - 0.19 # offset of hand from the center; where the hand is placed on
@@ -544,13 +556,13 @@ class Bike(VirtualPad):
         if self.config.bike_use_ac_server:
             lean_axis = self.AC_CAL.to_axis(lean_axis, self.ac_speed)
         
-        axisX = int((lean_axis+1)/2.0 * 0x8000)
-        self.set_axis(HID_USAGE_X, axisX)
+        self.set_axis(HID_USAGE_X, self._lean_curve.sample(lean_axis))
 
         self.render(hmd)
 
     def move_delta(self, d):
         self.center = np.array([0, self.center[1] + d[1], self.center[2] + d[2]])
+        self._handlebar_collider.place(Point(*self.center), self._pitch_cos, self._pitch_sin)
         #self.config.bike_center = self.center.copy()
         self.handlebar_image.move_rotate(pos=self.center, size=self.size)
 
@@ -602,6 +614,8 @@ class Bike(VirtualPad):
             r_d = [right_ctr.x-self._edit_last_r_pos[0], right_ctr.y-self._edit_last_r_pos[1], right_ctr.z-self._edit_last_r_pos[2]]
             self.move_delta(r_d)
 
+        elif 'handlebar' in self.collision.query_hands(left_ctr, right_ctr):
+            self.handlebar_image.set_color([1, 1, 0])
         else:
             self.handlebar_image.set_color([0, 1, 0])
 
@@ -0,0 +1,157 @@
+from math import sqrt
+
+
+class Shape:
+    """
+    Collision shape; distance() is negative inside, in meters
+
+    Shapes keep an axis aligned bounding box in world space, refreshed when they
+    are moved, so that CollisionWorld can skip them with six comparisons
+    """
+
+    def __init__(self):
+        self.aabb = (0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+    def distance(self, x, y, z):
+        raise NotImplementedError
+
+    def contains(self, point):
+        x, y, z = point.x, point.y, point.z
+        b = self.aabb
+        if x < b[0] or y < b[1] or z < b[2] or x > b[3] or y > b[4] or z > b[5]:
+            return False
+        return self.distance(x, y, z) <= 0
+
+
+class Capsule(Shape):
+    # Segment a to b in world space with a radius, like the shifter stick
+
+    def __init__(self, radius, a=(0.0, 0.0, 0.0), b=(0.0, 0.0, 0.0)):
+        super().__init__()
+        self.radius = radius
+        self.set(a, b)
+
+    def set(self, a, b):
+        self.a = a
+        self.ab = (b[0] - a[0], b[1] - a[1], b[2] - a[2])
+        self._ab2 = self.ab[0]**2 + self.ab[1]**2 + self.ab[2]**2
+        r = self.radius
+        self.aabb = (min(a[0], b[0]) - r, min(a[1], b[1]) - r, min(a[2], b[2]) - r,
+                     max(a[0], b[0]) + r, max(a[1], b[1]) + r, max(a[2], b[2]) + r)
+
+    def distance(self, x, y, z):
+        ax, ay, az = self.a
+        abx, aby, abz = self.ab
+        px, py, pz = x - ax, y - ay, z - az
+
+        l = 0.0
+        if self._ab2 > 0:
+            l = (px*abx + py*aby + pz*abz) / self._ab2
+            l = max(0.0, min(1.0, l))
+        dx, dy, dz = px - abx*l, py - aby*l, pz - abz*l
+        return sqrt(dx*dx + dy*dy + dz*dz) - self.radius
+
+
+class LocalShape(Shape):
+    """
+    Shape in a local frame at center, turned about the x axis from world space
+
+    c, s : cosine and sine taking world space into the local frame, as rotate_about_x
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.center = (0.0, 0.0, 0.0)
+        self.c, self.s = 1.0, 0.0
+
+    def place(self, center, c=1.0, s=0.0):
+        self.center = (center.x, center.y, center.z)
+        self.c, self.s = c, s
+        # A sphere around the shape bounds it whatever the rotation
+        r = self.bounding_radius()
+        cx, cy, cz = self.center
+        self.aabb = (cx - r, cy - r, cz - r, cx + r, cy + r, cz + r)
+
+    def bounding_radius(self):
+        raise NotImplementedError
+
+    def distance(self, x, y, z):
+        cx, cy, cz = self.center
+        dy, dz = y - cy, z - cz
+        return self.local_distance(x - cx, self.c*dy - self.s*dz, self.s*dy + self.c*dz)
+
+    def local_distance(self, x, y, z):
+        raise NotImplementedError
+
+
+class TorusBand(LocalShape):
+    # Ring between inner and outer radius in the local xy plane, half_width thick each side, like the wheel rim
+
+    def __init__(self, inner, outer, half_width):
+        super().__init__()
+        self.inner = inner
+        self.outer = outer
+        self.half_width = half_width
+
+    def bounding_radius(self):
+        return sqrt(self.outer**2 + self.half_width**2)
+
+    def local_distance(self, x, y, z):
+        r = sqrt(x*x + y*y)
+        return max(self.inner - r, r - self.outer, abs(z) - self.half_width)
+
+
+class Box(LocalShape):
+    # Box with half extents hx, hy, hz along the local axes
+
+    def __init__(self, hx, hy, hz):
+        super().__init__()
+        self.half = (hx, hy, hz)
+
+    def bounding_radius(self):
+        hx, hy, hz = self.half
+        return sqrt(hx*hx + hy*hy + hz*hz)
+
+    def local_distance(self, x, y, z):
+        hx, hy, hz = self.half
+        return max(abs(x) - hx, abs(y) - hy, abs(z) - hz)
+
+
+class CollisionWorld:
+    """
+    Named shapes of the grabbable objects
+
+    Objects register their shape once and move it themselves; query() tests a point
+    against the bounding boxes first, so an object away from the hand costs a few
+    comparisons. Of the shapes containing the point the lowest priority wins, then
+    the nearest one
+    """
+
+    def __init__(self):
+        self._entries = []
+
+    def add(self, name, shape, priority=0):
+        self.remove(name)
+        self._entries.append((priority, name, shape))
+        self._entries.sort(key=lambda e: e[0])
+
+    def remove(self, name):
+        self._entries = [e for e in self._entries if e[1] != name]
+
+    def query(self, point):
+        # Name of the object at point, None when there is none
+        x, y, z = point.x, point.y, point.z
+        hit, hit_priority, hit_distance = None, None, 0.0
+        for priority, name, shape in self._entries:
+            if hit is not None and priority > hit_priority:
+                break
+            b = shape.aabb
+            if x < b[0] or y < b[1] or z < b[2] or x > b[3] or y > b[4] or z > b[5]:
+                continue
+            d = shape.distance(x, y, z)
+            if d <= 0 and (hit is None or d < hit_distance):
+                hit, hit_priority, hit_distance = name, priority, d
+        return hit
+
+    def query_hands(self, left_ctr, right_ctr):
+        return self.query(left_ctr), self.query(right_ctr)
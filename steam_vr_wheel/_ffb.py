@@ -0,0 +1,676 @@
+import heapq
+import struct
+import time
+from ctypes import addressof, memmove, sizeof, string_at
+from math import cos, exp, inf, isfinite, pi, sin, sqrt
+
+import numpy as np
+
+from steam_vr_wheel import DEFAULT_CONFIG
+from steam_vr_wheel.pyvjoy import FFBPType, FFBOP, FFB_CTRL, FFBEType
+from steam_vr_wheel.pyvjoy._sdk import FFB_DATA
+from steam_vr_wheel.util import AxisCurve, CURVE_LUT_SIZE
+
+
+# Effect block indices go from 1 up to this
+FFB_MAX_EFFECTS = 100
+
+PERIODIC_TYPES = (FFBEType.ET_SQR, FFBEType.ET_SINE, FFBEType.ET_TRNGL, FFBEType.ET_STUP, FFBEType.ET_STDN)
+CONDITION_TYPES = (FFBEType.ET_SPRNG, FFBEType.ET_DMPR, FFBEType.ET_INRT, FFBEType.ET_FRCTN)
+
+# Wheel speed at which friction reaches its full coefficient, below it friction is linear
+# so that a wheel at rest does not chatter
+FRICTION_VELOCITY = 0.05
+
+
+class FfbEffectEngine:
+    """
+    DirectInput style effect playback
+
+    Effect parameters live in typed arrays indexed by effect block index, one
+    slot per block of the vJoy pool, filled in by handle() as packets arrive.
+    Effects with a finite run are also kept in a min-heap of end times so that
+    expiring them does not scan the table. evaluate() computes the force of
+    every playing effect in one vectorized pass; call it once per physics step
+
+    Forces are normalized so that a full scale effect (10000) is 1.0
+
+    Condition effects act on the wheel state passed to evaluate(), in vJoy axis
+    units where full lock is 1: spring on the position, damper and friction on
+    the velocity (per second), inertia on the acceleration (per second squared)
+    """
+
+    def __init__(self, size=FFB_MAX_EFFECTS + 1):
+        self.size = size
+        self.paused = False
+        self.gain = 1.0 # device gain
+        self._pause_start = 0.0
+
+        self.playing = np.zeros(size, dtype=bool)
+        self.solo = np.zeros(size, dtype=bool)
+
+        # Effect report
+        self.etype = np.zeros(size, dtype=np.int16)
+        self.duration = np.full(size, inf)   # seconds per loop
+        self.effect_gain = np.ones(size)
+
+        # Effect operation
+        self.start = np.zeros(size)          # perf_counter seconds
+        self.loops = np.ones(size)
+
+        # Constant
+        self.magnitude = np.zeros(size)
+
+        # Ramp
+        self.ramp_start = np.zeros(size)
+        self.ramp_end = np.zeros(size)
+
+        # Periodic
+        self.period_magnitude = np.zeros(size)
+        self.period_offset = np.zeros(size)
+        self.period_phase = np.zeros(size)   # 0-1 of a cycle
+        self.period = np.ones(size)          # seconds
+
+        # Envelope
+        self.envelope = np.zeros(size, dtype=bool)
+        self.attack_level = np.zeros(size)
+        self.attack_time = np.zeros(size)
+        self.fade_level = np.zeros(size)
+        self.fade_time = np.zeros(size)
+
+        # Condition, X axis only as the wheel has no other
+        self.cond_center = np.zeros(size)
+        self.cond_deadband = np.zeros(size)
+        self.cond_pos_coeff = np.zeros(size)
+        self.cond_neg_coeff = np.zeros(size)
+        self.cond_pos_sat = np.ones(size)
+        self.cond_neg_sat = np.ones(size)
+
+        self._per_effect = [v for v in self.__dict__.values() if isinstance(v, np.ndarray)]
+        self._defaults = [v.copy() for v in self._per_effect]
+
+        # (end time, ebi, start time) of started effects that end on their own
+        self._expiry = []
+
+    def clear(self, ebi=None):
+        # Back to defaults, for one effect block or all of them
+        for arr, default in zip(self._per_effect, self._defaults):
+            if ebi is None:
+                arr[:] = default
+            else:
+                arr[ebi] = default[ebi]
+        if ebi is None:
+            self._expiry.clear()
+
+    def _schedule(self, ebi):
+        end = self.start[ebi] + self.duration[ebi] * self.loops[ebi]
+        if isfinite(end):
+            heapq.heappush(self._expiry, (end, ebi, self.start[ebi]))
+
+    def _expire(self, now):
+        heap = self._expiry
+        while heap and heap[0][0] <= now:
+            end, ebi, start = heapq.heappop(heap)
+            # Entries left behind by a restart or a new duration no longer match
+            if self.playing[ebi] and self.start[ebi] == start and \
+                    start + self.duration[ebi] * self.loops[ebi] == end:
+                self.playing[ebi] = False
+
+    def handle(self, packet, now):
+        # Returns False for packets that are not used
+        typ = packet.Type
+        ebi = packet.EBI
+        if ebi is not None and not 0 < ebi < self.size:
+            return False
+
+        if typ == FFBPType.PT_EFFREP:
+            self.etype[ebi] = packet.EffectType
+            self.duration[ebi] = inf if packet.Duration == 0xFFFF else packet.Duration / 1000.0
+            self.effect_gain[ebi] = packet.EffGain / 0xFF
+            if self.playing[ebi]:
+                self._schedule(ebi)
+
+        elif typ == FFBPType.PT_CONSTREP:
+            self.magnitude[ebi] = packet.Magnitude / 10000.0
+            # Constant force used to be played without waiting for its report
+            if self.etype[ebi] == FFBEType.ET_NONE:
+                self.etype[ebi] = FFBEType.ET_CONST
+
+        elif typ == FFBPType.PT_RAMPREP:
+            self.ramp_start[ebi] = packet.Start / 10000.0
+            self.ramp_end[ebi] = packet.End / 10000.0
+
+        elif typ == FFBPType.PT_PRIDREP:
+            self.period_magnitude[ebi] = packet.Magnitude / 10000.0
+            self.period_offset[ebi] = packet.Offset / 10000.0
+            self.period_phase[ebi] = packet.Phase / 36000.0
+            self.period[ebi] = max(1, packet.Period) / 1000.0
+
+        elif typ == FFBPType.PT_CONDREP:
+            if packet.isY:
+                return False
+            self.cond_center[ebi] = packet.CenterPointOffset / 10000.0
+            self.cond_deadband[ebi] = packet.DeadBand / 10000.0
+            self.cond_pos_coeff[ebi] = packet.PosCoeff / 10000.0
+            self.cond_neg_coeff[ebi] = packet.NegCoeff / 10000.0
+            self.cond_pos_sat[ebi] = packet.PosSatur / 10000.0
+            self.cond_neg_sat[ebi] = packet.NegSatur / 10000.0
+
+        elif typ == FFBPType.PT_ENVREP:
+            self.envelope[ebi] = True
+            self.attack_level[ebi] = packet.AttackLevel / 10000.0
+            self.attack_time[ebi] = packet.AttackTime / 1000.0
+            self.fade_level[ebi] = packet.FadeLevel / 10000.0
+            self.fade_time[ebi] = packet.FadeTime / 1000.0
+
+        elif typ == FFBPType.PT_EFOPREP:
+            op = packet.EffectOp
+            if op == FFBOP.EFF_START or op == FFBOP.EFF_SOLO:
+                if op == FFBOP.EFF_SOLO:
+                    self.playing[:] = False
+                self.playing[ebi] = True
+                self.solo[ebi] = op == FFBOP.EFF_SOLO
+                self.start[ebi] = now
+                # 0 and 0xFF both mean play until stopped
+                lc = packet.LoopCount
+                self.loops[ebi] = inf if lc == 0 or lc == 0xFF else lc
+                self._schedule(ebi)
+            elif op == FFBOP.EFF_STOP:
+                self.playing[ebi] = False
+            else:
+                return False
+
+        elif typ == FFBPType.PT_BLKFRREP:
+            self.clear(ebi)
+
+        elif typ == FFBPType.PT_GAINREP:
+            self.gain = packet.Gain / 0xFF
+
+        elif typ == FFBPType.PT_CTRLREP:
+            ctrl = packet.DevCtrl
+            if ctrl == FFB_CTRL.CTRL_STOPALL:
+                self.playing[:] = False
+            elif ctrl == FFB_CTRL.CTRL_DEVRST:
+                self.clear()
+                self.paused = False
+            elif ctrl == FFB_CTRL.CTRL_DEVPAUSE:
+                if not self.paused:
+                    self.paused = True
+                    self._pause_start = now
+            elif ctrl == FFB_CTRL.CTRL_DEVCONT:
+                if self.paused:
+                    self.paused = False
+                    self.start[self.playing] += now - self._pause_start
+                    self._expiry.clear()
+                    for ebi in np.flatnonzero(self.playing).tolist():
+                        self._schedule(ebi)
+            else:
+                return False
+
+        elif typ == FFBPType.PT_NEWEFREP:
+            pass
+
+        else:
+            return False
+
+        return True
+
+    def evaluate(self, now, position=0.0, velocity=0.0, acceleration=0.0):
+        # Sum of every playing effect at time now, device gain applied
+        if self.paused:
+            return 0.0
+
+        if self._expiry:
+            self._expire(now)
+
+        idx = np.flatnonzero(self.playing)
+        if idx.size == 0:
+            return 0.0
+
+        t = now - self.start[idx]
+        duration = self.duration[idx]
+
+        # Time into the current loop
+        finite = np.isfinite(duration)
+        safe_duration = np.where(finite, np.maximum(duration, 1e-6), 1.0)
+        t = np.where(finite, np.fmod(t, safe_duration), t)
+
+        etype = self.etype[idx]
+        is_const = etype == FFBEType.ET_CONST
+        is_ramp = etype == FFBEType.ET_RAMP
+        is_periodic = np.isin(etype, PERIODIC_TYPES)
+
+        # Waveforms over one cycle, phase in 0-1
+        phase = t / self.period[idx] + self.period_phase[idx]
+        phase -= np.floor(phase)
+        wave = np.select(
+            [etype == FFBEType.ET_SQR, etype == FFBEType.ET_SINE, etype == FFBEType.ET_TRNGL,
+             etype == FFBEType.ET_STUP, etype == FFBEType.ET_STDN],
+            [np.where(phase < 0.5, 1.0, -1.0), np.sin(2 * pi * phase), 4 * np.abs(phase - 0.5) - 1,
+             2 * phase - 1, 1 - 2 * phase],
+            0.0)
+
+        magnitude = self.magnitude[idx]
+        ramp_start = self.ramp_start[idx]
+        ramp = ramp_start + (self.ramp_end[idx] - ramp_start) * np.where(finite, t / safe_duration, 0.0)
+        period_magnitude = self.period_magnitude[idx]
+
+        # Envelope scales the sustain level, the offset of periodic effects is left alone
+        sustain = np.select(
+            [is_const, is_ramp, is_periodic],
+            [np.abs(magnitude), np.maximum(np.abs(ramp_start), np.abs(self.ramp_end[idx])), period_magnitude],
+            0.0)
+        envelope = self.envelope[idx]
+        if envelope.any():
+            attack_level, attack_time = self.attack_level[idx], self.attack_time[idx]
+            fade_level, fade_time = self.fade_level[idx], self.fade_time[idx]
+            level = sustain
+            attacking = envelope & (t < attack_time)
+            level = np.where(attacking,
+                             attack_level + (sustain - attack_level) * t / np.maximum(attack_time, 1e-6),
+                             level)
+            fade_from = np.where(finite, duration - fade_time, inf)
+            fading = envelope & (t > fade_from)
+            level = np.where(fading,
+                             sustain + (fade_level - sustain) * np.where(fading, t - fade_from, 0.0) / np.maximum(fade_time, 1e-6),
+                             level)
+            scale = np.where(sustain > 0, level / np.maximum(sustain, 1e-9), 0.0)
+        else:
+            scale = 1.0
+
+        force = np.select(
+            [is_const, is_ramp, is_periodic],
+            [magnitude * scale, ramp * scale, self.period_offset[idx] + period_magnitude * scale * wave],
+            0.0)
+
+        # Conditions push back against the wheel state outside the dead band around their center
+        # Friction has no center, its metric is the direction of motion
+        is_cond = np.isin(etype, CONDITION_TYPES)
+        if is_cond.any():
+            is_friction = etype == FFBEType.ET_FRCTN
+            metric = np.select(
+                [etype == FFBEType.ET_SPRNG, etype == FFBEType.ET_DMPR, etype == FFBEType.ET_INRT, is_friction],
+                [position, velocity, acceleration, min(max(-1.0, velocity / FRICTION_VELOCITY), 1.0)],
+                0.0)
+            center = np.where(is_friction, 0.0, self.cond_center[idx])
+            deadband = self.cond_deadband[idx]
+            pos_sat, neg_sat = self.cond_pos_sat[idx], self.cond_neg_sat[idx]
+            above = metric - (center + deadband)
+            below = metric - (center - deadband)
+            cond = np.where(above > 0, np.clip(self.cond_pos_coeff[idx] * above, -pos_sat, pos_sat),
+                   np.where(below < 0, np.clip(self.cond_neg_coeff[idx] * below, -neg_sat, neg_sat), 0.0))
+            force = np.where(is_cond, cond, force)
+
+        force *= self.effect_gain[idx]
+
+        # A solo effect silences everything else
+        solo = self.solo[idx]
+        if solo.any():
+            force = force[solo]
+
+        return float(force.sum()) * self.gain
+
+
+def _names(cls, prefix):
+    return {v: k for k, v in vars(cls).items() if k.startswith(prefix)}
+
+PACKET_NAMES = _names(FFBPType, 'PT_')
+OP_NAMES = _names(FFBOP, 'EFF_')
+CTRL_NAMES = _names(FFB_CTRL, 'CTRL_')
+
+# Handling time histogram; bin k counts packets handled in under 2**k microseconds
+FFB_STATS_TIME_BINS = 18
+
+
+class FfbStats:
+    """
+    Always-on FFB packet counters
+
+    Packets are counted in fixed integer arrays indexed by packet type and by
+    operation (effect operation or device control, 0 for other types), handled
+    and unhandled apart, along with a histogram of handling times
+
+    coalesced is set by the owner to the packets skipped before they got here,
+    they count towards received and the rate, which measure what the game sends
+    """
+
+    def __init__(self):
+        self.handled = np.zeros((0x20, 0x10), dtype=np.int64)
+        self.unhandled = np.zeros((0x20, 0x10), dtype=np.int64)
+        self.times = np.zeros(FFB_STATS_TIME_BINS, dtype=np.int64)
+        self.total = 0
+        self.coalesced = 0
+
+        self._start = time.perf_counter()
+        self._windows = dict()
+
+    def count(self, packet, handled, elapsed):
+        # elapsed is the handling time in seconds
+        typ = packet.Type & 0x1F
+        if typ == FFBPType.PT_EFOPREP:
+            sub = packet.EffectOp & 0x0F
+        elif typ == FFBPType.PT_CTRLREP:
+            sub = packet.DevCtrl & 0x0F
+        else:
+            sub = 0
+
+        if handled:
+            self.handled[typ, sub] += 1
+        else:
+            self.unhandled[typ, sub] += 1
+        self.total += 1
+
+        b = int(elapsed * 1e6).bit_length()
+        self.times[b if b < FFB_STATS_TIME_BINS else FFB_STATS_TIME_BINS - 1] += 1
+
+    def rate(self, now=None, window="default"):
+        # Packets per second since the last call for the same window, so that
+        # readers of the rate, such as the log line, do not cut each other short
+        if now is None:
+            now = time.perf_counter()
+        received = self.total + self.coalesced
+        start, total = self._windows.get(window, (self._start, 0))
+        self._windows[window] = (now, received)
+        return (received - total) / max(now - start, 1e-6)
+
+    @staticmethod
+    def _by_name(counts):
+        d = dict()
+        for typ, sub in zip(*np.nonzero(counts)):
+            typ, sub = int(typ), int(sub)
+            name = PACKET_NAMES.get(typ, str(typ))
+            if typ == FFBPType.PT_EFOPREP:
+                name += "/" + OP_NAMES.get(sub, str(sub))
+            elif typ == FFBPType.PT_CTRLREP:
+                name += "/" + CTRL_NAMES.get(sub, str(sub))
+            d[name] = int(counts[typ, sub])
+        return d
+
+    def stats(self, now=None, window="default"):
+        """
+        Snapshot of the counters; rate covers the time since the previous call
+        with the same window, see rate()
+
+        {'total': counted, 'coalesced': int, 'received': both, 'rate': received per second,
+         'handled': {packet name: count}, 'unhandled': {packet name: count},
+         'times_us': {upper bound in microseconds: count}}
+        """
+        return dict(
+            total=self.total,
+            coalesced=self.coalesced,
+            received=self.total + self.coalesced,
+            rate=self.rate(now, window),
+            handled=self._by_name(self.handled),
+            unhandled=self._by_name(self.unhandled),
+            times_us={1 << k: int(n) for k, n in enumerate(self.times) if n})
+
+    def log_line(self, now=None):
+        s = self.stats(now, window="log")
+        times = self.times.cumsum()
+        p50 = 1 << int(np.searchsorted(times, times[-1] * 0.5))
+        p99 = 1 << int(np.searchsorted(times, times[-1] * 0.99))
+        return "[FFB] {:.0f} packets/s, {} received, {} coalesced, handling p50 <{}us p99 <{}us, unhandled {}".format(
+            s['rate'], s['received'], s['coalesced'], p50, p99, s['unhandled'] or "none")
+
+
+class FfbShaper:
+    """
+    Output shaping of the summed force, baked into a lookup table
+
+    gain      : applied first; forces over full scale after it are clipping
+    deadband  : force below this ratio maps to 0
+    lift      : minimum output of any force past the deadband
+    gamma     : and bezier, the curve between deadband and full scale, see AxisCurve
+    soft_clip : knee above which the output bends towards full scale instead of
+                being cut off, 1 for a hard clip
+    headroom  : largest input force kept apart in the table, as a multiple of full scale
+
+    clips counts the times the force went over full scale
+    """
+
+    def __init__(self, gain=1.0, deadband=0.0, lift=0.0, gamma=1.0, bezier=None, soft_clip=1.0,
+                 headroom=4.0, size=CURVE_LUT_SIZE):
+        curve = AxisCurve(gamma=gamma, bezier=bezier, symmetric=False, size=size)
+        deadband = min(max(0.0, deadband), 0.99)
+        lift = min(max(0.0, lift), 1.0)
+        knee = min(max(0.0, soft_clip), 1.0)
+
+        a = np.linspace(0.0, headroom, size + 1) * gain
+        m = np.maximum(a - deadband, 0.0) / (1 - deadband)
+        # The curve runs up to full scale and carries on linearly past it
+        c = np.where(m < 1, [curve.sample(v) for v in np.minimum(m, 1.0).tolist()], m)
+        y = np.where(m > 0, lift + (1 - lift) * c, 0.0)
+        if knee < 1:
+            y = np.where(y > knee, knee + (1 - knee) * np.tanh((y - knee) / (1 - knee)), y)
+        y = np.minimum(y, 1.0)
+
+        self._lut = np.concatenate([-y[:0:-1], y]).tolist()
+        self._scale = size / headroom
+        self._offset = size + 0.5
+        self._max = len(self._lut) - 1
+
+        self._clip_at = 1 / gain if gain > 0 else inf
+        self._clipping = False
+        self.clips = 0
+
+    @classmethod
+    def from_config(cls, cfg):
+        # cfg is a profile dict from config; ratios are stored as percents there and
+        # keys left out take their value in the Default profile, as the arguments do
+        cfg = {**DEFAULT_CONFIG['wheel_ffb_profiles']["Default"], **cfg}
+        return cls(gain=cfg['gain'] / 100,
+                   deadband=cfg['deadband'] / 100,
+                   lift=cfg['lift'] / 100,
+                   gamma=cfg['gamma'],
+                   bezier=cfg['bezier'],
+                   soft_clip=cfg['soft_clip'] / 100)
+
+    def sample(self, x):
+        clipping = x >= self._clip_at or -x >= self._clip_at
+        if clipping and not self._clipping:
+            self.clips += 1
+        self._clipping = clipping
+
+        i = int(x * self._scale + self._offset)
+        if i < 0:
+            i = 0
+        elif i > self._max:
+            i = self._max
+        return self._lut[i]
+
+
+class FfbForceFilter:
+    """
+    Filtered force over time
+
+    push() runs the raw force through a low-pass filter set by a time constant
+    in seconds, so smoothing does not depend on how often it is called
+
+    mode : "EMA" exponential moving average with the time constant
+           "Biquad" second order Butterworth with a cutoff of 1 / (2 pi tau)
+           "Off" no filtering
+    """
+
+    def __init__(self, tau=0.047, mode="EMA"):
+        self.tau = tau
+        self.mode = mode
+        self.value = 0.0 # latest filtered force
+        self.t = None    # and its time
+
+        self._x1 = self._x2 = self._y1 = self._y2 = 0.0
+
+    def reset(self):
+        # Zero force from now on
+        self.value = 0.0
+        self._x1 = self._x2 = self._y1 = self._y2 = 0.0
+
+    def _biquad(self, x, dt):
+        # RBJ low-pass, coefficients follow the step so that the cutoff is in time
+        fc = min(1 / (2 * pi * self.tau), 0.45 / dt)
+        w0 = 2 * pi * fc * dt
+        cw = cos(w0)
+        alpha = sin(w0) / sqrt(2) # Q = 1 / sqrt(2)
+        a0 = 1 + alpha
+        b0 = (1 - cw) / 2 / a0
+        y = b0 * (x + 2 * self._x1 + self._x2) + (2 * cw * self._y1 - (1 - alpha) * self._y2) / a0
+        self._x2, self._x1 = self._x1, x
+        self._y2, self._y1 = self._y1, y
+        return y
+
+    def push(self, t, x):
+        if self.t is None or self.mode == "Off" or self.tau <= 0:
+            y = x
+        else:
+            dt = t - self.t
+            if dt <= 0:
+                return self.value
+            if self.mode == "Biquad":
+                y = self._biquad(x, dt)
+            else:
+                y = self.value + (1 - exp(-dt / self.tau)) * (x - self.value)
+
+        self.t = t
+        self.value = y
+        return y
+
+
+class FfbHapticDetector:
+    """
+    Controller haptics from the filtered force, pushed once per frame
+
+    The RMS of the force derivative over the last window samples is kept with a
+    running sum of squares and drives a light pulse every few frames, the way
+    road texture feels. With bands on, the derivative is split by a one pole
+    low-pass at about 8 Hz: the fast part alone drives the texture pulse and a
+    sharp step in the slow part reads as an impact, a stronger pulse every
+    frame for impact_frames frames
+
+    pattern is handed to Controller.haptic as is; it is allocated once and its
+    strength function reads the latest state
+    """
+
+    def __init__(self, window=30, threshold=0.01, bands=False, impact_frames=6, frequency=60):
+        self.threshold = threshold
+        self.bands = bands
+        self.impact_frames = impact_frames
+
+        # Squares of the last window - 1 differences, as np.diff over window samples gives
+        self._n = window - 1
+        self._squares = [0.0] * self._n
+        self._i = 0
+        self._sum = 0.0
+        self._prev = None
+
+        self._lp_alpha = 1 - exp(-2 * pi * 8 / frequency)
+        self._lp = 0.0
+        self._texture_energy = 0.0
+
+        self.rms = 0.0
+        self.texture = 0.0 # pulse strength, every 5th frame
+        self.impact = 0.0  # pulse strength, every frame while _impact_left
+        self._impact_left = 0
+
+        def strength(t, f):
+            if self._impact_left > 0:
+                return self.impact
+            return self.texture if f % 5 == 0 else 0
+        self.pattern = [None, strength]
+
+    def reset(self):
+        self._squares[:] = [0.0] * self._n
+        self._sum = 0.0
+        self._prev = None
+        self._lp = self._texture_energy = 0.0
+        self.rms = self.texture = self.impact = 0.0
+        self._impact_left = 0
+
+    def push(self, x):
+        # Returns True while there is something to play
+        d = 0.0 if self._prev is None else x - self._prev
+        self._prev = x
+
+        sq = d * d
+        i = self._i
+        self._sum += sq - self._squares[i]
+        self._squares[i] = sq
+        i += 1
+        if i == self._n:
+            i = 0
+            self._sum = sum(self._squares) # drop the rounding drift once per window
+        self._i = i
+        self.rms = rms = sqrt(max(0.0, self._sum) / self._n)
+
+        if self.bands:
+            self._lp += self._lp_alpha * (d - self._lp)
+            high = d - self._lp
+            self._texture_energy += 0.2 * (high * high - self._texture_energy)
+            rms = sqrt(self._texture_energy)
+
+            step = abs(self._lp)
+            if self._impact_left > 0:
+                self._impact_left -= 1
+            elif step > 5 * self.threshold:
+                self.impact = min(1.0, step / (20 * self.threshold))
+                self._impact_left = self.impact_frames
+
+        threshold = self.threshold
+        self.texture = 0.5 * min(2.0, rms / threshold) / 2 if rms > threshold else 0.0
+        return self.texture > 0 or self._impact_left > 0
+
+
+# Capture file: magic, then one record per packet, '<dII' (perf_counter seconds, cmd, size) followed by the data
+FFB_CAPTURE_MAGIC = b'VJFFBCAP'
+FFB_CAPTURE_RECORD = struct.Struct('<dII')
+# Seconds between flushes of a running capture, so that it can be read meanwhile
+FFB_CAPTURE_FLUSH_INTERVAL = 1.0
+
+
+class FfbCapture:
+    """
+    Writes raw FFB packets to a capture file as they are handled, see read_capture
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'wb')
+        self._file.write(FFB_CAPTURE_MAGIC)
+        self._header = FFB_DATA()
+        self._header_address = addressof(self._header)
+        self._pack = FFB_CAPTURE_RECORD.pack
+        self._flushed = time.perf_counter()
+
+    def write(self, address, t):
+        # address is that of an FFB_DATA, t its arrival time as time.perf_counter()
+        header = self._header
+        memmove(self._header_address, address, sizeof(FFB_DATA))
+        size = header.size
+        self._file.write(self._pack(t, header.cmd, size))
+        self._file.write(string_at(header.data, size))
+        self.count += 1
+
+    def flush(self, now=None):
+        # Writes out what is buffered once FFB_CAPTURE_FLUSH_INTERVAL has passed
+        if now is None:
+            now = time.perf_counter()
+        if now - self._flushed >= FFB_CAPTURE_FLUSH_INTERVAL and not self._file.closed:
+            self._file.flush()
+            self._flushed = now
+
+    def close(self):
+        self._file.close()
+
+
+def read_capture(path):
+    # Yields (t, cmd, data bytes) for every packet of a capture file
+    with open(path, 'rb') as f:
+        if f.read(len(FFB_CAPTURE_MAGIC)) != FFB_CAPTURE_MAGIC:
+            raise ValueError("Not an FFB capture file: %s" % path)
+        record_size = FFB_CAPTURE_RECORD.size
+        unpack = FFB_CAPTURE_RECORD.unpack
+        while True:
+            record = f.read(record_size)
+            if len(record) < record_size:
+                return
+            t, cmd, size = unpack(record)
+            yield t, cmd, f.read(size)
@@ -0,0 +1,175 @@
+from math import ceil
+
+import numpy as np
+
+
+# Stick travel in gate units: columns are 1 apart, the gates end at z = -1 and +1
+# The neutral channel is |z| <= Z_MID_MARGIN, a gear engages past Z_END_MARGIN and
+# stays engaged until the stick is back in the channel; within X_MID_MARGIN of the
+# neutral column the stick falls back into it, away from it a column is taken once
+# the stick reaches it
+X_MID_MARGIN = 0.55
+Z_MID_MARGIN = 0.55
+Z_END_MARGIN = 0.8
+
+# Slot texture drawn for layouts without an image, in gate units
+SLOT_RADIUS = 0.27
+SLOT_OUTLINE = 0.095
+SLOT_HALF_HEIGHT = 1.4
+
+
+class GateMap:
+    """
+    H-shifter layout compiled into a lookup grid
+
+    gates   : [top, bottom] button of each column from left to right, None where
+              the column has no gate, e.g. [[None, 51], [43, 44], [45, 46], [47, 48]]
+    neutral : index of the column the stick rests in
+    locked  : number of columns at the left end behind the reverse lock
+    spring  : the stick goes back to neutral when let go, as a sequential shifter
+    image   : slot texture in the media directory, drawn from the gates when None
+
+    orientation is shifter_reverse_orientation and only moves the locked columns:
+    Left or Right puts them at that end, Top or Bottom puts their gate in that row
+    when they have one. The image is mirrored to match, so it should be symmetric
+    but for the locked columns
+
+    Columns are placed at x = -1, 0, 1... from the neutral one, which the grid
+    is indexed by; a row is -1 top, 0 the neutral channel, 1 bottom
+    """
+
+    def __init__(self, gates, neutral=0, locked=0, spring=False, image=None, orientation="Bottom Left"):
+        n = len(gates)
+        if not 0 <= locked <= neutral < n:
+            raise ValueError("Gate layout needs an unlocked neutral column")
+
+        columns = []
+        for i, (top, bottom) in enumerate(gates):
+            if i < locked and (top is None) != (bottom is None):
+                gate = top if bottom is None else bottom
+                top, bottom = (gate, None) if orientation.startswith("Top") else (None, gate)
+            columns.append([top, None, bottom])
+        is_locked = [i < locked for i in range(n)]
+
+        # Locked columns moved to the right end keep their order outwards
+        x_min = -neutral
+        if locked and orientation.endswith("Right"):
+            columns = columns[locked:] + columns[locked-1::-1]
+            is_locked = is_locked[locked:] + is_locked[:locked]
+            x_min += locked
+
+        self.x_min = x_min
+        self.x_max = x_min + n - 1
+        self.spring = spring
+        self.image = image
+        self.orientation = orientation
+
+        self._grid = columns
+        self._locked = is_locked
+        # How far the stick can go up and down in each column
+        self._reach = [(-1.0 if c[0] is not None else 0.0, 1.0 if c[2] is not None else 0.0)
+                       for c in columns]
+        self.buttons = tuple(b for c in columns for b in c if b is not None)
+
+    @classmethod
+    def from_config(cls, layout, orientation):
+        return cls(layout['gates'],
+                   neutral=layout.get('neutral', 0),
+                   locked=layout.get('locked', 0),
+                   spring=layout.get('spring', False),
+                   image=layout.get('image'),
+                   orientation=orientation)
+
+    def button(self, gate):
+        return self._grid[int(gate[0]) - self.x_min][int(gate[1]) + 1]
+
+    def resolve(self, x, z, gate, reverse_locked=True):
+        """
+        Stick at x, z moved from gate, returns where it is drawn and the new gate
+
+        x, z : hand position in gate units, anywhere
+        gate : [column, row] the stick was in
+        """
+        col, row = gate
+        x_min = self.x_min
+        # Compared rather than min and max, which cost a call each
+        if x < x_min:
+            x = x_min
+        elif x > self.x_max:
+            x = self.x_max
+        if z < -1.0:
+            z = -1.0
+        elif z > 1.0:
+            z = 1.0
+
+        if -Z_MID_MARGIN <= z <= Z_MID_MARGIN:
+            row = 0
+            c = int(x) # column reached, towards neutral
+            if c == 0 and abs(x) > X_MID_MARGIN:
+                c = col
+            elif reverse_locked and c != col and self._locked[c - x_min]:
+                s = 1 if c > 0 else -1
+                while self._locked[c - x_min]:
+                    c -= s
+                x = c
+            col = c
+
+            # Into a gate or along the channel, whichever the stick is closer to
+            if abs(x - col) < abs(z):
+                lo, hi = self._reach[col - x_min]
+                x = col
+                if z < lo:
+                    z = lo
+                elif z > hi:
+                    z = hi
+            else:
+                z = 0
+        else:
+            lo, hi = self._reach[col - x_min]
+            x = col
+            if z < lo:
+                z = lo
+            elif z > hi:
+                z = hi
+            if z < -Z_END_MARGIN:
+                row = -1
+            elif z > Z_END_MARGIN:
+                row = 1
+
+        return [x, z], [col, row]
+
+    def draw(self, unit=100):
+        """
+        Slot texture with unit pixels between columns and the neutral column in
+        the middle, [buffer, width, height, depth] as in IMAGE_DATA
+        """
+        half = max(-self.x_min, self.x_max) + SLOT_RADIUS + SLOT_OUTLINE + 0.1
+        w = 2 * ceil(half * unit)
+        h = 2 * ceil(SLOT_HALF_HEIGHT * unit)
+        xs = ((np.arange(w) + 0.5 - w/2) / unit)[None, :]
+        zs = ((np.arange(h) + 0.5 - h/2) / unit)[:, None]
+
+        # Channel and gates as segments, the slot is everything near them
+        segments = []
+        if self.x_max > self.x_min:
+            segments.append((self.x_min, 0.0, self.x_max, 0.0))
+        for i, (lo, hi) in enumerate(self._reach):
+            x = self.x_min + i
+            if lo or hi:
+                segments.append((x, lo, x, hi))
+
+        d = np.full((h, w), np.inf)
+        for x0, z0, x1, z1 in segments:
+            # Along x or z only
+            dx = np.maximum(np.maximum(x0 - xs, xs - x1), 0.0)
+            dz = np.maximum(np.maximum(z0 - zs, zs - z1), 0.0)
+            d = np.minimum(d, np.sqrt(dx*dx + dz*dz))
+
+        # Black slot in a white outline, a pixel of blending at both edges
+        r = SLOT_RADIUS
+        white = np.clip((d - r) * unit + 0.5, 0.0, 1.0) * 255
+        alpha = np.clip((r + SLOT_OUTLINE - d) * unit + 0.5, 0.0, 1.0) * 255
+        rgba = np.empty((h, w, 4), dtype=np.uint8)
+        rgba[..., 0] = rgba[..., 1] = rgba[..., 2] = white
+        rgba[..., 3] = alpha
+        return [rgba.tobytes(), w, h, 4]
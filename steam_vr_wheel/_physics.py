@@ -0,0 +1,256 @@
+from math import exp, log, tanh
+
+
+# The wheel used to be tuned in radians per frame at this update rate
+LEGACY_FRAME_RATE = 60
+
+# Longer frames are cut short so that a hitch does not fling the wheel
+MAX_FRAME_TIME = 0.1
+
+# WheelTorqueModel steps at least this often, stiff hand springs need it
+TORQUE_MIN_RATE = 500
+
+# Soft lock: deceleration at the end of the zone in radians per second squared, growing
+# linearly from its start, and the rate per second at which motion is damped in the zone,
+# about critical for the default zone so that the wheel settles rather than bounces off
+LOCK_ACCELERATION = 400.0
+LOCK_DAMPING = 80.0
+
+
+def per_second(per_frame, frame_rate=LEGACY_FRAME_RATE):
+    # A speed in radians per frame to radians per second
+    return per_frame * frame_rate
+
+def damping_rate(factor, frame_rate=LEGACY_FRAME_RATE):
+    # A per frame velocity factor, such as 0.95, to a decay rate per second
+    return -log(factor) * frame_rate
+
+
+class WheelPhysics:
+    """
+    Wheel angle and angular velocity integrated over real time
+
+    step() advances by the elapsed time in fixed substeps of 1 / rate seconds
+    with semi-implicit Euler, carrying the remainder over to the next call, so
+    the update rate only changes how often the result is read
+
+    damping : rate per second at which a free spin slows down, see damping_rate
+
+    With lock() the wheel stops at +-limit, slowed down over the zone before it;
+    lock_depth is how far into the zone it is, 0 to 1
+    """
+
+    def __init__(self, damping, rate=240):
+        self.angle = 0.0
+        self.velocity = 0.0 # radians per second
+        self.damping = damping
+        self.rate = rate
+        self.h = 1.0 / rate
+        self._decay = exp(-damping * self.h)
+        self._acc = 0.0
+        self.lock(0.0, 0.0)
+
+    def lock(self, limit, zone):
+        # limit 0 disables it
+        self.limit = limit
+        self.zone = max(1e-6, min(zone, limit))
+        self.lock_depth = 0.0
+
+    def set(self, angle, velocity=None):
+        self.angle = angle
+        if velocity is not None:
+            self.velocity = velocity
+
+    def hold(self, angle, dt):
+        """
+        The hand sets the angle, returned back; its speed carries on once let go
+
+        In the lock zone the angle is eased towards the limit instead, never reaching it
+        """
+        if self.limit:
+            edge = self.limit - self.zone
+            over = abs(angle) - edge
+            if over > 0:
+                depth = tanh(over / self.zone)
+                angle = (edge + self.zone * depth) * (1 if angle > 0 else -1)
+                self.lock_depth = depth
+            else:
+                self.lock_depth = 0.0
+
+        if dt > 0:
+            self.velocity = (angle - self.angle) / min(dt, MAX_FRAME_TIME)
+        self.angle = angle
+        self._acc = 0.0
+        return angle
+
+    def step(self, dt, drift=0.0, pull=0.0):
+        """
+        Free wheel over dt seconds, returns the new angle
+
+        drift : angular velocity added on top of the wheel's own, radians per second
+        pull  : speed towards the center, radians per second, stopping there
+        """
+        acc = self._acc + min(max(0.0, dt), MAX_FRAME_TIME)
+        h = self.h
+        decay = self._decay
+        angle = self.angle
+        velocity = self.velocity
+        d = pull * h
+        limit = self.limit
+        zone = self.zone
+        edge = limit - zone
+        depth = 0.0
+        while acc >= h:
+            acc -= h
+            velocity *= decay
+            if limit:
+                depth, velocity = _lock_velocity(angle, velocity + drift, edge, zone, h)
+                velocity -= drift
+            angle += (velocity + drift) * h
+            if d:
+                if -d <= angle <= d:
+                    angle = 0.0
+                elif angle > 0:
+                    angle -= d
+                else:
+                    angle += d
+            if limit and not -limit <= angle <= limit:
+                angle = limit if angle > 0 else -limit
+                velocity = -drift
+
+        self._acc = acc
+        self.angle = angle
+        self.velocity = velocity
+        self.lock_depth = depth
+        return angle
+
+
+def _lock_velocity(angle, velocity, edge, zone, h):
+    # Depth into the soft lock zone and the velocity slowed down for one substep of h
+    over = abs(angle) - edge
+    if over <= 0:
+        return 0.0, velocity
+    depth = min(1.0, over / zone)
+    sign = 1 if angle > 0 else -1
+    velocity -= sign * LOCK_ACCELERATION * depth * h
+    velocity *= 1 - min(1.0, LOCK_DAMPING * h)
+    return depth, velocity
+
+
+class WheelTorqueModel:
+    """
+    Wheel as a rim with inertia driven by torques, integrated like WheelPhysics
+
+    inertia        : of the rim, kg m^2
+    damping        : viscous, N m per rad/s
+    friction       : Coulomb, N m; holds a slow wheel still below it
+    hand_stiffness : N m per rad, the spring between a holding hand and the rim
+    hand_damping   : N m per rad/s of that spring
+
+    While held, the hand angle moves linearly across the frame and pulls the rim
+    through the spring; hand_torque is what the hand feels
+
+    lock() as in WheelPhysics, the lock zone pushes back with a torque instead
+    """
+
+    def __init__(self, inertia=0.1, damping=0.3, friction=0.02, hand_stiffness=40.0, hand_damping=2.0,
+                 rate=1000):
+        self.angle = 0.0
+        self.velocity = 0.0 # radians per second
+        self.hand_torque = 0.0
+        self.inertia = inertia
+        self.damping = damping
+        self.friction = friction
+        self.hand_stiffness = hand_stiffness
+        self.hand_damping = hand_damping
+        self.rate = max(rate, TORQUE_MIN_RATE)
+        self.h = 1.0 / self.rate
+        self._acc = 0.0
+        self._hand = None # hand angle at the end of the last frame
+        self.lock(0.0, 0.0)
+
+    def lock(self, limit, zone):
+        self.limit = limit
+        self.zone = max(1e-6, min(zone, limit))
+        self.lock_depth = 0.0
+
+    def set(self, angle, velocity=None):
+        self.angle = angle
+        if velocity is not None:
+            self.velocity = velocity
+
+    def step(self, dt, torque=0.0, spring=0.0, hand=None):
+        """
+        Advances over dt seconds, returns the new angle
+
+        torque : external torque such as FFB, N m
+        spring : stiffness pulling towards the center, N m per rad
+        hand   : angle of the holding hand, None when let go
+        """
+        dt = min(max(0.0, dt), MAX_FRAME_TIME)
+        acc = self._acc + dt
+        h = self.h
+        angle = self.angle
+        velocity = self.velocity
+        inv_inertia = 1.0 / self.inertia
+        c = self.damping
+        f = self.friction
+        k_h = self.hand_stiffness
+        c_h = self.hand_damping
+        limit = self.limit
+        zone = self.zone
+        edge = limit - zone
+        lock_acceleration = LOCK_ACCELERATION * self.inertia
+        lock_damping = LOCK_DAMPING * self.inertia
+        depth = 0.0
+
+        # Hand target from where it was to where it is now
+        if hand is not None:
+            start = hand if self._hand is None else self._hand
+            hand_velocity = (hand - start) / dt if dt > 0 else 0.0
+            target = hand - hand_velocity * acc
+        self._hand = hand
+
+        hand_torque = 0.0
+        while acc >= h:
+            acc -= h
+            t = torque - spring * angle - c * velocity
+            if hand is not None:
+                target += hand_velocity * h
+                hand_torque = k_h * (target - angle) + c_h * (hand_velocity - velocity)
+                t += hand_torque
+
+            # Soft lock pushing back, harder the deeper
+            if limit:
+                over = abs(angle) - edge
+                depth = 0.0
+                if over > 0:
+                    depth = min(1.0, over / zone)
+                    sign = 1 if angle > 0 else -1
+                    t -= sign * lock_acceleration * depth + lock_damping * velocity
+
+            # Coulomb friction: opposes motion, or sticks when it can hold the rest
+            if velocity > 0:
+                t -= f
+            elif velocity < 0:
+                t += f
+            elif -f <= t <= f:
+                continue
+
+            v = velocity + t * inv_inertia * h
+            # Friction stops the wheel rather than turning it back; the next
+            # substep decides whether it sticks
+            if velocity > 0 > v or velocity < 0 < v:
+                v = 0.0
+            velocity = v
+            angle += velocity * h
+            if limit and not -limit <= angle <= limit:
+                angle = limit if angle > 0 else -limit
+                velocity = 0.0
+
+        self._acc = acc
+        self.angle = angle
+        self.velocity = velocity
+        self.hand_torque = hand_torque
+        self.lock_depth = depth
+        return angle
@@ -4,11 +4,13 @@ import openvr
 import time
 import os
 
+from math import atan2, pi
+
 from steam_vr_wheel.configurator import ConfiguratorApp
 from steam_vr_wheel.pyvjoy.vjoydevice import VJoyDevice, \
     HID_USAGE_SL0, HID_USAGE_SL1, HID_USAGE_X, HID_USAGE_Y, HID_USAGE_Z, HID_USAGE_RX, HID_USAGE_RY
 from steam_vr_wheel.vrcontroller import Controller
-from steam_vr_wheel.util import dead_and_stretch, expand_to_array
+from steam_vr_wheel.util import expand_to_array, AxisCurve, vjoy_centered, vjoy_magnitude
 from . import PadConfig, ConfigException, MEDIA_DIR, IMAGE_DATA
 from . import check_result, rotation_matrix, deep_get
 import multiprocessing
@@ -53,8 +55,32 @@ AXES = {
     }
 }
 
+# POV hat each joystick drives when j_l_pov or j_r_pov is not "Off"
+POVS = {
+    'left': 1,
+    'right': 2
+}
+
 DISABLED_BUTTONS = set()
 DISABLED_AXES = set()
+DISABLED_POVS = set()
+
+# Joystick directions mapped to buttons only register past this point
+DEADZONE_DPAD = 0.9
+
+POV_NEUTRAL = -1
+RAD_TO_POV_BIN = 180 / pi
+
+def make_pov_table(mode):
+    # Value to write for each of the 360 one-degree bins, clockwise from up
+    # "4-way" is for discrete POVs, the rest for continuous ones
+    if mode == "Continuous":
+        return [i * 100 for i in range(360)]
+    elif mode == "8-way":
+        return [int((i + 23) // 45) % 8 * 4500 for i in range(360)]
+    elif mode == "4-way":
+        return [int((i + 45.5) // 90) % 4 for i in range(360)]
+    raise ValueError("Unknown POV mode: {}".format(mode))
 
 def run_configurator():
     ConfiguratorApp().run()
@@ -212,7 +238,10 @@ class VirtualPad:
     def __init__(self):
         self.init_config()
         device = self.config.adv_vjoy_device
-        self.device = VJoyDevice(device)
+        # Writes return the vJoy status rather than raise, see vjoy_failed
+        self.device = VJoyDevice(device, raise_errors=False)
+        self._vjoy_failures = 0
+        self._vjoy_failure_print = 0.0
         self.trackpadRtouch = False
         self.trackpadLtouch = False
         self.trackpadLX = 0
@@ -230,6 +259,9 @@ class VirtualPad:
         # Haptic intensity
         Controller.set_haptic_intensity(self.config.haptic_intensity / 100)
 
+        # Joystick mapping
+        self.compile_axis_map()
+
         # edit mode
         self._edit_mode_last_press = 0.0
         self._edit_mode_entry = 0.0
@@ -254,19 +286,43 @@ class VirtualPad:
                     app_ran = True
                 time.sleep(1)
 
+    def vjoy_failed(self, what, id):
+        # A write vJoy refused, e.g. the device was taken by another feeder; the loop
+        # goes on and it is printed once a second at most
+        self._vjoy_failures += 1
+        now = time.time()
+        if now - self._vjoy_failure_print >= 1.0:
+            self._vjoy_failure_print = now
+            print("vJoy refused %s %d, %d writes failed so far" % (what, id, self._vjoy_failures))
+
     def set_button(self, btn_id, val):
         if btn_id in DISABLED_BUTTONS:
             return
-        self.device.set_button(btn_id, val)
+        if not self.device.set_button(btn_id, val):
+            self.vjoy_failed("button", btn_id)
 
     def set_axis(self, axis_id, val):
         if axis_id in DISABLED_AXES:
             return
-        self.device.set_axis(axis_id, val)
+        if not self.device.set_axis(axis_id, val):
+            self.vjoy_failed("axis", axis_id)
+
+    def set_pov(self, pov_id, val, discrete=False):
+        # Written only when the value changes
+        if pov_id in DISABLED_POVS or self._pov_values.get(pov_id) == val:
+            return
+        self._pov_values[pov_id] = val
+        if discrete:
+            ok = self.device.set_disc_pov(pov_id, val)
+        else:
+            ok = self.device.set_cont_pov(pov_id, val)
+        if not ok:
+            self.vjoy_failed("POV", pov_id)
 
     def enable_all(self):
         DISABLED_BUTTONS.clear()
         DISABLED_AXES.clear()
+        DISABLED_POVS.clear()
 
     def enable_button(self, hand, button):
         btn_id = BUTTONS[hand][button]
@@ -287,6 +343,9 @@ class VirtualPad:
             for e in btn_ids:
                 DISABLED_BUTTONS.remove(e)
 
+        if axis in ('left-right', 'down-up'):
+            DISABLED_POVS.discard(POVS[hand])
+
     def get_axis_zero(self, hand, axis):
         is_btns = deep_get(self.axis_buttons, [hand, axis])
         if is_btns is not None:
@@ -305,6 +364,11 @@ class VirtualPad:
             for e in btn_ids:
                 DISABLED_BUTTONS.add(e)
 
+        pov_slot = self._pov_map.get(hand)
+        if pov_slot is not None and axis in ('left-right', 'down-up'):
+            self.set_pov(pov_slot[0], POV_NEUTRAL, pov_slot[2])
+            DISABLED_POVS.add(pov_slot[0])
+
     def update_axis_buttons(self):
         self.axis_buttons = {}
         self.axis_buttons['left'] = {
@@ -328,6 +392,109 @@ class VirtualPad:
             ]
         }
 
+    def compile_axis_map(self):
+        # Flattens BUTTONS, AXES and the joystick button config into per-hand slots
+        # so that update() does not walk the dicts every frame; the config is only
+        # read at startup, so it is built once
+        self.update_axis_buttons()
+        deadzone = self.config.axis_deadzone / 100
+
+        self._axis_map = dict()
+        for hand in ['left', 'right']:
+            slots = []
+            for axis in ['left-right', 'down-up']:
+                is_btns = self.axis_buttons[hand][axis]
+                btn_ids = BUTTONS[hand][axis]
+                # Response curve with the button/axis output mode baked in
+                curve = AxisCurve.from_config(self.config.axis_curve_joystick,
+                                              deadzone=self.config.axis_deadzone,
+                                              out=vjoy_magnitude if is_btns[0] or is_btns[1] else vjoy_centered)
+                # Slot layout:
+                # axis_hid, btn_neg, btn_pos, is_btn_neg, is_btn_pos, curve, zero, minus_dead, plus_dead
+                slots.append((
+                    AXES[hand][axis],
+                    btn_ids[0],
+                    btn_ids[1],
+                    is_btns[0],
+                    is_btns[1],
+                    curve,
+                    int(self.get_axis_zero(hand, axis) * 0x8000),
+                    -DEADZONE_DPAD if is_btns[0] else -deadzone,
+                    DEADZONE_DPAD if is_btns[1] else deadzone))
+
+            trigger = AxisCurve.from_config(self.config.axis_curve_trigger, symmetric=False, out=vjoy_magnitude)
+            self._axis_map[hand] = (AXES[hand][openvr.k_EButton_SteamVR_Trigger], trigger, slots[0], slots[1])
+
+        # POV hats
+        self._pov_values = dict()
+        self._pov_map = dict()
+        for hand, mode in [('left', self.config.j_l_pov), ('right', self.config.j_r_pov)]:
+            if mode == "Off":
+                self._pov_map[hand] = None
+                continue
+
+            # pov_id, table, discrete, deadzone squared
+            pov_slot = (POVS[hand], make_pov_table(mode), mode == "4-way", deadzone * deadzone)
+            self._pov_map[hand] = pov_slot
+
+            # The POV takes the whole stick over; park its axes and buttons
+            for slot in self._axis_map[hand][2:]:
+                self._zero_axis_slot(slot)
+            self.set_pov(pov_slot[0], POV_NEUTRAL, pov_slot[2])
+
+    def _zero_axis_slot(self, slot):
+        axis_hid, btn_neg, btn_pos, _, _, curve, zero, _, _ = slot
+        self.set_button(btn_neg, False)
+        self.set_button(btn_pos, False)
+        self.set_axis(axis_hid, zero)
+        curve.reset()
+
+    def _convert_pov(self, x, y, pov_slot):
+        pov_id, table, discrete, deadzone_sq = pov_slot
+        if x * x + y * y < deadzone_sq:
+            val = POV_NEUTRAL
+        else:
+            # atan2(x, y) is 0 at up and grows clockwise; +360 keeps int() flooring
+            val = table[int(atan2(x, y) * RAD_TO_POV_BIN + 360) % 360]
+        self.set_pov(pov_id, val, discrete)
+
+    def _convert_axis_slots(self, x, y, x_slot, y_slot):
+
+        '''
+        This function allows only one direction of joystick to be registered
+        that means no overlapping axes; only x or y will be registered
+        '''
+
+        if abs(x) > abs(y):
+            self._zero_axis_slot(y_slot)
+            trackpad = x
+            slot = x_slot
+        else:
+            self._zero_axis_slot(x_slot)
+            trackpad = y
+            slot = y_slot
+
+        axis_hid, btn_neg, btn_pos, is_btn_neg, is_btn_pos, curve, zero, minus_dead, plus_dead = slot
+
+        if trackpad <= minus_dead:
+
+            self.set_button(btn_pos, False)
+            if is_btn_neg:
+                self.set_button(btn_neg, True)
+            else:
+                self.set_axis(axis_hid, curve.sample(trackpad))
+
+        elif trackpad >= plus_dead:
+
+            self.set_button(btn_neg, False)
+            if is_btn_pos:
+                self.set_button(btn_pos, True)
+            else:
+                self.set_axis(axis_hid, curve.sample(trackpad))
+
+        else:
+            self._zero_axis_slot(slot)
+
     def get_trackpad_zone(self, X, Y):
         if self.config.multibutton_trackpad:
             zone = self._get_zone(X, Y)
@@ -485,82 +652,26 @@ class VirtualPad:
         self._update_time_delta = now - self._previous_update_time
         self._previous_update_time = now
 
-        self.set_axis(AXES['left'][openvr.k_EButton_SteamVR_Trigger], int(left_ctr.axis * 0x8000))
-        self.set_axis(AXES['right'][openvr.k_EButton_SteamVR_Trigger], int(right_ctr.axis * 0x8000))
-
-        self.update_axis_buttons()
-        DEADZONE_DPAD = 0.9
-        DEADZONE_AXIS = self.config.axis_deadzone / 100
-
-        def zero_axis(hand, axis):
-            axis_hid = AXES[hand][axis]
-            btn_ids = BUTTONS[hand][axis]
-            zero = self.get_axis_zero(hand, axis)
-            self.set_button(btn_ids[0], False)
-            self.set_button(btn_ids[1], False)
-            self.set_axis(axis_hid, int(zero * 0x8000))
-
-        def convert_axis(x, y, hand, x_axis, y_axis):
-
-            '''
-            This function allows only one direction of joystick to be registered
-            that means no overlapping axes; only x or y will be registered
-
-            NOTE you can use this function separately for 'left-right' and 'down-up' axes
-                 ( use it like convert_axis(trackpad, hand, axis) )
-                 if you'd like it that way
-            '''
-
-            if abs(x) > abs(y):
-                zero_axis(hand, y_axis)
-
-                trackpad = x
-                axis = x_axis
-            else:
-                zero_axis(hand, x_axis)
-
-                trackpad = y
-                axis = y_axis
+        left_trigger, left_trigger_curve, left_x_slot, left_y_slot = self._axis_map['left']
+        right_trigger, right_trigger_curve, right_x_slot, right_y_slot = self._axis_map['right']
 
-            axis_hid = AXES[hand][axis]
-            btn_ids = BUTTONS[hand][axis]
-            is_btns = self.axis_buttons[hand][axis]
-            zero = self.get_axis_zero(hand, axis)
-
-            axis_amount = dead_and_stretch(trackpad, DEADZONE_AXIS)
-            if is_btns[0] or is_btns[1]:
-                axis_amount = abs(axis_amount)
-            else:
-                axis_amount = (axis_amount + 1) / 2
-
-            plus_dead = DEADZONE_DPAD if is_btns[1] else DEADZONE_AXIS
-            minus_dead = -DEADZONE_DPAD if is_btns[0] else -DEADZONE_AXIS
-
-            if trackpad <= minus_dead:
-
-                self.set_button(btn_ids[1], False)
-                if is_btns[0]:
-                    self.set_button(btn_ids[0], True)
-                else:
-                    self.set_axis(axis_hid, int(axis_amount * 0x8000))
-
-            elif trackpad >= plus_dead:
-
-                self.set_button(btn_ids[0], False)
-                if is_btns[1]:
-                    self.set_button(btn_ids[1], True)
-                else:
-                    self.set_axis(axis_hid, int(axis_amount * 0x8000))
-
-            else:
-                zero_axis(hand, axis)
+        self.set_axis(left_trigger, left_trigger_curve.sample(left_ctr.axis))
+        self.set_axis(right_trigger, right_trigger_curve.sample(right_ctr.axis))
 
         self.trackpadLX = left_ctr.trackpadX
         self.trackpadLY = left_ctr.trackpadY
 
-        convert_axis(left_ctr.trackpadX, left_ctr.trackpadY, 'left', 'left-right', 'down-up')
+        left_pov = self._pov_map['left']
+        if left_pov is None:
+            self._convert_axis_slots(left_ctr.trackpadX, left_ctr.trackpadY, left_x_slot, left_y_slot)
+        else:
+            self._convert_pov(left_ctr.trackpadX, left_ctr.trackpadY, left_pov)
 
         self.trackpadRX = right_ctr.trackpadX
         self.trackpadRY = right_ctr.trackpadY
 
-        convert_axis(right_ctr.trackpadX, right_ctr.trackpadY, 'right', 'left-right', 'down-up')
+        right_pov = self._pov_map['right']
+        if right_pov is None:
+            self._convert_axis_slots(right_ctr.trackpadX, right_ctr.trackpadY, right_x_slot, right_y_slot)
+        else:
+            self._convert_pov(right_ctr.trackpadX, right_ctr.trackpadY, right_pov)
@@ -12,15 +12,24 @@ import random
 import queue
 import struct
 import mmap
+import atexit
 
-from . import playsound, perf_time, MEDIA_DIR, IMAGE_DATA
+from . import playsound, perf_time, MEDIA_DIR, IMAGE_DATA, CONFIG_DIR, DEFAULT_CONFIG
 from steam_vr_wheel._virtualpad import VirtualPad, HandsImage
 from steam_vr_wheel.pyvjoy import HID_USAGE_X, FFB_CTRL, FFBPType, FFBOP
+from steam_vr_wheel.pyvjoy._sdk import FfbPacketRing, FfbDecoder
+from steam_vr_wheel._collision import CollisionWorld, Capsule, TorusBand
+from steam_vr_wheel._gates import GateMap
+from steam_vr_wheel._physics import WheelPhysics, WheelTorqueModel, damping_rate, per_second
+from steam_vr_wheel._ffb import FfbEffectEngine, FfbStats, FfbCapture, FfbShaper, FfbForceFilter, FfbHapticDetector
 from steam_vr_wheel.util import *
 from steam_vr_wheel.i18n import _I
 
 
 class HShifterImage:
+    # Degrees the knob turns at once to face the HMD
+    yaw_step = 1.0
+
     def __init__(self, wheel, x=0.25, y=-0.57, z=-0.15, degree=6, scale=100, alpha=100):
         self.vrsys = openvr.VRSystem()
         self.vroverlay = openvr.IVROverlay()
@@ -30,7 +39,6 @@ class HShifterImage:
         self.z = z
         self.size = 14 / 100
         self.degree = degree
-        self.pos = 3.5
         self.wheel = wheel
         self.config = self.wheel.config
 
@@ -41,37 +49,31 @@ class HShifterImage:
         self._snap_times = []
         self._snap_db_timer = None
         self._snap_ctr_offset = []
-        self._snap_tf = None
 
         self._xz = [0,0]
         self._last_haptic_xz = [0,0]
         self._knob_pos = [0,0,0]
 
+        # Stick and knob as a capsule of 6cm radius, moved along in render
+        self.collider = Capsule(0.06, (x, y, z), (x, y, z))
+
         self._one_tick_reset_pulse = False
         self._splitter_toggled = False
         self._range_toggled = False
         self._reverse_locked = True
 
         """
-        |-1  | 1  | 3  | 5  | 7  |  51 43 45 47 51   R 1 3 5 R
-        |-0.5| 1.5| 3.5| 5.5| 7.5|                   +-+-N-+-+
-        | 0  | 2  | 4  | 6  | 8  |  51 44 46 48 51   R 2 4 6 R
-
-        odd: towards -z
-        x2 is odd: no rotation
-        even: towards +z
-
-        x = (round(pos/2)-1) * ...
-        z_rot = ((pos%2 if pos%2 != 0 else 2)-1.5) * ...
+        R 1 3 5      gate [column, row] of the stick, see GateMap
+        +-+-N-+      column 0 is neutral, row -1 is towards -z
+        R 2 4 6      the buttons come from shifter_layouts
 
         49 splitter
         50 range
         """
         self._splitter_button = 49
         self._range_button = 50
-        self._pos_to_button = dict({-1:   51,   1:   43,   3:   45,   5:   47,   7:   51,
-                                    -0.5: None, 1.5: None, 3.5: None, 5.5: None, 7.5: None,
-                                     0:   51,   2:   44,   4:   46,   6:   48,   8:   51})
+        self.gates = None
+        self._gate = [0, 0]
         self._pressed_button = None
 
         # Create
@@ -95,8 +97,6 @@ class HShifterImage:
         self._neutral_instances = []
 
         # Images
-        self.slot_img = os.path.join(MEDIA_DIR, 'h_shifter_slot_7.png')
-        self.slot_img_seq = os.path.join(MEDIA_DIR, 'h_shifter_slot_seq.png')
         self._stick_img = os.path.join(MEDIA_DIR, 'h_shifter_stick_low.png')
         self._stick_img_2 = os.path.join(MEDIA_DIR, 'h_shifter_stick_high.png')
         self._knob_img = os.path.join(MEDIA_DIR, 'h_shifter_knob.png')
@@ -109,11 +109,6 @@ class HShifterImage:
         self._slot_v = 0.2
         check_result(self.vroverlay.setOverlayColor(self.slot, self._slot_v, self._slot_v, self._slot_v)) # default gray outline
         check_result(self.vroverlay.setOverlayAlpha(self.slot, alpha/100))
-        check_result(self.vroverlay.setOverlayWidthInMeters(self.slot, self.size)) # default 14cm
-        
-        # Set sequential
-        self.sequential = None
-        self.toggle_sequential(self.config.shifter_sequential)
 
         # Scale
         self.rescale(scale / 100)
@@ -139,26 +134,9 @@ class HShifterImage:
                                     [0.0, 0.0, 1.0, y],
                                     [0.0, -1.0, 0.0, z]]) # 90deg at X
 
-        # Set reverse orientation and its position
-        # _xz_rev represents where the reverse is in the coordinate system
-        if self.wheel.config.shifter_reverse_orientation == "Top Left":
-            self.slot_uv.vMax = 0.0
-            self.slot_uv.vMin = 1.0
-            self._xz_rev = [-2, -1]
-        elif self.wheel.config.shifter_reverse_orientation == "Bottom Left": # default
-            self._xz_rev = [-2, 1]
-        elif self.wheel.config.shifter_reverse_orientation == "Top Right":
-            self.slot_uv.uMax = 0.0
-            self.slot_uv.uMin = 1.0
-            self.slot_uv.vMax = 0.0
-            self.slot_uv.vMin = 1.0
-            self._xz_rev = [2, -1]
-        elif self.wheel.config.shifter_reverse_orientation == "Bottom Right":
-            self.slot_uv.uMax = 0.0
-            self.slot_uv.uMin = 1.0
-            self._xz_rev = [2, 1]
-
-        check_result(self.vroverlay.function_table.setOverlayTextureBounds(self.slot, openvr.byref(self.slot_uv)))
+        # Set sequential, which loads the gate layout and the slot image
+        self.sequential = None
+        self.toggle_sequential(self.config.shifter_sequential)
 
         ## Knob
         result, self.knob_tf = self.vroverlay.setOverlayTransformAbsolute(self.knob, openvr.TrackingUniverseSeated)
@@ -166,6 +144,7 @@ class HShifterImage:
         set_transform(self.knob_tf, [[1.0, 0.0, 0.0, x],
                                     [0.0, 1.0, 0.0, y+stick_height],
                                     [0.0, 0.0, 1.0, z]])
+        self._snap_tf = self.knob_tf # the hand holds the knob
 
         # Final
         fn = self.vroverlay.function_table.setOverlayTransformAbsolute
@@ -212,34 +191,15 @@ class HShifterImage:
         self.stick_uv.vMax = stick_scale
         check_result(self.vroverlay.function_table.setOverlayTextureBounds(self.stick, openvr.byref(self.stick_uv)))
 
-    def check_collision(self, ctr):
+        # The stick transform was made anew
+        self._render_key = None
 
-        r = self.collision_radius
-        p = np.array([ctr.x, ctr.y, ctr.z])
-        a = np.array([self.x_stick, self.y, self.z_stick])
-        b = np.array([self.x_knob, self.y_knob, self.z_knob])
-
-        ap = p - a
-        ab = b - a
-
-        l = np.dot(ap, ab) / np.dot(ab, ab)
-        l = max(0, min(1, l))
-        c = a + ab * l
-        cp = p - c
-
-        d = np.sqrt(np.dot(cp, cp))
-        return d <= r
-
-    def set_stick_xz_pos(self, xz_pos, ctr=None):
-        
-        self.pos = xz_pos[0]*2+3 + (xz_pos[1]+1)/2
-
-        is_button = self.pos in self._pos_to_button
+    def check_collision(self, ctr):
+        return self.collider.contains(ctr)
 
-        # Position that has button mapping
-        if is_button:
-            btn_id = self._pos_to_button[self.pos]
-            self._pressed_button = btn_id
+    def _set_gate(self, gate):
+        self._gate = gate
+        self._pressed_button = self.gates.button(gate)
 
     def lock_reverse(self):
         self._reverse_locked = True
@@ -258,13 +218,44 @@ class HShifterImage:
         
         self.config.shifter_sequential = self.sequential
 
-        # Reset position
-        self.set_stick_xz_pos([0,0])
+        # Release the gears of the last layout
+        if self.gates is not None:
+            for v in self.gates.buttons:
+                self.wheel.set_button(v, False)
 
-        if self.sequential:
-            check_result(self.vroverlay.setOverlayRaw(self.slot, *IMAGE_DATA[self.slot_img_seq]))
+        name = "Sequential" if self.sequential else self.config.shifter_layout
+        layout = self.config.shifter_layouts.get(name, DEFAULT_CONFIG['shifter_layouts'].get(name))
+        if layout is None:
+            print("Unknown shifter layout:", name)
+            layout = DEFAULT_CONFIG['shifter_layouts']["6+R"]
+        try:
+            self.gates = GateMap.from_config(layout, self.config.shifter_reverse_orientation)
+        except (KeyError, TypeError, ValueError) as e:
+            print("Invalid shifter layout:", name, e)
+            self.gates = GateMap.from_config(DEFAULT_CONFIG['shifter_layouts']["6+R"],
+                                             self.config.shifter_reverse_orientation)
+
+        # Reset position
+        self._set_gate([0, 0])
+
+        # The image has the locked columns at the bottom left, mirrored into place
+        uv = self.slot_uv
+        uv.uMin, uv.uMax, uv.vMin, uv.vMax = 0.0, 1.0, 0.0, 1.0
+        if self.gates.image:
+            image = IMAGE_DATA[os.path.join(MEDIA_DIR, self.gates.image)]
+            width = self.size # default 14cm
+            if self.gates.orientation.startswith("Top"):
+                uv.vMin, uv.vMax = 1.0, 0.0
+            if self.gates.orientation.endswith("Right"):
+                uv.uMin, uv.uMax = 1.0, 0.0
         else:
-            check_result(self.vroverlay.setOverlayRaw(self.slot, *IMAGE_DATA[self.slot_img]))
+            unit = 100
+            image = self.gates.draw(unit)
+            width = image[1] / unit * (self.size/4 - self.stick_width/2)
+
+        check_result(self.vroverlay.setOverlayRaw(self.slot, *image))
+        check_result(self.vroverlay.setOverlayWidthInMeters(self.slot, width))
+        check_result(self.vroverlay.function_table.setOverlayTextureBounds(self.slot, openvr.byref(uv)))
 
 
     def toggle_splitter(self, ctr):
@@ -315,22 +306,18 @@ class HShifterImage:
     def unsnap(self):
         self._snapped = False
 
-        if self.sequential:
-            if self.pos != 3.5:
+        if self.gates.spring:
+            if self._gate != [0, 0]:
                 self._neutral_instances.append(playsound(self._neutral_mp3,
                     block=False,
                     volume=self.config.sfx_volume/100))
 
-            self.set_stick_xz_pos([0,0])
+            self._set_gate([0, 0])
         else:
             if self._pressed_button is None:
-                self.set_stick_xz_pos([0,0])
+                self._set_gate([0, 0])
 
-        self._move_stick(self._xz_pos())
-
-    def _xz_pos(self):
-        # Convert pos to x and z
-        return [(ceil(self.pos/2)-2), ((self.pos%2 if self.pos%2 != 0 else 2)-1.5)*2]
+        self._move_stick(list(self._gate))
 
     def _move_stick(self, xz):
         self._xz = xz
@@ -343,83 +330,65 @@ class HShifterImage:
             xz = xz_override # This is for previewing the angle changes in edit mode
 
         unit = (self.size/4 - self.stick_width/2)
+        stick_height = self.stick_height
 
-        x_deg = self.degree * abs(xz[0])
-        z_deg = self.degree * abs(xz[1])
-        x_sin = sin(x_deg*pi/180) * self.stick_height
-        z_sin = sin(z_deg*pi/180) * self.stick_height
-        x_knob = self.x + xz[0] * unit + x_sin * (-1 if xz[0] < 0 else 1)
-        z_knob = self.z + xz[1] * unit + z_sin * (-1 if xz[1] < 0 else 1)
+        x_rad = self.degree * abs(xz[0]) * pi/180
+        z_rad = self.degree * abs(xz[1]) * pi/180
+        x_sign = -1 if xz[0] < 0 else 1
+        z_sign = -1 if xz[1] < 0 else 1
         x_stick = self.x + xz[0] * unit
         z_stick = self.z + xz[1] * unit
+        x_knob = x_stick + sin(x_rad) * stick_height * x_sign
+        z_knob = z_stick + sin(z_rad) * stick_height * z_sign
 
-        # 
+        # The knob faces the HMD, turned in steps so that a still shifter is left alone
         a = atan2(x_knob-hmd.x, z_knob-hmd.z)
-        yaw = a / pi * 180 + 180
-        
-        rot_knob = rotation_matrix(0, yaw, 0)
-        rot_stick = rotation_matrix(z_deg * (-1 if xz[1] < 0 else 1), 0, -x_deg * (-1 if xz[0] < 0 else 1))
-
-        y_knob = (self.y + self.stick_height - 
-            (abs(xz[1])*((1-cos((z_deg)*pi/180))*self.stick_height)) -
-            (abs(xz[0])*((1-cos((x_deg)*pi/180))*self.stick_height))
-            )
-
-        def rot_dot_tf(rot, hmd34, local=None):
-            tf = np.eye(4)
-            for i in range(3):
-                tf[i][3] = hmd34[i][3] # discard original rot
+        yaw_step = round((a / pi * 180 + 180) / self.yaw_step)
 
-            r = np.eye(4)
-            r[0:3, 0:3] = rot
-            d = np.dot(tf, r)
+        key = (xz[0], xz[1], yaw_step, self.stick_scale, self.degree, self.x, self.y, self.z)
+        if key == self._render_key:
+            return
+        self._render_key = key
 
-            if local is not None:
-                r[0:3, 0:3] = local
-                d = np.dot(d, r)
+        yaw = yaw_step * self.yaw_step * pi/180
+        cy, sy = cos(yaw), sin(yaw)
 
-            for i in range(3):
-                for j in range(4):
-                    hmd34[i][j] = d[i,j]
+        y_knob = (self.y + stick_height -
+            (abs(xz[1])*((1-cos(z_rad))*stick_height)) -
+            (abs(xz[0])*((1-cos(x_rad))*stick_height))
+            )
 
+        # Knob: rotation_matrix(0, yaw, 0) at the knob
+        m = self.knob_tf.m
+        m[0][:] = (cy, 0.0, sy, x_knob)
+        m[1][:] = (0.0, 1.0, 0.0, y_knob)
+        m[2][:] = (-sy, 0.0, cy, z_knob)
         self._knob_pos[0] = x_knob
         self._knob_pos[1] = y_knob
         self._knob_pos[2] = z_knob
-        self.knob_tf[0][3] = x_knob
-        self.knob_tf[1][3] = y_knob
-        self.knob_tf[2][3] = z_knob
-        rot_dot_tf(rot_knob, self.knob_tf)
-
-        offset_stick = np.dot(rot_stick, (0, self.stick_height/2, 0))
-        self.stick_tf[0][3] = x_stick + offset_stick[0]
-        self.stick_tf[1][3] = self.y + offset_stick[1]
-        self.stick_tf[2][3] = z_stick + offset_stick[2]
-        scale_stick = np.eye(3)
-        scale_stick[2,2] = self.stick_scale
-        local_stick = np.dot(scale_stick, rot_knob) 
-        rot_dot_tf(rot_stick, self.stick_tf, local_stick)
-
-        self.slot_tf[0][3] = self.x
-        self.slot_tf[1][3] = self.y
-        self.slot_tf[2][3] = self.z
+
+        # Stick: tilted by rotation_matrix(z_sign * z_deg, 0, -x_sign * x_deg) about its foot,
+        # times the knob rotation with z scaled; r0 to r2 are the tilt rows without the zeros
+        c1, s1 = cos(z_rad), sin(z_rad) * z_sign
+        c3, s3 = cos(x_rad), -sin(x_rad) * x_sign
+        r00, r01 = c3, -s3
+        r10, r11, r12 = c1*s3, c1*c3, -s1
+        r20, r21, r22 = s1*s3, c3*s1, c1
+        h2 = stick_height / 2
+        ssy = self.stick_scale * sy
+        scy = self.stick_scale * cy
+        m = self.stick_tf.m
+        m[0][:] = (r00*cy, r01, r00*sy, x_stick + r01*h2)
+        m[1][:] = (r10*cy - r12*ssy, r11, r10*sy + r12*scy, self.y + r11*h2)
+        m[2][:] = (r20*cy - r22*ssy, r21, r20*sy + r22*scy, z_stick + r21*h2)
+
+        m = self.slot_tf.m
+        m[0][3] = self.x
+        m[1][3] = self.y
+        m[2][3] = self.z
 
         # Bounds
-        coll_radius = 0.06 # 6cm radius for collision; collision shape is capsule
-        self.collision_radius = coll_radius
-
-        self.x_knob = x_knob
-        self.y_knob = y_knob
-        self.z_knob = z_knob
-        self.x_stick = x_stick
-        self.z_stick = z_stick
-
-        # Set snap transform
-        ctr = self._snap_ctr
-        self._snap_tf = openvr.HmdMatrix34_t()
-        self._snap_tf[0][3] = x_knob
-        self._snap_tf[1][3] = y_knob
-        self._snap_tf[2][3] = z_knob
-        rot_dot_tf(rot_knob, self._snap_tf)
+        self.collider.set((x_stick, self.y, z_stick), (x_knob, y_knob, z_knob))
 
         fn = self.vroverlay.function_table.setOverlayTransformAbsolute
         fn(self.slot, openvr.TrackingUniverseSeated, openvr.byref(self.slot_tf))
@@ -451,17 +420,16 @@ class HShifterImage:
 
         if self._one_tick_reset_pulse:
             self._one_tick_reset_pulse = False
-            for v in self._pos_to_button.values():
-                if v is not None:
-                    self.wheel.set_button(v, False)
+            for v in self.gates.buttons:
+                self.wheel.set_button(v, False)
 
             self.wheel.set_button(self._splitter_button, not self._splitter_toggled)
             self.wheel.set_button(self._range_button, not self._range_toggled)
 
             return
 
-        for v in self._pos_to_button.values():
-            if v != self._pressed_button and v is not None:
+        for v in self.gates.buttons:
+            if v != self._pressed_button:
                 self.wheel.set_button(v, False)
         if self._pressed_button is not None:
             self.wheel.set_button(self._pressed_button, True)
@@ -488,107 +456,13 @@ class HShifterImage:
                         0,
                         dp_unsafe[2] / (u_sin + unit)]
 
-            # Sequential
-            if self.sequential:
-                dp_unsafe[0] = 0 # Drop x
-
-            # Consider reverse
-            if self._xz_rev[0] == -2:
-                # Left side reverse
-                # clamp x [-2, 1]
-                xz_ctr = np.array([
-                    max(min(dp_unsafe[0], 1.0), -2.0),
-                    max(min(dp_unsafe[2], 1.0), -1.0)])
-            else:
-                # Right side reverse
-                # clamp x [-1, 2]
-                xz_ctr = np.array([
-                    max(min(dp_unsafe[0], 2.0), -1.0),
-                    max(min(dp_unsafe[2], 1.0), -1.0)])
-
-            # Top-bottom side clamper
-            # Top side = min
-            # Bottom side = max
-            xz_rev_z_clamper = max if self._xz_rev[1] == 1 else min
-
-            x_mid_margin = 0.55
-            z_end_margin = 0.8
-            z_mid_margin = 0.55
-
-            in_middle = abs(xz_ctr[1]) <= z_mid_margin
-
-            xz_pos_0 = self._xz_pos()
-            xz_pos_1 = xz_pos_0.copy()
-            xz_0 = self._xz
-            xz_1 = xz_0.copy()
-            if in_middle:
-                xz_pos_1[1] = 0 # Set to Neutral
-
-                xz_1[0] = xz_ctr[0]
-                xz_1[1] = xz_ctr[1]
-                abs_xz_ctr_0 = abs(xz_ctr[0])
-                if abs_xz_ctr_0 >= 1:
-                    if xz_ctr[0] * self._xz_rev[0] > 0:
-                        xz_rev_0__2 = self._xz_rev[0]/2
-
-                        if self._reverse_locked and xz_pos_0[0] != self._xz_rev[0]:
-                            xz_1[0] = xz_rev_0__2
-                            xz_pos_1[0] = xz_rev_0__2
-                        else:
-                            if abs_xz_ctr_0 < 2:
-                                xz_1[1] = 0
-
-                                xz_pos_1[0] = xz_rev_0__2
-                            else:
-                                xz_1[1] = xz_rev_z_clamper(0, xz_1[1])
-
-                                xz_pos_1[0] = self._xz_rev[0]
-                    else:
-                        s = 1
-                        if xz_ctr[0] < 0:
-                            s = -1
-                        xz_1[0] = s
-                        xz_pos_1[0] = s
-                elif abs(xz_ctr[0]) <= x_mid_margin:
-                    if abs(xz_ctr[0]) < abs(xz_ctr[1]):
-                        xz_1[0] = 0
-                    else:
-                        xz_1[1] = 0
-                    xz_pos_1[0] = 0
-                else:
-                    xz_1[1] = 0
-            else:
-                xz_1[0] = xz_pos_0[0]
-
-                if xz_pos_0[0] == self._xz_rev[0]: # reverse
-                    xz_1[1] = xz_rev_z_clamper(0, xz_ctr[1])
-                    if self._xz_rev[1] == 1:
-                        if xz_ctr[1] > z_end_margin:
-                            xz_pos_1[1] = 1
-                        else:
-                            pass
-                            #xz_pos_1[1] = 0
-                    else:
-                        if xz_ctr[1] < -z_end_margin:
-                            xz_pos_1[1] = -1
-                        else:
-                            pass
-                            #xz_pos_1[1] = 0
-
-                else:
-                    xz_1[1] = xz_ctr[1]
-                    if xz_ctr[1] < -z_end_margin:
-                        xz_pos_1[1] = -1
-                    elif xz_ctr[1] > z_end_margin:
-                        xz_pos_1[1] = 1
-                    else:
-                        pass
-                        #xz_pos_1[1] = 0
+            gate_0 = self._gate
+            xz_1, gate_1 = self.gates.resolve(dp_unsafe[0], dp_unsafe[2], gate_0, self._reverse_locked)
 
             # Restrain haptic
             restrained_margin = 2 # note that this is proportional value not 2 meters
-            r_var1 = abs(dp_unsafe[0]-xz_pos_1[0])
-            r_var2 = abs(dp_unsafe[2]-xz_pos_1[1])
+            r_var1 = abs(dp_unsafe[0]-gate_1[0])
+            r_var2 = abs(dp_unsafe[2]-gate_1[1])
             for rv in (r_var1, r_var2):
                 if rv > restrained_margin:
                     h = (rv-restrained_margin) / 1.5
@@ -599,13 +473,13 @@ class HShifterImage:
             hpt_xz = self._last_haptic_xz
 
             # Check gear changed or else check hapitc
-            if xz_pos_0 != xz_pos_1:
+            if gate_0 != gate_1:
                 # Position changed
                 # Reset double tap in order to prevent triggering splitter during fast gear change
                 self._reset_double_tap()
 
                 # Gear changed
-                if xz_pos_1[1] != 0:
+                if gate_1[1] != 0:
                     #openvr.VRSystem().triggerHapticPulse(ctr.id, 0, 3000)
                     #ctr.haptic([0.3, lambda t: 1.0 if t < 0.1 else math.exp(-10*(t-0.1)) if t < 1 else 0.0])
 
@@ -621,15 +495,15 @@ class HShifterImage:
                             playsound(None, stop_alias=i)
                         self._neutral_instances = []
 
-                        playsound(self._change_mp3_2 if xz_pos_1[1] == -1 else self._change_mp3_1,
+                        playsound(self._change_mp3_2 if gate_1[1] == -1 else self._change_mp3_1,
                             block=False,
                             volume=self.config.sfx_volume/100)
 
                         self._last_change_play = now
 
-                elif xz_pos_1[1] == 0: # Move to the middle row
+                elif gate_1[1] == 0: # Move to the middle row
 
-                    if self.sequential:
+                    if self.gates.spring:
                         # Notify the user of netural when in sequential mode
                         ctr.haptic([None, 1])
 
@@ -648,7 +522,7 @@ class HShifterImage:
                 #openvr.VRSystem().triggerHapticPulse(ctr.id, 0, 1500)
 
             self._move_stick(xz_1)
-            self.set_stick_xz_pos(xz_pos_1)
+            self._set_gate(gate_1)
 
 
     def _reset_double_tap(self):
@@ -733,12 +607,6 @@ class SteeringWheelImage:
 
 
 
-class GrabControllerPoint(Point):
-    def __init__(self, x, y, z, id=0):
-        super().__init__(x, y, z)
-        self.id = id
-
-
 class Wheel(VirtualPad):
     def __init__(self, inertia=0.95, center_speed=pi/180):
         super().__init__()
@@ -750,36 +618,69 @@ class Wheel(VirtualPad):
         self.is_edit_mode = False
         x, y, z = self.config.wheel_center
         size = self.config.wheel_size
-        self._inertia = inertia
-        self._center_speed = center_speed  # radians per frame, force which returns wheel to center when not grabbed
-        self._center_speed_ffb_mags = np.zeros(60)
+        # inertia and center_speed are per frame at 60 Hz, physics runs on real time
+        self._torque = None
+        if self.config.wheel_physics_model == "Torque":
+            # Keys left out of the config keep their defaults
+            self._torque = {**DEFAULT_CONFIG['wheel_torque'], **self.config.wheel_torque}
+            self._physics = WheelTorqueModel(
+                self._torque["inertia"], self._torque["damping"], self._torque["friction"],
+                self._torque["hand_stiffness"], self._torque["hand_damping"],
+                rate=self.config.wheel_physics_hz)
+        else:
+            self._physics = WheelPhysics(damping_rate(inertia), rate=self.config.wheel_physics_hz)
+        self._physics.lock(self.config.wheel_degrees / 360 * pi, self.config.wheel_soft_lock * pi / 180)
+        self._physics_t = time.perf_counter()
+        self._center_speed = per_second(center_speed)  # radians per second, force which returns wheel to center when not grabbed
 
         # FFB
+        # The driver thread only queues raw packets; they are decoded and handled
+        # on this thread at the start of every update, see ffb_drain
         if self.config.wheel_ffb:
-            self.ffb_paused = False
-            self.device.ffb_callback(self.ffb_callback)
+            self.ffb_init()
+            self.device.ffb_queue(self._ffb_ring)
 
         self.x = 0  # -1 0 1
         self._wheel_angles = deque(maxlen=10)
         self._wheel_angles.append(0)
         self._wheel_angles.append(0)
-        self._snapped = False
-
-        self._rot = rotation_matrix(-self.config.wheel_pitch, 0, 0)
-        self._rot_inv = rotation_matrix(self.config.wheel_pitch, 0, 0)
-
-        # Center crossing smoothing
-        self._last_non_centerlimit_pos = None
-        self._centerlimit_radius = 0.08
 
-        # radians per frame last turn speed when wheel was being held, gradually decreases after wheel is released
-        self._turn_speed = 0
+        # Controllers in wheel space, refreshed once per frame by refresh_wheel_space
+        self._ws_sources = (None, None)
+        self._ws_points = (Point(0, 0, 0), Point(0, 0, 0))
+
+        # Steering response
+        self._steering_curve = AxisCurve.from_config(self.config.axis_curve_steering, out=vjoy_centered)
+        self._steering_scale = -360 / (pi * self.config.wheel_degrees)
+
+        # Speed sensitive steering and centering, tables sampled by speed_update
+        self._speed = 0.0 # km/h, set from telemetry
+        self._speed_centering = 1.0
+        self._speed_curves = None
+        if self.config.wheel_speed_source != "Off":
+            self._speed_curves = (
+                SpeedCurve(self.config.wheel_speed_steering, scale=self._steering_scale / 100),
+                SpeedCurve(self.config.wheel_speed_centering, scale=1 / 100))
+            if self.config.wheel_speed_source == "AC":
+                from steam_vr_wheel._bike import ac_telemetry_loop
+                def speed_callback(spd):
+                    self._speed = spd
+
+                thread = threading.Thread(target=ac_telemetry_loop, args=(speed_callback,), daemon=True)
+                thread.start()
+
+        # Wheel angle from the hands on it, see _wheel_update
+        self._rim_fit = RotationFit(self.config.wheel_grip_samples, size / 2)
+        self._rim_held = False
+
+        # Grabbable objects, placed by their owners; see check_colliding_object
+        self.collision = CollisionWorld()
+        self._wheel_collider = TorusBand(0, 0, 0.075)
 
         self.wheel_image = SteeringWheelImage(x=x, y=y, z=z, size=size, alpha=self.config.wheel_alpha)
         self.center = Point(x, y, z)
         self.size = size
-        self._grab_started_point = None
-        self._wheel_grab_offset = 0
+        self.update_wheel_transform()
 
         # for manual grab:
         self._grip_queue = queue.Queue()
@@ -797,302 +698,145 @@ class Wheel(VirtualPad):
                             degree=self.config.shifter_degree)
         self._shifter_button_lock = threading.Lock()
 
+        # The shifter knob is tested first, it sits close to the rim
+        self.collision.add('shifter', self.h_shifter_image.collider, priority=0)
+        self.collision.add('wheel', self._wheel_collider, priority=1)
+
         # (ETS2)
         self._ets2_last_hand_cl = 1
 
-    def ffb_callback(self, data):
-
-        now = time.time()
-        if hasattr(self, "_ffb_last_now") == False:
-            self._ffb_last_now = now
-            self._ffb_gain_coef = 1.0
-            self._ffb_effects = dict()
-
-            self._ffb_test_dir_map = dict()
-            self._ffb_test_t = now - 20.0
-            self._ffb_test_unhandled = dict()
-            self._ffb_test_handled = dict()
-
-        class Effect:
-            start = 0
-            data = dict()
-
-        def norm_gain(g):
-            g /= 0xFF
-            return g
-
-        def _ffb_test_f(handled, t, sub=None):
-            k = str(t)
-            if sub is not None:
-                k += "-" + str(sub)
-
-            d = self._ffb_test_handled if handled else self._ffb_test_unhandled
-            if not k in d:
-                d[k] = 0
-            d[k] += 1
-
-        # Elapsed and frequency
-        elapsed = now-self._ffb_last_now
-        self._ffb_last_now = now
-        
-        # Handle raw data
-        if True:
-
-            typ = data['Type']
-
-            # Effect
-            effect = None
-            ebi = None
-            if "EBI" in data:
-                ebi = data["EBI"]
-                if ebi in self._ffb_effects:
-                    effect = self._ffb_effects[ebi]
-                else:
-                    effect = Effect()
-                    self._ffb_effects[ebi] = effect
-            
-            # Gain
-            if typ == FFBPType.PT_GAINREP:
-                self._ffb_gain_coef = norm_gain(data['Gain'])
-                #print(f"New global FFB gain coefficient is {self._ffb_gain_coef} raw gain is {data['Gain']}")
-
-                _ffb_test_f(True, typ)
-
-            #FFBPType.PT_EFOPREP 10
-            elif typ == FFBPType.PT_EFOPREP:
-                op = data['EffOp']['EffectOp']
-                if op == FFBOP.EFF_START or op == FFBOP.EFF_SOLO:
-
-                    effect.start = now
-                    effect.data.update(data)
-                    _ffb_test_f(True, FFBPType.PT_EFOPREP, op)
-
-                elif op == FFBOP.EFF_STOP:
-
-                    del self._ffb_effects[ebi]
-                    _ffb_test_f(True, FFBPType.PT_EFOPREP, op)
-
-            #FFBPType.PT_EFFREP
-            elif typ == FFBPType.PT_EFFREP:
-
-                effect.data.update(data)
-
-                # [TEST] Dir map
-                rep = data["Eff_Report"]
-                self._ffb_test_dir_map["DirX %d" % rep["DirX"]] = 0
-                self._ffb_test_dir_map["Direction %d" % rep["Direction"]] = 0
-
-                _ffb_test_f(True, FFBPType.PT_EFFREP)
-
-            #FFBPType.PT_CONSTREP
-            elif typ == FFBPType.PT_CONSTREP:
-
-                effect.data.update(data)
-                _ffb_test_f(True, FFBPType.PT_CONSTREP)
-            
-            #FFBPType.PT_PRIDREP
-            elif typ == FFBPType.PT_PRIDREP:
-                _ffb_test_f(False, FFBPType.PT_PRIDREP)
-
-            #FFBPType.PT_CTRLREP
-            elif typ == FFBPType.PT_CTRLREP:
-                ctrl = data['DevCtrl']
-                if ctrl in [FFB_CTRL.CTRL_STOPALL, FFB_CTRL.CTRL_DEVRST]:
-
-                    self._center_speed_ffb_mags[:] = 0
-                    self._ffb_effects = dict()
-
-                    _ffb_test_f(True, FFBPType.PT_CTRLREP, ctrl)
-
-                elif ctrl == FFB_CTRL.CTRL_DEVPAUSE:
-
-                    self.ffb_paused = True
-                    self._ffb_pause_start = now
-
-                    _ffb_test_f(True, FFBPType.PT_CTRLREP, ctrl)
-
-                elif ctrl == FFB_CTRL.CTRL_DEVCONT:
-                    self.ffb_paused = False
-
-                    since_pause = now - self._ffb_pause_start
-
-                    for v in self._ffb_effects.values():
-                        v.start += since_pause
-
-                    _ffb_test_f(True, FFBPType.PT_CTRLREP, ctrl)
-                else:
-                    _ffb_test_f(False, FFBPType.PT_CTRLREP, ctrl)
-
-            else:
-                """
-                if typ not in [
-                    FFBPType.PT_CONSTREP,
-                    FFBPType.PT_CTRLREP,
-                    FFBPType.PT_EFOPREP,
-                    FFBPType.PT_CONDREP,
-                    FFBPType.PT_PRIDREP,
-                    FFBPType.PT_EFFREP,
-                    FFBPType.PT_GAINREP,
-                    ]:
-                """
-                _ffb_test_f(False, typ)
-
-        if False: #now - self._ffb_test_t > 30.0:
-            '''
-            [TEST] FFB behaviors
-            NO  {'17': 1, '11': 1}
-            YES {'12-3': 2, '12-4': 2, '13': 1, '5': 22659, '1': 22548, '10-1': 22547, '10-3': 104}
-            Dir {'DirX 63': 0, 'Direction 63': 0}
-            '''
-            
-            print("[TEST] FFB behaviors",
-                "\n  NO ", self._ffb_test_unhandled,
-                "\n  YES", self._ffb_test_handled,
-                "\n  Dir", self._ffb_test_dir_map)
-            self._ffb_test_t = now
-
-        
-        # Calc magnitude
-        sum_m = 0
-        if self.ffb_paused == False:
-            
-            solo = False
-            for k in list(self._ffb_effects.keys()):
-                e = self._ffb_effects[k]
-                d = e.data
-
-                # Check if effect is ended
-                ended = False
-                lc = deep_get(d, ["EffOp", "LoopCount"])
-                if lc == None:
-                    pass
-                elif lc == 0:
-                    pass
-                elif lc > 0:
-                    duration = deep_get(d, ["Eff_Report", "Duration"])
-
-                    if duration == 0xFFFF:
-                        pass
-                    elif duration == None:
-                        pass
-                    else:
-                        ended = now > e.start + lc * duration/1000.0
-
-                if ended:
-                    del self._ffb_effects[k]
-                    continue
-
-                if solo:
-                    continue
-
-                # Get magnitude per effect type
-                m = 0
-                if "Eff_Constant" in d:
-                    m = d['Eff_Constant']['Magnitude'] / 10000.0
-
-                # Get Coef and consider its own gain
-                own_coef = deep_get(d, ["Eff_Report", "Gain"], 0xFF)
-                own_coef = norm_gain(own_coef)
-                coef = self._ffb_gain_coef * own_coef 
-
-                # Sum
-                m *= coef 
-                sum_m += m
-
-                # If solo effect, remove other effects' influence
-                if deep_get(d, ["EffOp", "EffectOp"]) == FFBOP.EFF_SOLO:
-                    sum_m = m
-                    solo = True
+    def ffb_init(self):
+        self.ffb_paused = False
+        self._ffb_ring = FfbPacketRing()
+        self._ffb_decode = FfbDecoder().decode
+        self._ffb_engine = FfbEffectEngine()
+        self._ffb_stats = FfbStats()
+        self._ffb_stats_t = time.perf_counter()
+
+        # Output shaping of the summed force
+        profile = self.config.wheel_ffb_profiles.get(self.config.wheel_ffb_profile)
+        if profile is None:
+            print("Unknown FFB profile:", self.config.wheel_ffb_profile)
+            profile = dict()
+        self._ffb_shaper = FfbShaper.from_config(profile)
+
+        # Filtered force, what the wheel and haptics feel
+        self._ffb_force = FfbForceFilter(tau=self.config.wheel_ffb_filter_ms / 1000,
+                                         mode=self.config.wheel_ffb_filter)
+        self._ffb_haptic = FfbHapticDetector(bands=self.config.wheel_ffb_haptic_bands)
+
+        # Wheel state seen by condition effects, in vJoy axis units
+        self._ffb_step_t = time.perf_counter()
+        self._ffb_position = 0.0
+        self._ffb_velocity = 0.0
+
+        # Raw packets to a file for offline replay, see bench.py
+        self._ffb_capture = None
+        if self.config.wheel_ffb_capture:
+            path = os.path.join(CONFIG_DIR, self.config.wheel_ffb_capture)
+            self._ffb_capture = FfbCapture(path)
+            # The rest of the buffer is lost otherwise when the process ends
+            atexit.register(self._ffb_capture.close)
+            print("FFB capture:", os.path.normpath(path))
+
+    def ffb_drain(self):
+        # Handles the packets queued since the last update, in order
+        # Reports replaced by later ones are skipped, unless everything is being captured
+        n = self._ffb_ring.drain(self._ffb_handle_raw, coalesce=self._ffb_capture is None)
+        self._ffb_stats.coalesced = self._ffb_ring.coalesced
+        return n
+
+    def _ffb_handle_raw(self, address, t):
+        if self._ffb_capture is not None:
+            self._ffb_capture.write(address, t)
+        packet = self._ffb_decode(address)
+        if packet is not None and packet.DeviceID == self.device.rID:
+            self.ffb_callback(packet, t)
+
+    def ffb_callback(self, packet, now=None):
+        # packet is an FfbPacket that gets reused; the engine copies what it needs
+        # now is when the packet arrived, as time.perf_counter()
+
+        start = time.perf_counter()
+        if now is None:
+            now = start
+
+        handled = self._ffb_engine.handle(packet, now)
+        self.ffb_paused = self._ffb_engine.paused
+
+        if packet.Type == FFBPType.PT_CTRLREP and \
+                packet.DevCtrl in [FFB_CTRL.CTRL_STOPALL, FFB_CTRL.CTRL_DEVRST]:
+            self._ffb_force.reset()
+            self._ffb_haptic.reset()
+
+        self._ffb_stats.count(packet, handled, time.perf_counter() - start)
+        return handled
+
+    def ffb_stats(self):
+        # Packet counts, rate and handling times, see FfbStats.stats, plus
+        # packets dropped on a full queue and clip count
+        stats = self._ffb_stats.stats()
+        stats['dropped'] = self._ffb_ring.dropped
+        stats['clips'] = self._ffb_shaper.clips
+        return stats
+
+    def ffb_step(self, now):
+        # Evaluates the playing effects once per update
+        if self.ffb_paused:
+            return
 
-            # Make value smooth overall
-            prev_m = self._center_speed_ffb_mags[0]
-            alpha = 0.3
-            smoothed_m = alpha * sum_m + (1 - alpha) * prev_m
+        # Position, velocity and acceleration of the wheel for condition effects
+        dt = max(now - self._ffb_step_t, 1e-3)
+        position = self._wheel_angles[-1] * self._steering_scale
+        velocity = (position - self._ffb_position) / dt
+        acceleration = (velocity - self._ffb_velocity) / dt
+        self._ffb_step_t = now
+        self._ffb_position = position
+        self._ffb_velocity = velocity
 
-            self._center_speed_ffb_mags[1:] = self._center_speed_ffb_mags[:-1]
-            self._center_speed_ffb_mags[0] = smoothed_m
+        force = self._ffb_engine.evaluate(now, position, velocity, acceleration)
+        self._ffb_force.push(now, self._ffb_shaper.sample(force))
 
 
     def point_in_holding_bounds(self, point):
         # Checking for auto grabbing
-        point = self.to_wheel_space(point)
-
-        a = self.size/2 + 0.06
-        b = self.size/2 - 0.10
-
-        x = point.x - self.center.x
-        y = point.y - self.center.y
-        z = point.z - self.center.z
+        return self._wheel_collider.contains(point)
 
-        if abs(z) < 0.075:
-            distance = sqrt(x**2+y**2)
-            if distance < b:
-                return False
-            if distance < a:
-                return True
-        else:
-            return False
-
-    def _subtract_and_rotate(self, point, mat):
-
-        diff = np.array([point.x-self.center.x,
-                        point.y-self.center.y,
-                        point.z-self.center.z])
-        l = np.dot(mat, diff)
-        l[0] += self.center.x
-        l[1] += self.center.y
-        l[2] += self.center.z
-        return Point(l[0], l[1], l[2])
+    def update_wheel_transform(self):
+        # Call whenever the wheel center, size or pitch changes
+        pitch = self.config.wheel_pitch * pi / 180
+        self._pitch_cos = cos(pitch)
+        self._pitch_sin = sin(pitch)
+        self._rot = rotation_matrix(-self.config.wheel_pitch, 0, 0)
+        # Holding band from 10cm inside the rim to 6cm outside, 7.5cm either side
+        self._wheel_collider.inner = self.size/2 - 0.10
+        self._wheel_collider.outer = self.size/2 + 0.06
+        self._wheel_collider.place(self.center, self._pitch_cos, self._pitch_sin)
+        self._rim_fit.resize(self.size/2)
+        self.refresh_wheel_space(*self._ws_sources)
+
+    def refresh_wheel_space(self, left_ctr, right_ctr):
+        # Both controllers go to wheel space once per frame, to_wheel_space returns the cached points
+        # for them; these are reused, read them within the frame
+        self._ws_sources = (left_ctr, right_ctr)
+        for ctr, out in zip(self._ws_sources, self._ws_points):
+            if ctr is not None:
+                rotate_about_x(ctr, self.center, self._pitch_cos, self._pitch_sin, out)
 
     def to_wheel_space(self, point):
-        return self._subtract_and_rotate(point, self._rot_inv)
+        if point is self._ws_sources[0]:
+            return self._ws_points[0]
+        if point is self._ws_sources[1]:
+            return self._ws_points[1]
+        return rotate_about_x(point, self.center, self._pitch_cos, self._pitch_sin)
 
     def to_absolute_space(self, point):
-        return self._subtract_and_rotate(point, self._rot)
-
-    def unwrap_wheel_angles(self):
-        period = 2 * pi
-        angle = np.array(self._wheel_angles, dtype=float)
-        diff = np.diff(angle)
-        diff_to_correct = (diff + period / 2.) % period - period / 2.
-        increment = np.cumsum(diff_to_correct - diff)
-        angle[1:] += increment
-        self._wheel_angles[-1] = angle[-1]
-
-    def wheel_raw_angle(self, point):
+        return rotate_about_x(point, self.center, self._pitch_cos, -self._pitch_sin)
 
+    def wheel_plane_point(self, point):
+        # point on the plane of the wheel, from its center
         point = self.to_wheel_space(point)
-        a = float(point.y) - self.center.y
-        b = float(point.x) - self.center.x
-
-        angle = atan2(a, b)
-        return angle
-
-    def wheel_double_raw_angle(self, left_ctr, right_ctr):
-        left_ctr = self.to_wheel_space(left_ctr)
-        right_ctr = self.to_wheel_space(right_ctr)
-        a = left_ctr.y - right_ctr.y
-        b = left_ctr.x - right_ctr.x
-
-        return atan2(a, b)
-
-    def ready_to_unsnap(self, l, r):
-        l = self.to_wheel_space(l)
-        r = self.to_wheel_space(r)
-
-        d = (l.x - r.x)**2 + (l.y - r.y)**2 + (l.z - r.z)**2
-
-        if d > self.size**2:
-            return True
-
-        dc = ((self.center.x - (l.x+r.x)/2)**2
-              + (self.center.y - (l.y+r.y)/2)**2
-              + (self.center.z - (l.z+r.z)/2)**2
-              )
-        if dc > self.size**2:
-            return True
-
-        return False
+        return (point.x - self.center.x, point.y - self.center.y)
 
     def set_button_unpress(self, button, hand):
         super().set_button_unpress(button, hand)
@@ -1129,134 +873,99 @@ class Wheel(VirtualPad):
 
 
     def _wheel_update(self, left_ctr, right_ctr):
+        # Angle the hands on the wheel turn it to, None without hands; one or two hands
+        # alike, fitted over the last wheel_grip_samples frames by RotationFit
         left_bound = self._hand_snaps['left'][:5] == 'wheel'
         right_bound = self._hand_snaps['right'][:5] == 'wheel'
 
-        if right_bound and left_bound and not self._snapped:
-            self.is_held([left_ctr, right_ctr])
-
-        if self._snapped: # Both hands attached
-            self._last_non_centerlimit_pos = None # Remove the pivot point
-
-            angle = self.wheel_double_raw_angle(left_ctr, right_ctr) + self._wheel_grab_offset
-            return angle
-
-        if right_bound:
-            controller = right_ctr
-            self.is_held(controller)
-        elif left_bound:
-            controller = left_ctr
-            self.is_held(controller)
-        else: # No hands
-            self._last_non_centerlimit_pos = None # Remove the pivot point
-
-            self.is_not_held()
+        if not (left_bound or right_bound):
+            self._rim_held = False
             return None
-        
-        # Prevent abrupt turn when the hand goes across the center
-        raw_angle = self.wheel_raw_angle(controller)
-        ctr_wheel = self.to_wheel_space(controller)
-        l = sqrt((self.center.x-ctr_wheel.x)**2+
-                (self.center.y-ctr_wheel.y)**2)
-        limit = self._centerlimit_radius # 0.08 = 8cm from center
-
-        if l <= limit:
-            if self._last_non_centerlimit_pos is None:
-                # Pivot point has to be reset when the number of attached hands is no longer 1 (that is, 0 or 2)
-                # otherwise, it turns abruptly when a new one-hand grab starts in a constrained area because the pivot point is irrelevantly set
-                self._last_non_centerlimit_pos = Point(controller.x, controller.y, controller.z)
-
-            pivot_angle = self.wheel_raw_angle(self._last_non_centerlimit_pos)
-            d = ((raw_angle - pivot_angle) + pi) % (2*pi) - pi
-            raw_angle = pivot_angle + d * (l/limit)**2
-        else:
-            # Update the pivot point while the hand is grabbing the wheel and outside the constrained area
-            self._last_non_centerlimit_pos = Point(controller.x, controller.y, controller.z)
-
-        angle = raw_angle + self._wheel_grab_offset
-        return angle
 
-    def calculate_grab_offset(self, raw_angle=None):
+        if not self._rim_held:
+            # Taking hold of the wheel where it is
+            self._rim_held = True
+            self._rim_fit.reset(self._wheel_angles[-1])
 
-        # Calculates the angular offset from raw_angle to the most recent angle of wheel
+        return self._rim_fit.update((
+            self.wheel_plane_point(left_ctr) if left_bound else None,
+            self.wheel_plane_point(right_ctr) if right_bound else None))
 
-        if raw_angle is None:
-            raw_angle = self.wheel_raw_angle(self._grab_started_point)
-        self._wheel_grab_offset = self._wheel_angles[-1] - raw_angle
+    def inertia(self, held, dt):
 
-    def is_held(self, controller):
+        # inertia simulates inertia done to the wheel
+        # the hands set the angle while held, otherwise the wheel spins on and centers over dt seconds
 
-        # is_held, NOT like its name, puts the passed controllers into "held" state
-        # TODO make this set_held or revise how held state is handled
+        if self._torque is not None:
+            self.torque_step(held, dt)
+            return
 
-        if isinstance(controller, list):
-            self._snapped = True
-            angle = self.wheel_double_raw_angle(controller[0], controller[1])
-            self.calculate_grab_offset(angle)
-            self._grab_started_point = None
+        if held:
+            self._wheel_angles[-1] = self._physics.hold(self._wheel_angles[-1], dt)
             return
 
-        if self._grab_started_point is None or self._grab_started_point.id != controller.id:
-            self._grab_started_point = GrabControllerPoint(controller.x, controller.y, controller.z, controller.id)
-            self.calculate_grab_offset()
+        drift, pull = 0.0, 0.0
+        if (self._hand_snaps['left'][:5] != 'wheel') and (self._hand_snaps['right'][:5] != 'wheel'):
+            drift, pull = self.center_force()
+        self._wheel_angles.append(self._physics.step(dt, drift, pull))
 
-    def is_not_held(self):
+    def torque_step(self, held, dt):
 
-        # is_not_held, NOT like its name, manages "not_held" state
-        # self._grab_started_point = None doesn't mean it is completely not held
-        # it can be either no hands or TWO HANDS all attached to the wheel if you confer the above function 'is_held'
-        # TODO revise how it is handled
+        # With the torque model the hands only pull the rim, which then turns by
+        # its own inertia against the FFB or centering torque, held or not
 
-        self._grab_started_point = None
+        hand = self._wheel_angles.pop() if held else None
+        torque, spring = self.center_torque()
+        self._wheel_angles.append(self._physics.step(dt, torque, spring, hand))
 
-    def inertia(self):
+    def center_torque(self):
 
-        # inertia simulates inertia done to the wheel
+        # Returns (torque, spring) for WheelTorqueModel: N m, and N m per rad towards the center
 
-        if self._grab_started_point:
-            self._turn_speed = self._wheel_angles[-1] - self._wheel_angles[-2]
-        else:
-            self._wheel_angles.append(self._wheel_angles[-1] + self._turn_speed)
-            self._turn_speed *= self._inertia
+        cf = self.config.wheel_centerforce * self._speed_centering / 100
+        if self.config.wheel_ffb:
+            if self.ffb_paused:
+                return 0.0, 0.0
+            return self._torque["ffb_torque"] * cf * self._ffb_force.value, 0.0
+
+        return 0.0, self._torque["centering"] * cf
 
     def center_force(self):
         
         # center_force handles the centering of the wheel to its center position
         # user can use FFB to get the actual force done to the wheel
         # FFB is tested working on Euro Truck Simulator 2 only
-
-        now = time.time()
+        # Returns (drift, pull) in radians per second: a turning speed, and a speed towards the center
 
         if self.config.wheel_ffb:
             # FFB
             epsilon = 0
             if self.ffb_paused == False:
-                epsilon = self._center_speed * self.config.wheel_centerforce
+                epsilon = self._center_speed * self.config.wheel_centerforce * self._speed_centering
                 epsilon *= 0.6 # x0.6 to make the default value of 100 of wheel_centerforce is
                                # a moderate value for centering the wheel
-                epsilon *= self._center_speed_ffb_mags[0]
+                epsilon *= self._ffb_force.value
 
-            self._wheel_angles.append(self._wheel_angles[-1] + epsilon)
+            return epsilon, 0.0
 
         else:
             # NO ffb
-            epsilon = self._center_speed * self.config.wheel_centerforce
+            epsilon = self._center_speed * self.config.wheel_centerforce * self._speed_centering
             epsilon *= 0.04 # roughly 15 times difference between FFB and non FFB to make it kind of
                             # similar for same center force value
 
-            angle = self._wheel_angles[-1]
-            if abs(angle) < epsilon:
-                self._wheel_angles[-1] = 0
-                return
+            return 0.0, epsilon
 
-            if angle < 0:
-                epsilon *= -1
-            self._wheel_angles[-1] -= epsilon
+    def speed_update(self):
+        # Steering scale and centering for the current speed, two table reads
+        if self._speed_curves is not None:
+            steering, centering = self._speed_curves
+            self._steering_scale = steering.sample(self._speed)
+            self._speed_centering = centering.sample(self._speed)
 
     def send_to_vjoy(self):
-        wheel_turn = self._wheel_angles[-1] / (2 * pi)
-        axisX = int((-wheel_turn / (self.config.wheel_degrees / 360) + 0.5) * 0x8000)
-        self.set_axis(HID_USAGE_X, axisX)
+        # Wheel angle to -1..1 over wheel_degrees, shaped through the steering curve
+        self.set_axis(HID_USAGE_X, self._steering_curve.sample(self._wheel_angles[-1] * self._steering_scale))
 
     def render(self, hmd):
 
@@ -1295,30 +1004,33 @@ class Wheel(VirtualPad):
         self.wheel_image.set_alpha(alpha)
 
     def limiter(self, left_ctr, right_ctr):
-        if abs(self._wheel_angles[-1])/(2*pi)>(self.config.wheel_degrees / 360)/2:
-            self._wheel_angles[-1] = self._wheel_angles[-2]
+        # The physics step slows the wheel down into the lock and stops it there; hands on the wheel
+        # feel it ramp up with the depth into the lock zone and the speed further into it
+        depth = self._physics.lock_depth
+        if depth <= 0:
+            return
 
-            sign = 1
-            if self._wheel_angles[-1] < 0:
-                sign = -1
-            self._turn_speed = -0.005 * sign
+        outward = self._physics.velocity * (1 if self._wheel_angles[-1] > 0 else -1)
+        strength = depth * (0.5 + 0.5 * min(1.0, max(0.0, outward) / pi))
+        if strength < 0.05:
+            return
 
-            left_bound = self._hand_snaps['left'][:5] == 'wheel'
-            right_bound = self._hand_snaps['right'][:5] == 'wheel'
-            if left_bound:
-                left_ctr.haptic([None, 1])
-            if right_bound:
-                right_ctr.haptic([None, 1])
+        if self._hand_snaps['left'][:5] == 'wheel':
+            left_ctr.haptic([None, strength])
+        if self._hand_snaps['right'][:5] == 'wheel':
+            right_ctr.haptic([None, strength])
 
     def _wheel_update_common(self, angle, left_ctr, right_ctr):
-        if angle:
-            self._wheel_angles.append(angle)
+        now = time.perf_counter()
+        dt = now - self._physics_t
+        self._physics_t = now
 
-        self.unwrap_wheel_angles()
+        held = angle is not None
+        if held:
+            self._wheel_angles.append(angle)
 
-        self.inertia()
-        if (self._hand_snaps['left'][:5] != 'wheel') and (self._hand_snaps['right'][:5] != 'wheel'):
-            self.center_force()
+        self.speed_update()
+        self.inertia(held, dt)
         self.limiter(left_ctr, right_ctr)
         self.send_to_vjoy()
 
@@ -1332,38 +1044,20 @@ class Wheel(VirtualPad):
         if self.config.wheel_ffb and \
             self.config.wheel_ffb_haptic and \
             self.ffb_paused == False:
-            def compute_haptic_intensity(m_arr):
-
-                window_size = 30
-                m_arr = m_arr[:window_size]
-
-                # Set thresholds for triggering haptics
-                rms_threshold = 100 / 10000               # Minimum RMS value to consider
-
-                # Calculate the first derivative of the magnitude array
-                diffs = np.diff(m_arr)
-                
-                # Compute the RMS (root-mean-square) of the derivative
-                rms_deriv = np.sqrt(np.mean(np.square(diffs)))
-                
-                if rms_deriv > rms_threshold:
-                    rms_factor = min(2.0, rms_deriv / rms_threshold) / 2
-
-                    # Scale intensity continuously based on both the RMS value and the composite factor.
-                    pulse_intensity = rms_factor
-                    return pulse_intensity
-                return 0
-
-            intensity = 0.5 * compute_haptic_intensity(self._center_speed_ffb_mags)
-            if intensity > 0:
-                def f(t, f):
-                    if f%5 != 0:
-                        return 0
-                    return intensity
+            if self._ffb_haptic.push(self._ffb_force.value):
                 if left_bound:
-                    left_ctr.haptic([None, f])
+                    left_ctr.haptic(self._ffb_haptic.pattern)
                 if right_bound:
-                    right_ctr.haptic([None, f])
+                    right_ctr.haptic(self._ffb_haptic.pattern)
+
+        # Hands feel the rim resisting them with the torque model
+        if self._torque is not None and self._physics.hand_torque:
+            strength = min(1.0, abs(self._physics.hand_torque) / self._torque["ffb_torque"])
+            if strength > 0.05:
+                if self._hand_snaps['left'][:5] == 'wheel':
+                    left_ctr.haptic([None, strength])
+                if self._hand_snaps['right'][:5] == 'wheel':
+                    right_ctr.haptic([None, strength])
 
     def attach_hand(self, hand, left_ctr, right_ctr):
         left_ctr = self.to_wheel_space(left_ctr)
@@ -1416,9 +1110,7 @@ class Wheel(VirtualPad):
             v = self._hand_snaps[hand]
             self._hand_snaps[hand] = ''
 
-            if v[:5] == 'wheel':
-                self._snapped = False
-            elif v == 'shifter':
+            if v == 'shifter':
                 self.h_shifter_image.unsnap()
 
                 def enabler():
@@ -1518,19 +1210,26 @@ class Wheel(VirtualPad):
             grabber()
 
     def check_colliding_object(self, ctr):
-        # Exact knob collision takes top priority
-        if self.h_shifter_image.check_collision(ctr):
-            return 'shifter'
+        # Object the hand is at, the shifter knob before the wheel, None when it is at none
+        return self.collision.query(ctr)
 
-        # Wheel takes 2nd priority
-        margin = 0.075
-        if (ctr.x < self.center.x + self.size / 2 + margin and
-            ctr.x > self.center.x - self.size / 2 - margin):
-            return 'wheel'
+    def update(self, left_ctr, right_ctr, hmd):
+        if self.config.wheel_ffb:
+            self.ffb_drain()
+            t = time.perf_counter()
+            self.ffb_step(t)
+            if self._ffb_capture is not None:
+                self._ffb_capture.flush(t)
 
-        return 'shifter'
+            interval = self.config.wheel_ffb_stats_interval
+            if interval > 0 and t - self._ffb_stats_t >= interval:
+                self._ffb_stats_t = t
+                if self._ffb_stats.total:
+                    print(self._ffb_stats.log_line(t) + ", dropped %d, clipped %d times" % (
+                        self._ffb_ring.dropped, self._ffb_shaper.clips))
+
+        self.refresh_wheel_space(left_ctr, right_ctr)
 
-    def update(self, left_ctr, right_ctr, hmd):
         super().update(left_ctr, right_ctr, hmd)
 
         now = time.time()
@@ -1563,9 +1262,6 @@ class Wheel(VirtualPad):
                 elif self._hand_snaps['right'] == 'wheel_auto':
                     self._grip_queue.put(['right', False])
 
-            if self.ready_to_unsnap(left_ctr, right_ctr):
-                self._snapped = False
-
             self._last_left_in_holding = lh
             self._last_right_in_holding = rh
 
@@ -1624,6 +1320,8 @@ class Wheel(VirtualPad):
             a = struct.unpack("?", mm[0:1])[0] # sdk active
             p = struct.unpack("?", mm[4:5])[0] # paused
             d = struct.unpack("I", mm[64:68])[0] # time in minutes
+            if self._speed_curves is not None and self.config.wheel_speed_source == "SCS":
+                self._speed = abs(struct.unpack("f", mm[948:952])[0]) * 3.6 # truck speed in m/s
             # NOTE you can get speed for getting G value for
 
             v = abs(((d%1440) / 60) - 13.5)
@@ -1652,6 +1350,7 @@ class Wheel(VirtualPad):
     def move_delta(self, d):
         self.center = Point(self.center.x + d[0], self.center.y + d[1], self.center.z + d[2])
         self.config.wheel_center = [self.center.x, self.center.y, self.center.z]
+        self.update_wheel_transform()
         self.wheel_image.move_rotate(pos=self.center, size=self.size)
 
     def resize_delta(self, d):
@@ -1659,6 +1358,7 @@ class Wheel(VirtualPad):
             return
         self.size += d
         self.config.wheel_size = self.size
+        self.update_wheel_transform()
         self.wheel_image.move_rotate(size=self.size)
 
     def pitch_delta(self, d):
@@ -1670,8 +1370,7 @@ class Wheel(VirtualPad):
             self.config.wheel_pitch = 120
         self.config.wheel_pitch = round(self.config.wheel_pitch)
 
-        self._rot = rotation_matrix(-self.config.wheel_pitch, 0, 0)
-        self._rot_inv = rotation_matrix(self.config.wheel_pitch, 0, 0)
+        self.update_wheel_transform()
         self.wheel_image.move_rotate(pitch_roll=[
             self.config.wheel_pitch,
             self._wheel_angles[-1]/pi*180
@@ -1680,6 +1379,7 @@ class Wheel(VirtualPad):
     def discard_x(self):
         self.center = Point(0, self.center.y, self.center.z)
         self.config.wheel_center = [self.center.x, self.center.y, self.center.z]
+        self.update_wheel_transform()
         self.wheel_image.move_rotate(pos=self.center)
 
     def pre_edit_mode(self):
@@ -1800,11 +1500,7 @@ class Wheel(VirtualPad):
 
             # Collision
             snap = self._edit_snaps[hand]
-            collide = ''
-            if self.h_shifter_image.check_collision(ctr):
-                collide = 'shifter'
-            elif self.point_in_holding_bounds(ctr):
-                collide = 'wheel'
+            collide = self.collision.query(ctr) or ''
 
             if snap == '' and collide != '':
                 self._edit_cl[collide] = cl_collide
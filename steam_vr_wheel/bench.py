@@ -0,0 +1,902 @@
+"""
+Microbenchmarks and equivalence checks for the hot paths
+
+    python -m steam_vr_wheel.bench <name> [args...]
+
+Run without a name to list them
+"""
+import sys
+import time
+
+import numpy as np
+
+
+def rate(f, n):
+    # Calls per second of f() over n calls
+    start = time.perf_counter()
+    for _ in range(n):
+        f()
+    return n / (time.perf_counter() - start)
+
+def report(name, value, unit="calls/s"):
+    print("{:<32}{:>14,.0f} {}".format(name, value, unit))
+
+
+def bench_vjoy(device_id="1", calls="200000"):
+    """vJoy SetAxis/SetBtn calls per second: argtypes vs raising wrappers vs raw pointers"""
+    from ctypes import c_long, c_uint, c_ubyte, wintypes
+    from steam_vr_wheel.pyvjoy import _sdk
+    from steam_vr_wheel.pyvjoy.vjoydevice import VJoyDevice, HID_USAGE_X
+
+    rID = int(device_id)
+    n = int(calls)
+    device = VJoyDevice(rID, raise_errors=False)
+
+    # _vj[name] makes a fresh function pointer; give it full argtypes to compare against
+    typed_axis = _sdk._vj['SetAxis']
+    typed_axis.argtypes = [c_long, c_uint, c_uint]
+    typed_axis.restype = wintypes.BOOL
+    typed_btn = _sdk._vj['SetBtn']
+    typed_btn.argtypes = [wintypes.BOOL, c_uint, c_ubyte]
+    typed_btn.restype = wintypes.BOOL
+
+    report("SetAxis argtypes", rate(lambda: typed_axis(0x4000, rID, HID_USAGE_X), n))
+    report("SetAxis wrapper", rate(lambda: _sdk.SetAxis(0x4000, rID, HID_USAGE_X), n))
+    report("SetAxisRaw", rate(lambda: _sdk.SetAxisRaw(0x4000, rID, HID_USAGE_X), n))
+    report("VJoyDevice.set_axis no raise", rate(lambda: device.set_axis(HID_USAGE_X, 0x4000), n))
+
+    report("SetBtn argtypes", rate(lambda: typed_btn(0, rID, 1), n))
+    report("SetBtn wrapper", rate(lambda: _sdk.SetBtn(0, rID, 1), n))
+    report("SetBtnRaw", rate(lambda: _sdk.SetBtnRaw(0, rID, 1), n))
+    report("VJoyDevice.set_button no raise", rate(lambda: device.set_button(1, False), n))
+
+    device.reset()
+
+
+def make_ffb_packet(typ, body, rID=1):
+    """
+    FFB_DATA laid out the way the vJoy driver delivers it
+    data[0] holds the device and report ids, body follows (data[1] is the EBI for effect reports)
+    """
+    from steam_vr_wheel.pyvjoy.constants import IOCTL_HID_WRITE_REPORT, IOCTL_HID_SET_FEATURE
+
+    feature = typ >= 0x10
+    raw = bytes([(rID << 4) | (typ & 0x0F)]) + bytes(body)
+    return make_ffb_data(IOCTL_HID_SET_FEATURE if feature else IOCTL_HID_WRITE_REPORT, raw)
+
+def make_ffb_data(cmd, raw):
+    from ctypes import c_ubyte, cast, POINTER
+    from steam_vr_wheel.pyvjoy import _sdk
+
+    buf = (c_ubyte * len(raw)).from_buffer_copy(raw)
+    packet = _sdk.FFB_DATA(len(raw), cmd, cast(buf, POINTER(c_ubyte)))
+    packet._buf = buf # keep the bytes alive with the packet
+    return packet
+
+def make_ffb_session(rID=1):
+    # Per frame mix seen in a truck sim: effect report, constant force and a start for one block
+    # plus the occasional gain and control packets
+    from steam_vr_wheel.pyvjoy.constants import FFBPType
+    return [
+        make_ffb_packet(FFBPType.PT_EFFREP, [1, 1, 0xFF, 0xFF, 0, 0, 0, 0, 0xFF, 0xFF, 1, 63, 0], rID),
+        make_ffb_packet(FFBPType.PT_CONSTREP, [1, 0x10, 0x27], rID),
+        make_ffb_packet(FFBPType.PT_EFOPREP, [1, 1, 1], rID),
+        make_ffb_packet(FFBPType.PT_EFFREP, [1, 1, 0xFF, 0xFF, 0, 0, 0, 0, 0xFF, 0xFF, 1, 63, 0], rID),
+        make_ffb_packet(FFBPType.PT_CONSTREP, [1, 0xF0, 0xD8], rID),
+        make_ffb_packet(FFBPType.PT_EFOPREP, [1, 1, 1], rID),
+        make_ffb_packet(FFBPType.PT_GAINREP, [0xFF], rID),
+        make_ffb_packet(FFBPType.PT_CTRLREP, [1], rID),
+    ]
+
+def _probe_decode(fData):
+    # The decoder FfbGenCB used before FfbDecoder, kept here as the baseline:
+    # fresh structs and dicts per packet, every helper probed in turn
+    from ctypes import c_int, c_ubyte, byref
+    from steam_vr_wheel.pyvjoy import _sdk
+    _vj, ok = _sdk._vj, _sdk.ERROR_SUCCESS
+
+    pydata = dict()
+    i = c_int()
+    b = c_ubyte()
+    op = _sdk.FFB_EFF_OP()
+    effect = _sdk.FFB_EFF_REPORT()
+    cnst = _sdk.FFB_EFF_CONSTANT()
+    prd = _sdk.FFB_EFF_PERIOD()
+    if ok == _vj.Ffb_h_DeviceID(fData, byref(i)):
+        pydata['DeviceID'] = i.value
+    if ok == _vj.Ffb_h_Type(fData, byref(i)):
+        pydata['Type'] = i.value
+    if ok == _vj.Ffb_h_EBI(fData, byref(i)):
+        pydata['EBI'] = i.value
+    if ok == _vj.Ffb_h_DevCtrl(fData, byref(i)):
+        pydata['DevCtrl'] = i.value
+    elif ok == _vj.Ffb_h_EffNew(fData, byref(i)):
+        pydata['EffNew'] = i.value
+    elif ok == _vj.Ffb_h_DevGain(fData, byref(b)):
+        pydata['Gain'] = b.value
+    elif ok == _vj.Ffb_h_EffOp(fData, byref(op)):
+        pydata['EffOp'] = dict({"EffectOp": op.EffectOp, "LoopCount": op.LoopCount})
+    elif ok == _vj.Ffb_h_Eff_Report(fData, byref(effect)):
+        pydata['Eff_Report'] = dict({
+            "EffectType": effect.EffectType, "Duration": effect.Duration,
+            "TriggerRepeatInterval": effect.TrigerRpt, "SamplePeriod": effect.SamplePrd,
+            "Gain": effect.Gain, "TriggerButton": effect.TrigerBtn,
+            "Polar": True if effect.Polar == 1 else False, "Direction": effect.Direction,
+            "DirX": _sdk._twos_comp(effect.DirX, 8), "DirY": _sdk._twos_comp(effect.DirY, 8)})
+    elif ok == _vj.Ffb_h_Eff_Constant(fData, byref(cnst)):
+        pydata['Eff_Constant'] = dict({"Magnitude": cnst.Magnitude})
+    elif ok == _vj.Ffb_h_Eff_Period(fData, byref(prd)):
+        pydata['Eff_Period'] = dict({"Magnitude": prd.Magnitude, "Offset": prd.Offset,
+                                     "Phase": prd.Phase, "Period": prd.Period})
+    return pydata
+
+def bench_ffb(packets="200000"):
+    """FFB packet decoding in packets per second: per-packet probing vs FfbDecoder"""
+    from ctypes import addressof
+    from steam_vr_wheel.pyvjoy import _sdk
+
+    n = int(packets)
+    session = make_ffb_session()
+    addresses = [addressof(p) for p in session]
+    k = len(addresses)
+
+    it = iter(range(n))
+    report("probe helpers (old)", rate(lambda: _probe_decode(addresses[next(it) % k]), n), "packets/s")
+
+    decode = _sdk.FfbDecoder().decode
+    it = iter(range(n))
+    report("FfbDecoder", rate(lambda: decode(addresses[next(it) % k]), n), "packets/s")
+
+    # Same fields out of both
+    decoder = _sdk.FfbDecoder()
+    for address in addresses:
+        old = _probe_decode(address)
+        new = decoder.decode(address)
+        assert old['Type'] == new.Type and old.get('EBI') == new.EBI, (old, new.as_dict())
+        if 'Eff_Constant' in old:
+            assert old['Eff_Constant']['Magnitude'] == new.Magnitude
+        if 'EffOp' in old:
+            assert old['EffOp']['EffectOp'] == new.EffectOp and old['EffOp']['LoopCount'] == new.LoopCount
+        if 'Eff_Report' in old:
+            assert old['Eff_Report']['Duration'] == new.Duration and old['Eff_Report']['DirX'] == new.DirX
+    print("decoded fields match")
+
+
+def bench_ring(packets="200000"):
+    """FfbPacketRing: driver-side push cost, and a threaded producer/consumer order check"""
+    import threading
+    from ctypes import addressof
+    from steam_vr_wheel.pyvjoy import _sdk
+    from steam_vr_wheel.pyvjoy.constants import FFBPType
+
+    n = int(packets)
+    session = [make_ffb_packet(FFBPType.PT_CONSTREP, [1] + list(m.to_bytes(2, 'little', signed=True)))
+               for m in range(1000)]
+    addresses = [addressof(p) for p in session]
+
+    ring = _sdk.FfbPacketRing()
+    noop = lambda address, t: None
+    def push_one(it=iter(range(n))):
+        ring.push(addresses[next(it) % 1000])
+        if len(ring) > 128:
+            ring.drain(noop)
+    report("push", rate(push_one, n), "packets/s")
+
+    # Producer on its own thread like the driver; consumer drains at about 1 kHz
+    ring = _sdk.FfbPacketRing()
+    decode = _sdk.FfbDecoder().decode
+    seen = []
+    def consume(address, t):
+        seen.append(decode(address).Magnitude)
+
+    def produce():
+        # Paced well above what games send (a few thousand per second)
+        for k in range(n):
+            ring.push(addresses[k % 1000])
+            if k % 32 == 0:
+                time.sleep(0.001)
+
+    start = time.perf_counter()
+    producer = threading.Thread(target=produce)
+    producer.start()
+    while producer.is_alive():
+        ring.drain(consume)
+        time.sleep(0.001)
+    ring.drain(consume)
+    elapsed = time.perf_counter() - start
+
+    report("threaded push + drain", len(seen) / elapsed, "packets/s")
+    print("received {} dropped {} truncated {}".format(len(seen), ring.dropped, ring.truncated))
+    assert len(seen) + ring.dropped == n
+    if ring.dropped == 0:
+        assert seen == [k % 1000 for k in range(n)]
+        print("order preserved")
+
+
+def bench_flood(frames="2000", per_frame="200"):
+    """FFB packet flood: handling every packet vs coalescing per step, same effect state"""
+    from ctypes import addressof
+    from steam_vr_wheel.pyvjoy import _sdk
+    from steam_vr_wheel.pyvjoy.constants import FFBPType
+    from steam_vr_wheel._ffb import FfbEffectEngine
+
+    n, m = int(frames), int(per_frame)
+    le = lambda v: list(int(v).to_bytes(2, 'little', signed=True))
+    # Constant force updates for two blocks with restarts and the odd gain change, as some titles spam
+    pool = [make_ffb_packet(FFBPType.PT_CONSTREP, [1 + k % 2] + le(k * 7 % 20000 - 10000)) for k in range(m)]
+    pool += [make_ffb_packet(FFBPType.PT_EFOPREP, [1, 1, 0]), make_ffb_packet(FFBPType.PT_EFOPREP, [2, 1, 0]),
+             make_ffb_packet(FFBPType.PT_GAINREP, [200]), make_ffb_packet(FFBPType.PT_CTRLREP, [3])]
+    frames_of = []
+    rng = np.random.default_rng(0)
+    for _ in range(n):
+        order = list(range(m)) + list(rng.choice(np.arange(m, m + 4), 4, p=[0.45, 0.45, 0.08, 0.02]))
+        rng.shuffle(order)
+        frames_of.append([addressof(pool[k]) for k in order])
+
+    results = []
+    for coalesce in (False, True):
+        ring = _sdk.FfbPacketRing(capacity=1024)
+        decode = _sdk.FfbDecoder().decode
+        engine = FfbEffectEngine()
+        handled = [0]
+        def handle(address, t):
+            engine.handle(decode(address), t)
+            handled[0] += 1
+        forces = []
+        # Pushing happens on the driver thread, only the consumer side is timed
+        elapsed = 0.0
+        for f, addresses in enumerate(frames_of):
+            now = f / 60
+            for address in addresses:
+                ring.push(address, now)
+            start = time.perf_counter()
+            ring.drain(handle, coalesce)
+            forces.append(engine.evaluate(now))
+            elapsed += time.perf_counter() - start
+        name = "coalesced" if coalesce else "every packet"
+        report(name, n * (m + 4) / elapsed, "packets/s")
+        report(name + " handled", handled[0], "packets")
+        results.append(forces)
+
+    assert results[0] == results[1], "forces differ"
+    print("forces match")
+
+
+def bench_wheelspace(points="100000"):
+    """Controller to wheel space: numpy matrix per call vs closed form rotate_about_x, same points"""
+    from steam_vr_wheel.util import Point, rotation_matrix, rotate_about_x
+
+    n = int(points)
+    rng = np.random.default_rng(0)
+    center = Point(0, -0.4, -0.35)
+    ps = [Point(*v) for v in rng.uniform(-1, 1, (1000, 3))]
+
+    def subtract_and_rotate(point, mat):
+        # Wheel._subtract_and_rotate before rotate_about_x, kept here as the baseline
+        diff = np.array([point.x-center.x, point.y-center.y, point.z-center.z])
+        l = np.dot(mat, diff)
+        l[0] += center.x
+        l[1] += center.y
+        l[2] += center.z
+        return Point(l[0], l[1], l[2])
+
+    for pitch in (0, 17, -30, 90, 120):
+        rot_inv = rotation_matrix(pitch, 0, 0)
+        c, s = np.cos(pitch * np.pi / 180), np.sin(pitch * np.pi / 180)
+        for p in ps:
+            a = subtract_and_rotate(p, rot_inv)
+            b = rotate_about_x(p, center, c, s)
+            assert max(abs(a.x - b.x), abs(a.y - b.y), abs(a.z - b.z)) < 1e-12, (pitch, p.__dict__)
+            back = rotate_about_x(b, center, c, -s)
+            assert max(abs(back.x - p.x), abs(back.y - p.y), abs(back.z - p.z)) < 1e-12
+    print("same points for every pitch")
+
+    rot_inv = rotation_matrix(17, 0, 0)
+    c, s = np.cos(17 * np.pi / 180), np.sin(17 * np.pi / 180)
+    out = Point(0, 0, 0)
+    p = ps[0]
+    report("numpy matrix", rate(lambda: subtract_and_rotate(p, rot_inv), n))
+    report("rotate_about_x", rate(lambda: rotate_about_x(p, center, c, s), n))
+    report("rotate_about_x reused Point", rate(lambda: rotate_about_x(p, center, c, s, out), n))
+
+
+def bench_collision(points="100000"):
+    """Grab tests: numpy capsule and the rim check vs CollisionWorld shapes, and query cost as objects are added"""
+    from steam_vr_wheel.util import Point, rotation_matrix, rotate_about_x
+    from steam_vr_wheel._collision import CollisionWorld, Capsule, TorusBand, Box
+
+    n = int(points)
+    rng = np.random.default_rng(0)
+    ps = [Point(*v) for v in rng.uniform(-0.8, 0.4, (20000, 3))]
+
+    def numpy_capsule(p, a, b, r):
+        # HShifterImage.check_collision before the collision world, kept here as the baseline
+        p, a, b = np.array([p.x, p.y, p.z]), np.array(a), np.array(b)
+        ap, ab = p - a, b - a
+        l = max(0, min(1, np.dot(ap, ab) / np.dot(ab, ab)))
+        cp = p - (a + ab * l)
+        return np.sqrt(np.dot(cp, cp)) <= r
+
+    def rim(p, center, size, c, s):
+        # Wheel.point_in_holding_bounds before the collision world
+        p = rotate_about_x(p, center, c, s)
+        x, y, z = p.x - center.x, p.y - center.y, p.z - center.z
+        distance = np.sqrt(x**2 + y**2)
+        return abs(z) < 0.075 and size/2 - 0.10 <= distance < size/2 + 0.06
+
+    a, b = (0.25, -0.57, -0.15), (0.3, -0.3, -0.1)
+    capsule = Capsule(0.06, a, b)
+    center, size = Point(0, -0.4, -0.35), 0.48
+    c, s = np.cos(17 * np.pi / 180), np.sin(17 * np.pi / 180)
+    band = TorusBand(size/2 - 0.10, size/2 + 0.06, 0.075)
+    band.place(center, c, s)
+    hits = 0
+    for p in ps:
+        assert capsule.contains(p) == numpy_capsule(p, a, b, 0.06), p.__dict__
+        assert band.contains(p) == rim(p, center, size, c, s), p.__dict__
+        hits += band.contains(p) + capsule.contains(p)
+    print("same results for {} points, {} inside".format(len(ps), hits))
+
+    p = Point(0.27, -0.45, -0.13)
+    report("numpy capsule", rate(lambda: numpy_capsule(p, a, b, 0.06), n))
+    report("Capsule.contains", rate(lambda: capsule.contains(p), n))
+
+    # The hand at the shifter with more and more objects elsewhere
+    world = CollisionWorld()
+    world.add('shifter', capsule)
+    world.add('wheel', band, priority=1)
+    report("query, 2 objects", rate(lambda: world.query(p), n))
+    for i in range(30):
+        box = Box(0.05, 0.05, 0.05)
+        box.place(Point(-1 + i * 0.1, 0.5, 0.5))
+        world.add('box{}'.format(i), box, priority=2)
+    report("query, 32 objects", rate(lambda: world.query(p), n))
+    away = Point(0.6, 0.6, 0.6)
+    report("query, 32 objects, no hit", rate(lambda: world.query(away), n))
+
+
+def bench_grip(frames="20000", noise_mm="3"):
+    """Wheel angle from noisy hands: atan2 with grab offsets vs RotationFit, error and cost"""
+    from math import atan2, cos, sin, pi
+    from steam_vr_wheel.util import RotationFit
+
+    n = int(frames)
+    rng = np.random.default_rng(0)
+    radius = 0.24
+    # Steering back and forth at up to 3 rad/s at 90 Hz, the hands 170 degrees apart on the rim
+    t = np.arange(n) / 90
+    truth = 1.5 * np.sin(2 * t) + 0.5 * np.sin(0.7 * t)
+    noise = rng.normal(0, float(noise_mm) / 1000, (n, 2, 2))
+    def hands(k):
+        # Both hands, and every 4 seconds the left or the right one alone for a second
+        if k % 360 >= 90:
+            return (True, True)
+        return (True, False) if k % 720 < 360 else (False, True)
+
+    points = []
+    for k in range(n):
+        a = truth[k]
+        ps = []
+        for h, on in enumerate(hands(k)):
+            b = a + (pi * 17 / 18 if h == 0 else 0.0)
+            ps.append((radius * cos(b) + noise[k, h, 0], radius * sin(b) + noise[k, h, 1]) if on else None)
+        points.append(ps)
+
+    def grab_offsets():
+        # Wheel._wheel_update before RotationFit: atan2 of one hand or of the left to right hand,
+        # plus an offset taken whenever the hands change
+        out, angle, offset, last = [], 0.0, 0.0, None
+        for ps in points:
+            if ps[0] and ps[1]:
+                raw = atan2(ps[0][1] - ps[1][1], ps[0][0] - ps[1][0])
+            else:
+                p = ps[0] or ps[1]
+                raw = atan2(p[1], p[0])
+            key = (ps[0] is None, ps[1] is None)
+            if key != last:
+                offset, last = angle - raw, key
+            angle = angle + ((raw + offset - angle + pi) % (2 * pi) - pi)
+            out.append(angle)
+        return np.array(out)
+
+    def fit(samples):
+        f = RotationFit(samples, radius)
+        f.reset(truth[0])
+        return np.array([f.update(ps) for ps in points])
+
+    def smoothed(a, frames):
+        # Moving average over the last frames, the temporal smoothing the fit replaces
+        c = np.cumsum(np.concatenate([[a[0]] * frames, a]))
+        return (c[frames:] - c[:-frames]) / frames
+
+    old = grab_offsets()
+    old -= old[0] - truth[0]
+    results = [("grab offsets", old), ("grab offsets, 8 frame average", smoothed(old, 8))]
+    results += [("RotationFit {} samples".format(s), fit(s)) for s in (1, 4, 8, 16)]
+    for name, a in results:
+        # Error around its mean, which a grab offset is free to shift, and its change per frame
+        e = a - truth
+        report(name, np.sqrt(np.mean((e - e.mean()) ** 2)) * 1000,
+               "mrad error, {:.2f} mrad jitter".format(np.sqrt(np.mean(np.diff(e) ** 2)) * 1000))
+
+    f = RotationFit(8, radius)
+    f.reset(0.0)
+    ps = points[0]
+    report("RotationFit.update", rate(lambda: f.update(ps), 100000))
+
+
+def bench_physics(seconds="1"):
+    """Released wheel spin and centering at different update rates vs the old per frame code at 60 Hz, and the torque model"""
+    from math import pi
+    from steam_vr_wheel import DEFAULT_CONFIG
+    from steam_vr_wheel._physics import WheelPhysics, WheelTorqueModel, damping_rate, per_second
+
+    duration = float(seconds)
+    inertia, center_speed = 0.95, pi / 180 * 100 * 0.04 # default wheel_centerforce without FFB
+
+    # Let go while turning at 0.05 rad per frame at 60 Hz, 10 rad off center
+    angle, speed = 10.0, 0.05
+    for _ in range(int(duration * 60)):
+        angle += speed
+        speed *= inertia
+        angle = 0.0 if abs(angle) < center_speed else angle - center_speed * (1 if angle > 0 else -1)
+    report("per frame 60 Hz", angle * 1000, "mrad")
+
+    for hz in (30, 60, 90, 144, 45.7):
+        physics = WheelPhysics(damping_rate(inertia))
+        physics.set(10.0, per_second(0.05))
+        frames = int(duration * hz)
+        for _ in range(frames):
+            physics.step(1 / hz, pull=per_second(center_speed))
+        physics.step(duration - frames / hz, pull=per_second(center_speed))
+        report("WheelPhysics {} Hz".format(hz), physics.angle * 1000, "mrad")
+
+    physics = WheelPhysics(damping_rate(inertia))
+    report("step", rate(lambda: physics.step(1 / 60, 0.1), 100000), "calls/s")
+
+    # Torque model with the default wheel_torque and no FFB: turned by hand at
+    # 3 rad/s for half a second, then let go
+    t = DEFAULT_CONFIG['wheel_torque']
+    spring = t["centering"] * DEFAULT_CONFIG['wheel_centerforce'] / 100
+    for hz in (30, 60, 90, 144, 45.7):
+        model = WheelTorqueModel(t["inertia"], t["damping"], t["friction"], t["hand_stiffness"], t["hand_damping"])
+        model.set(10.0)
+        frames = int(hz / 2)
+        for i in range(1, frames + 1):
+            model.step(1 / hz, spring=spring, hand=10.0 + 3 * i / hz)
+        lag = 10.0 + 3 * frames / hz - model.angle
+        frames = int(duration * hz)
+        for _ in range(frames):
+            model.step(1 / hz, spring=spring)
+        model.step(duration - frames / hz, spring=spring)
+        report("WheelTorqueModel {} Hz".format(hz), model.angle * 1000, "mrad, lag {:.1f} mrad".format(lag * 1000))
+
+    # Let go at 12 rad/s a radian off the lock of the default 1440 degrees; how close it gets
+    # and where it comes to rest
+    limit, zone = 4 * pi, DEFAULT_CONFIG['wheel_soft_lock'] * pi / 180
+    for hz in (30, 60, 90, 144):
+        for name, model in (("WheelPhysics", WheelPhysics(damping_rate(inertia))),
+                            ("WheelTorqueModel", WheelTorqueModel(t["inertia"], t["damping"], t["friction"],
+                                                                  t["hand_stiffness"], t["hand_damping"]))):
+            model.lock(limit, zone)
+            model.set(limit - 1.0, 12.0)
+            closest = limit
+            for _ in range(int(hz)):
+                closest = min(closest, limit - model.step(1 / hz))
+            report("lock {} {} Hz".format(name, hz), (limit - model.angle) * 1000,
+                   "mrad short of the lock at rest, {:.0f} at the closest".format(closest * 1000))
+
+    model = WheelTorqueModel(t["inertia"], t["damping"], t["friction"], t["hand_stiffness"], t["hand_damping"])
+    report("torque step, {} Hz substeps".format(model.rate), rate(lambda: model.step(1 / 60, 0.1, 0.5, model.angle + 0.05), 10000), "calls/s")
+
+
+def bench_speed(calls="200000"):
+    """Speed sensitive steering: SpeedCurve table reads vs interpolating the config points every frame"""
+    from steam_vr_wheel import DEFAULT_CONFIG
+    from steam_vr_wheel.util import SpeedCurve
+
+    n = int(calls)
+    points = DEFAULT_CONFIG['wheel_speed_steering']
+    speeds = [p[0] for p in points]
+    values = [p[1] for p in points]
+    curve = SpeedCurve(points)
+    kmh = np.random.default_rng(0).uniform(0, 200, n).tolist()
+
+    worst = max(abs(curve.sample(v) - float(np.interp(v, speeds, values))) for v in kmh[:10000])
+    report("max difference", worst * 100, "hundredths of a percent")
+
+    it = iter(kmh)
+    report("np.interp", rate(lambda: np.interp(next(it), speeds, values), n), "calls/s")
+    it = iter(kmh)
+    report("SpeedCurve.sample", rate(lambda: curve.sample(next(it)), n), "calls/s")
+
+
+def bench_replay(path, speed="max", device_id="", out=""):
+    """Replays an FFB capture through the Wheel FFB path: packets/s, latency and force trace (speed: max or real)"""
+    from collections import deque
+    from ctypes import addressof
+    from math import pi
+    import threading
+    from types import SimpleNamespace
+    from steam_vr_wheel import DEFAULT_CONFIG
+    from steam_vr_wheel._wheel import Wheel
+    from steam_vr_wheel._ffb import read_capture
+    from steam_vr_wheel.wheel import FREQUENCY
+
+    class ReplayWheel(Wheel):
+        # Only what the FFB path touches; the wheel itself stays at rest
+        def __init__(self, rID):
+            # Defaults rather than PadConfig, which would write to the config file
+            self.config = SimpleNamespace(**DEFAULT_CONFIG)
+            self.device = type('Device', (), {'rID': rID})
+            self._wheel_angles = deque([0, 0], maxlen=10)
+            self._steering_scale = -360 / (pi * self.config.wheel_degrees)
+            self.ffb_init()
+
+    records = list(read_capture(path))
+    if not records:
+        print("empty capture")
+        return
+    packets = [make_ffb_data(cmd, data) for _, cmd, data in records]
+    addresses = [addressof(p) for p in packets]
+    times = [t - records[0][0] for t, _, _ in records]
+    # Device of the first packet unless given
+    rID = int(device_id) if device_id else records[0][2][0] >> 4
+
+    wheel = ReplayWheel(rID)
+    frame = 1 / FREQUENCY
+    trace = []
+    latencies = []
+
+    if speed == "real":
+        # Packets are pushed at their captured times from another thread, like the driver does,
+        # and drained once per frame; latency is from push to the end of the step
+        ring = wheel._ffb_ring
+        handle_raw = wheel._ffb_handle_raw
+        arrivals = []
+        def handle(address, t):
+            arrivals.append(t)
+            handle_raw(address, t)
+
+        def produce():
+            t0 = time.perf_counter()
+            for t, address in zip(times, addresses):
+                left = t0 + t - time.perf_counter()
+                if left > 0:
+                    time.sleep(left)
+                ring.push(address)
+
+        start = time.perf_counter()
+        producer = threading.Thread(target=produce)
+        producer.start()
+        while producer.is_alive() or len(ring):
+            arrivals.clear()
+            ring.drain(handle, coalesce=True)
+            now = time.perf_counter()
+            wheel.ffb_step(now)
+            done = time.perf_counter()
+            latencies.extend(done - t for t in arrivals)
+            trace.append((now - start, wheel._ffb_force.value))
+            time.sleep(max(0.0, frame - (time.perf_counter() - now)))
+        elapsed = time.perf_counter() - start
+
+    else:
+        # As fast as possible on a virtual clock advancing one frame per step;
+        # latency is the processing time from queueing a packet to the end of its step
+        ring = wheel._ffb_ring
+        k, n = 0, len(addresses)
+        now = 0.0
+        start = time.perf_counter()
+        while k < n:
+            now += frame
+            first = time.perf_counter()
+            batch = 0
+            while k < n and times[k] <= now and batch < ring.capacity:
+                ring.push(addresses[k], times[k])
+                k += 1
+                batch += 1
+            wheel.ffb_drain()
+            wheel.ffb_step(now)
+            done = time.perf_counter()
+            latencies.extend([done - first] * batch)
+            trace.append((now, wheel._ffb_force.value))
+        elapsed = time.perf_counter() - start
+
+    print("dropped {} truncated {} coalesced {}".format(ring.dropped, ring.truncated, ring.coalesced))
+    latencies = np.array(latencies) * 1e6
+    trace = np.array(trace)
+    report("packets", len(packets), "")
+    report("captured duration", times[-1] * 1000, "ms")
+    report("replay " + speed, len(packets) / elapsed, "packets/s")
+    if latencies.size:
+        report("latency p50", np.percentile(latencies, 50), "us")
+        report("latency p99", np.percentile(latencies, 99), "us")
+    wheel._ffb_stats.coalesced = ring.coalesced
+    print(wheel._ffb_stats.log_line())
+    if out:
+        np.save(out, trace)
+        print("force trace (t, magnitude) saved to", out)
+    return trace
+
+
+def bench_haptic(frames="100000"):
+    """FFB haptic intensity per frame: numpy over the last 30 samples vs running sums, same output"""
+    from steam_vr_wheel._ffb import FfbHapticDetector
+
+    n = int(frames)
+    rng = np.random.default_rng(0)
+    # Slow steering force with bursts of road texture
+    t = np.arange(n) / 60
+    texture = (np.sin(t * 0.7) > 0.5) * rng.normal(0, 0.02, n)
+    forces = (0.3 * np.sin(t * 0.5) + texture).tolist()
+
+    def legacy(m_arr):
+        # What Wheel.ffb_haptic computed before FfbHapticDetector
+        rms_deriv = np.sqrt(np.mean(np.square(np.diff(m_arr))))
+        if rms_deriv > 0.01:
+            return 0.5 * min(2.0, rms_deriv / 0.01) / 2
+        return 0
+
+    history = np.zeros(30)
+    old = []
+    def step_legacy(it=iter(forces)):
+        history[1:] = history[:-1]
+        history[0] = next(it)
+        old.append(legacy(history))
+    report("numpy window", rate(step_legacy, n), "frames/s")
+
+    detector = FfbHapticDetector()
+    detector.push(0.0) # the numpy window starts out full of zeros
+    new = []
+    def step_detector(it=iter(forces)):
+        detector.push(next(it))
+        new.append(detector.texture)
+    report("FfbHapticDetector", rate(step_detector, n), "frames/s")
+
+    error = np.max(np.abs(np.array(old) - np.array(new)))
+    print("max intensity difference {:.2e}".format(error))
+    assert error < 1e-6
+
+    banded = FfbHapticDetector(bands=True)
+    impacts = 0
+    for k, f in enumerate(forces):
+        # A kerb strike every 10 seconds
+        banded.push(f + (0.4 if k % 600 < 3 else 0.0))
+        impacts += banded._impact_left == banded.impact_frames
+    report("bands: impacts seen", impacts, "of {}".format(n // 600 + 1))
+
+
+def _legacy_gate(dp, xz_pos_0, xz_rev, reverse_locked, sequential):
+    # HShifterImage.update before GateMap, kept here as the baseline; returns the drawn
+    # stick and the gate
+    if sequential:
+        dp = [0, dp[1]]
+    if xz_rev[0] == -2:
+        xz_ctr = [max(min(dp[0], 1.0), -2.0), max(min(dp[1], 1.0), -1.0)]
+    else:
+        xz_ctr = [max(min(dp[0], 2.0), -1.0), max(min(dp[1], 1.0), -1.0)]
+    xz_rev_z_clamper = max if xz_rev[1] == 1 else min
+
+    xz_pos_1 = xz_pos_0.copy()
+    xz_1 = [0, 0]
+    if abs(xz_ctr[1]) <= 0.55:
+        xz_pos_1[1] = 0
+        xz_1 = list(xz_ctr)
+        if abs(xz_ctr[0]) >= 1:
+            if xz_ctr[0] * xz_rev[0] > 0:
+                if reverse_locked and xz_pos_0[0] != xz_rev[0]:
+                    xz_1[0] = xz_pos_1[0] = xz_rev[0] / 2
+                elif abs(xz_ctr[0]) < 2:
+                    xz_1[1] = 0
+                    xz_pos_1[0] = xz_rev[0] / 2
+                else:
+                    xz_1[1] = xz_rev_z_clamper(0, xz_1[1])
+                    xz_pos_1[0] = xz_rev[0]
+            else:
+                xz_1[0] = xz_pos_1[0] = 1 if xz_ctr[0] > 0 else -1
+        elif abs(xz_ctr[0]) <= 0.55:
+            if abs(xz_ctr[0]) < abs(xz_ctr[1]):
+                xz_1[0] = 0
+            else:
+                xz_1[1] = 0
+            xz_pos_1[0] = 0
+        else:
+            xz_1[1] = 0
+    else:
+        xz_1[0] = xz_pos_0[0]
+        if xz_pos_0[0] == xz_rev[0]:
+            xz_1[1] = xz_rev_z_clamper(0, xz_ctr[1])
+            if xz_rev[1] * xz_ctr[1] > 0.8:
+                xz_pos_1[1] = xz_rev[1]
+        else:
+            xz_1[1] = xz_ctr[1]
+            if xz_ctr[1] < -0.8:
+                xz_pos_1[1] = -1
+            elif xz_ctr[1] > 0.8:
+                xz_pos_1[1] = 1
+    return xz_1, xz_pos_1
+
+def _legacy_button(xz_pos):
+    pos = xz_pos[0]*2+3 + (xz_pos[1]+1)/2
+    return {-1: 51, 1: 43, 3: 45, 5: 47, 7: 51, 0: 51, 2: 44, 4: 46, 6: 48, 8: 51}.get(pos)
+
+
+def bench_gates(frames="100000"):
+    """H-shifter gear from the hand: the old branching vs GateMap, same gears for 6+R and sequential"""
+    from steam_vr_wheel import DEFAULT_CONFIG
+    from steam_vr_wheel._gates import GateMap
+
+    n = int(frames)
+    rng = np.random.default_rng(0)
+    # A hand wandering around the slot and a little past it, the reverse lock now and then
+    walk = np.cumsum(rng.normal(0, 0.15, (n, 2)), axis=0)
+    hand = (np.abs((walk + 3) % 12 - 6) - 3) * [0.9, 0.5]
+    locks = (np.sin(np.arange(n) / 40) > -0.5).tolist()
+    hand = hand.tolist()
+
+    layouts = DEFAULT_CONFIG['shifter_layouts']
+    orientations = {"Top Left": [-2, -1], "Bottom Left": [-2, 1], "Top Right": [2, -1], "Bottom Right": [2, 1]}
+    for orientation, xz_rev in orientations.items():
+        for name in ("6+R", "Sequential"):
+            gates = GateMap.from_config(layouts[name], orientation)
+            old, new = [0, 0], [0, 0]
+            moved = 0
+            seen = set()
+            for (x, z), locked in zip(hand, locks):
+                xz_old, old = _legacy_gate([x, z], old, xz_rev, locked, name == "Sequential")
+                xz_new, new = gates.resolve(x, z, new, locked)
+                assert old == new, (orientation, name, x, z, old, new)
+                assert _legacy_button(old) == gates.button(new), (orientation, name, old)
+                moved += xz_old != xz_new
+                seen.add(gates.button(new))
+            print("{:<12} {:<12} same gears, {} of them used, drawn stick differs in {:.1%} of frames".format(
+                orientation, name, len(seen - {None}), moved / n))
+
+    gates = GateMap.from_config(layouts["6+R"], "Bottom Left")
+    def step_legacy(it=iter(zip(hand, locks)), gate=[[0, 0]]):
+        (x, z), locked = next(it)
+        gate[0] = _legacy_gate([x, z], gate[0], [-2, 1], locked, False)[1]
+    def step_gates(it=iter(zip(hand, locks)), gate=[[0, 0]]):
+        (x, z), locked = next(it)
+        gate[0] = gates.resolve(x, z, gate[0], locked)[1]
+    report("legacy branching", rate(step_legacy, n), "frames/s")
+    report("GateMap.resolve", rate(step_gates, n), "frames/s")
+
+    for name, layout in layouts.items():
+        start = time.perf_counter()
+        gates = GateMap.from_config(layout, "Bottom Left")
+        image = gates.draw()
+        print("{:<14} {} gears, columns {} to {}, {}x{} slot drawn in {:.1f} ms".format(
+            name, len(gates.buttons), gates.x_min, gates.x_max, image[1], image[2],
+            (time.perf_counter() - start) * 1000))
+
+
+def _legacy_shifter_render(shifter, hmd, xz):
+    # HShifterImage.render before the closed form, kept here as the baseline; returns
+    # the knob and stick transforms as 3x4 arrays
+    from math import pi, atan2, sin, cos
+    from steam_vr_wheel.util import rotation_matrix
+
+    unit = (shifter.size/4 - shifter.stick_width/2)
+    x_deg = shifter.degree * abs(xz[0])
+    z_deg = shifter.degree * abs(xz[1])
+    x_sin = sin(x_deg*pi/180) * shifter.stick_height
+    z_sin = sin(z_deg*pi/180) * shifter.stick_height
+    x_knob = shifter.x + xz[0] * unit + x_sin * (-1 if xz[0] < 0 else 1)
+    z_knob = shifter.z + xz[1] * unit + z_sin * (-1 if xz[1] < 0 else 1)
+    x_stick = shifter.x + xz[0] * unit
+    z_stick = shifter.z + xz[1] * unit
+    yaw = atan2(x_knob-hmd.x, z_knob-hmd.z) / pi * 180 + 180
+    rot_knob = rotation_matrix(0, yaw, 0)
+    rot_stick = rotation_matrix(z_deg * (-1 if xz[1] < 0 else 1), 0, -x_deg * (-1 if xz[0] < 0 else 1))
+    y_knob = (shifter.y + shifter.stick_height -
+        (abs(xz[1])*((1-cos((z_deg)*pi/180))*shifter.stick_height)) -
+        (abs(xz[0])*((1-cos((x_deg)*pi/180))*shifter.stick_height)))
+
+    def rot_dot_tf(rot, t, local=None):
+        tf = np.eye(4)
+        tf[0:3, 3] = t
+        r = np.eye(4)
+        r[0:3, 0:3] = rot
+        d = np.dot(tf, r)
+        if local is not None:
+            r[0:3, 0:3] = local
+            d = np.dot(d, r)
+        return d[0:3]
+
+    knob = rot_dot_tf(rot_knob, (x_knob, y_knob, z_knob))
+    offset_stick = np.dot(rot_stick, (0, shifter.stick_height/2, 0))
+    scale_stick = np.eye(3)
+    scale_stick[2,2] = shifter.stick_scale
+    stick = rot_dot_tf(rot_stick, (x_stick + offset_stick[0], shifter.y + offset_stick[1], z_stick + offset_stick[2]),
+                       np.dot(scale_stick, rot_knob))
+    return knob, stick
+
+
+def bench_shifter(frames="100000"):
+    """H-shifter render: numpy transforms vs closed form into the overlay matrices, same output, and a still shifter"""
+    from types import SimpleNamespace
+    import openvr
+    from steam_vr_wheel.util import Point
+    from steam_vr_wheel._collision import Capsule
+    from steam_vr_wheel._wheel import HShifterImage
+
+    class BenchShifter(HShifterImage):
+        # Only what render touches; the overlay calls do nothing
+        def __init__(self):
+            self.vroverlay = SimpleNamespace(function_table=SimpleNamespace(setOverlayTransformAbsolute=lambda *a: 0))
+            self.slot, self.stick, self.knob = 1, 2, 3
+            self.slot_tf, self.stick_tf, self.knob_tf = (openvr.HmdMatrix34_t() for _ in range(3))
+            self.x, self.y, self.z = 0.25, -0.57, -0.15
+            self.size, self.stick_width, self.degree = 0.14, 0.02, 6.0
+            self.stick_scale = 0.8
+            self.stick_height = 633 / (40 / 0.02) * self.stick_scale
+            self.collider = Capsule(0.06)
+            self._knob_pos = [0, 0, 0]
+            self._xz = [0, 0]
+            self._render_key = None
+
+    n = int(frames)
+    rng = np.random.default_rng(0)
+    xzs = rng.uniform([-2, -1], [2, 1], (2000, 2)).tolist()
+    hmds = [Point(*v) for v in rng.uniform([-0.3, -0.1, -0.3], [0.3, 0.2, 0.3], (2000, 3))]
+
+    shifter = BenchShifter()
+    shifter.yaw_step = 1e-9 # as good as not stepped
+    worst = 0.0
+    for xz, hmd in zip(xzs, hmds):
+        shifter._xz = xz
+        shifter.render(hmd)
+        knob, stick = _legacy_shifter_render(shifter, hmd, xz)
+        worst = max(worst, np.max(np.abs(np.array(shifter.knob_tf.m) - knob)),
+                    np.max(np.abs(np.array(shifter.stick_tf.m) - stick)))
+    print("max matrix difference {:.2e} for {} frames".format(worst, len(xzs)))
+    assert worst < 1e-5
+
+    frames = list(zip(xzs, hmds)) * (n // len(xzs) + 1)
+    def step_legacy(it=iter(frames)):
+        xz, hmd = next(it)
+        _legacy_shifter_render(shifter, hmd, xz)
+    report("numpy render", rate(step_legacy, n), "frames/s")
+
+    shifter = BenchShifter()
+    def step_render(it=iter(frames)):
+        xz, hmd = next(it)
+        shifter._xz = xz
+        shifter.render(hmd)
+    report("closed form render", rate(step_render, n), "frames/s")
+
+    # Shifter left alone, the head moving a little
+    shifter._xz = [1, 1]
+    heads = [Point(0.01 * np.sin(k / 50), 0, 0.01 * np.cos(k / 50)) for k in range(n)]
+    def step_still(it=iter(heads)):
+        shifter.render(next(it))
+    report("still shifter render", rate(step_still, n), "frames/s")
+
+
+BENCHES = {
+    'vjoy': bench_vjoy,
+    'ffb': bench_ffb,
+    'ring': bench_ring,
+    'flood': bench_flood,
+    'wheelspace': bench_wheelspace,
+    'collision': bench_collision,
+    'grip': bench_grip,
+    'physics': bench_physics,
+    'speed': bench_speed,
+    'replay': bench_replay,
+    'haptic': bench_haptic,
+    'gates': bench_gates,
+    'shifter': bench_shifter,
+}
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHES:
+        for name, f in BENCHES.items():
+            print("{:<12}{}".format(name, f.__doc__))
+        return
+
+    BENCHES[sys.argv[1]](*sys.argv[2:])
+
+if __name__ == "__main__":
+    main()
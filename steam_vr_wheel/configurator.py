@@ -273,6 +273,36 @@ class ConfiguratorApp:
         pnl_joystick.Add(j_r_up_button); pnl_joystick.AddSpacer(6)
         pnl_joystick.Add(j_r_down_button)
 
+        nb_pnl_joystick.AddSpacer(PAD_xl)
+        pnl_pov_frame = HelperPanel(nb_pnl_joystick, FRAME_PAD, label=_I('cfg.pnl_pov_frame'))
+        nb_pnl_joystick.Add(pnl_pov_frame, flag=wx.EXPAND)
+
+        pnl_pov_frame.Add(HelperText(pnl_pov_frame, is_muted=True, label=_I('cfg.pnl_pov_frame_descr')))
+        pnl_pov_frame.AddSpacer(PAD_m)
+
+        pnl_j_l_pov = HelperPanel(pnl_pov_frame, vertical=False)
+        pnl_pov_frame.Add(pnl_j_l_pov, flag=wx.EXPAND)
+        pnl_pov_frame.AddSpacer(PAD_sm)
+        j_l_pov_off = wx.RadioButton(pnl_j_l_pov, name="Off", label=_I('L {cfg.pov_off}'), style=wx.RB_GROUP)
+        j_l_pov_cont = wx.RadioButton(pnl_j_l_pov, name="Continuous", label=_I('cfg.pov_cont'))
+        j_l_pov_8 = wx.RadioButton(pnl_j_l_pov, name="8-way", label=_I('cfg.pov_8'))
+        j_l_pov_4 = wx.RadioButton(pnl_j_l_pov, name="4-way", label=_I('cfg.pov_4'))
+        pnl_j_l_pov.Add(j_l_pov_off); pnl_j_l_pov.AddSpacer(6)
+        pnl_j_l_pov.Add(j_l_pov_cont); pnl_j_l_pov.AddSpacer(6)
+        pnl_j_l_pov.Add(j_l_pov_8); pnl_j_l_pov.AddSpacer(6)
+        pnl_j_l_pov.Add(j_l_pov_4)
+
+        pnl_j_r_pov = HelperPanel(pnl_pov_frame, vertical=False)
+        pnl_pov_frame.Add(pnl_j_r_pov, flag=wx.EXPAND)
+        j_r_pov_off = wx.RadioButton(pnl_j_r_pov, name="Off", label=_I('R {cfg.pov_off}'), style=wx.RB_GROUP)
+        j_r_pov_cont = wx.RadioButton(pnl_j_r_pov, name="Continuous", label=_I('cfg.pov_cont'))
+        j_r_pov_8 = wx.RadioButton(pnl_j_r_pov, name="8-way", label=_I('cfg.pov_8'))
+        j_r_pov_4 = wx.RadioButton(pnl_j_r_pov, name="4-way", label=_I('cfg.pov_4'))
+        pnl_j_r_pov.Add(j_r_pov_off); pnl_j_r_pov.AddSpacer(6)
+        pnl_j_r_pov.Add(j_r_pov_cont); pnl_j_r_pov.AddSpacer(6)
+        pnl_j_r_pov.Add(j_r_pov_8); pnl_j_r_pov.AddSpacer(6)
+        pnl_j_r_pov.Add(j_r_pov_4)
+
         nb_pnl_joystick.AddSpacer(PAD_xl)
         multibutton_trackpad_box = wx.CheckBox(nb_pnl_joystick, label=_I('cfg.multibutton_trackpad_box'))
         nb_pnl_joystick.Add(multibutton_trackpad_box)
@@ -291,6 +321,10 @@ class ConfiguratorApp:
         nb_pnl_wheel.Add(
             HelperText(nb_pnl_wheel, is_muted=True, label=_I('{cfg.wheel_degrees_descr}  ')),
             flag=wx.ALIGN_CENTER)
+        nb_pnl_wheel.AddSpacer(PAD_sm)
+
+        wheel_soft_lock = LabeledSpinCtrl(nb_pnl_wheel, name=_I('cfg.wheel_soft_lock'), max=180)
+        nb_pnl_wheel.Add(wheel_soft_lock, flag=wx.EXPAND)
         nb_pnl_wheel.AddSpacer(PAD_xl)
 
         wheel_pitch = LabeledSpinCtrl(nb_pnl_wheel, name=_I('cfg.wheel_pitch'), min=-30, max=120)
@@ -314,6 +348,28 @@ class ConfiguratorApp:
         wheel_centering.AddSpacer(PAD_lg)
         wheel_centering.Add(wheel_ffb)
         wheel_centering.Add(wheel_ffb_haptic)
+        wheel_centering.AddSpacer(PAD_lg)
+
+        wheel_centering.Add(HelperText(wheel_centering, is_muted=True, label=_I('cfg.wheel_physics_model')))
+        wheel_centering.AddSpacer(PAD_sm)
+        pnl_wheel_physics = HelperPanel(wheel_centering, vertical=False)
+        wheel_centering.Add(pnl_wheel_physics, flag=wx.EXPAND)
+        wheel_physics_kinematic = wx.RadioButton(pnl_wheel_physics, name="Kinematic", label=_I('cfg.wheel_physics_kinematic'), style=wx.RB_GROUP)
+        wheel_physics_torque = wx.RadioButton(pnl_wheel_physics, name="Torque", label=_I('cfg.wheel_physics_torque'))
+        pnl_wheel_physics.Add(wheel_physics_kinematic); pnl_wheel_physics.AddSpacer(6)
+        pnl_wheel_physics.Add(wheel_physics_torque)
+        wheel_centering.AddSpacer(PAD_lg)
+
+        wheel_centering.Add(HelperText(wheel_centering, is_muted=True, label=_I('cfg.wheel_speed_source')))
+        wheel_centering.AddSpacer(PAD_sm)
+        pnl_wheel_speed = HelperPanel(wheel_centering, vertical=False)
+        wheel_centering.Add(pnl_wheel_speed, flag=wx.EXPAND)
+        wheel_speed_off = wx.RadioButton(pnl_wheel_speed, name="Off", label=_I('cfg.wheel_speed_off'), style=wx.RB_GROUP)
+        wheel_speed_scs = wx.RadioButton(pnl_wheel_speed, name="SCS", label=_I('cfg.wheel_speed_scs'))
+        wheel_speed_ac = wx.RadioButton(pnl_wheel_speed, name="AC", label=_I('cfg.wheel_speed_ac'))
+        pnl_wheel_speed.Add(wheel_speed_off); pnl_wheel_speed.AddSpacer(6)
+        pnl_wheel_speed.Add(wheel_speed_scs); pnl_wheel_speed.AddSpacer(6)
+        pnl_wheel_speed.Add(wheel_speed_ac)
         nb_pnl_wheel.AddSpacer(PAD_xl)
 
         wheel_grab_behavior = HelperPanel(nb_pnl_wheel, FRAME_PAD, label=_I('cfg.wheel_grab_behavior'))
@@ -349,6 +405,14 @@ class ConfiguratorApp:
         nb_pnl_shifter.Add(shifter_sequential)
         nb_pnl_shifter.AddSpacer(PAD_xl)
 
+        shifter_layout = HelperPanel(nb_pnl_shifter, FRAME_PAD, vertical=False, label=_I('cfg.shifter_layout'))
+        nb_pnl_shifter.Add(shifter_layout, flag=wx.EXPAND)
+
+        # Filled from shifter_layouts when the config is read
+        self.shifter_layout_combo = wx.ComboBox(shifter_layout, style=wx.CB_READONLY, size=(160,24))
+        shifter_layout.Add(self.shifter_layout_combo)
+        nb_pnl_shifter.AddSpacer(PAD_xl)
+
         shifter_rev = HelperPanel(nb_pnl_shifter, FRAME_PAD, vertical=False, label=_I('cfg.shifter_rev'))
         nb_pnl_shifter.Add(shifter_rev, flag=wx.EXPAND)
 
@@ -466,14 +530,19 @@ class ConfiguratorApp:
         self.bind("j_r_up_button", j_r_up_button)
         self.bind("j_r_down_button", j_r_down_button)
         self.bind("axis_deadzone", axis_deadzone)
+        self.bind("j_l_pov", [j_l_pov_off, j_l_pov_cont, j_l_pov_8, j_l_pov_4])
+        self.bind("j_r_pov", [j_r_pov_off, j_r_pov_cont, j_r_pov_8, j_r_pov_4])
 
         # Wheel
         self.bind("wheel_grabbed_by_grip", wheel_grabbed_by_grip_box)
         self.bind("wheel_grabbed_by_grip_toggle", wheel_grabbed_by_grip_box_toggle)
         self.bind("wheel_degrees", wheel_degrees)
+        self.bind("wheel_soft_lock", wheel_soft_lock)
         self.bind("wheel_centerforce", wheel_centerforce)
         self.bind("wheel_ffb", wheel_ffb)
         self.bind("wheel_ffb_haptic", wheel_ffb_haptic)
+        self.bind("wheel_physics_model", [wheel_physics_kinematic, wheel_physics_torque])
+        self.bind("wheel_speed_source", [wheel_speed_off, wheel_speed_scs, wheel_speed_ac])
         self.bind("wheel_pitch", wheel_pitch)
         self.bind("wheel_alpha", wheel_alpha)
         self.bind("wheel_transparent_center", wheel_transparent_center_box)
@@ -483,6 +552,7 @@ class ConfiguratorApp:
         self.bind("shifter_alpha", shifter_alpha)
         self.bind("shifter_scale", shifter_scale)
         self.bind("shifter_sequential", shifter_sequential)
+        self.bind("shifter_layout", self.shifter_layout_combo)
         self.bind("shifter_reverse_orientation", [shifter_rev_tl, shifter_rev_tr, shifter_rev_bl, shifter_rev_br])
 
         # Bike
@@ -540,6 +610,8 @@ class ConfiguratorApp:
             ctrl.Bind(wx.EVT_CHECKBOX, self.config_change)
         elif isinstance(ctrl, wx.RadioBox):
             ctrl.Bind(wx.EVT_RADIOBOX, self.config_change)
+        elif isinstance(ctrl, wx.ComboBox):
+            ctrl.Bind(wx.EVT_COMBOBOX, self.config_change)
         else:
             raise ValueError("Control type not supported")
 
@@ -589,6 +661,13 @@ class ConfiguratorApp:
         else:
             self.profile_combo.SetSelection(wx.NOT_FOUND)
 
+        # Layouts added in the config are listed too, and one set but not found is
+        # kept rather than replaced by the first choice
+        layouts = [k for k in self.config.shifter_layouts if k != "Sequential"]
+        if self.config.shifter_layout not in layouts:
+            layouts.append(self.config.shifter_layout)
+        self.shifter_layout_combo.Set(layouts)
+
         #
         for key, item in self._config_map.items():
 
@@ -600,7 +679,7 @@ class ConfiguratorApp:
                             each.SetValue(True)
                         else:
                             each.SetValue(False)
-                elif type(item) is wx.RadioBox:
+                elif type(item) in (wx.RadioBox, wx.ComboBox):
                     item.SetSelection(item.FindString(getattr(self.config, key)))
                 else:
                     item.SetValue(getattr(self.config, key))
@@ -614,14 +693,15 @@ class ConfiguratorApp:
 
     def config_change(self, event):
         for key, item in self._config_map.items():
+            # A value none of the choices match is left as it is
             if isinstance(item, list):
-                value = ""
                 for each in item:
                     if each.GetValue():
-                        value = each.GetName()
-                setattr(self.config, key, value)
-            elif type(item) is wx.RadioBox:
-                setattr(self.config, key, item.GetString(item.GetSelection()))
+                        setattr(self.config, key, each.GetName())
+            elif type(item) in (wx.RadioBox, wx.ComboBox):
+                i = item.GetSelection()
+                if i != wx.NOT_FOUND:
+                    setattr(self.config, key, item.GetString(i))
             else:
                 setattr(self.config, key, item.GetValue())
 
@@ -287,6 +287,36 @@ LOCALE = {
         'ko': "선택된 조이스틱 방향은 버튼이 됩니다",
         'ja': "選択されたジョイスティックの方向はボタンとして機能します"
     },
+    'cfg.pnl_pov_frame': {
+        'en': "POV Hat",
+        'ko': "POV 햇",
+        'ja': "POVハット"
+    },
+    'cfg.pnl_pov_frame_descr': {
+        'en': "Joystick acts as a POV hat instead of axes and buttons",
+        'ko': "조이스틱이 축과 버튼 대신 POV 햇이 됩니다",
+        'ja': "ジョイスティックは軸とボタンの代わりにPOVハットとして機能します"
+    },
+    'cfg.pov_off': {
+        'en': "Off",
+        'ko': "끄기",
+        'ja': "オフ"
+    },
+    'cfg.pov_cont': {
+        'en': "Continuous",
+        'ko': "연속",
+        'ja': "連続"
+    },
+    'cfg.pov_8': {
+        'en': "8-way",
+        'ko': "8방향",
+        'ja': "8方向"
+    },
+    'cfg.pov_4': {
+        'en': "4-way",
+        'ko': "4방향",
+        'ja': "4方向"
+    },
     'cfg.multibutton_trackpad_box': {
         'en': "Joystick has 4 additional click regions",
         'ko': "조이스틱에 4개의 추가 클릭 영역을 할당",
@@ -315,6 +345,11 @@ LOCALE = {
         'ko': "360=F1 540-1080=랠리카 1440=기본 900-1800=트럭",
         'ja': "360=F1 540-1080=ラリーカー 1440=デフォルト 900-1800=トラック"
     },
+    'cfg.wheel_soft_lock': {
+        'en': "Soft Lock Zone (Degrees)",
+        'ko': "소프트 락 구간 (도)",
+        'ja': "ソフトロック範囲（度）"
+    },
     'cfg.wheel_pitch': {
         'en': "Wheel Tilt (Degrees)",
         'ko': "핸들 기울기 (도)",
@@ -350,6 +385,41 @@ LOCALE = {
         'ko': "고르지 않은 도로에서 포스 피드백 진동",
         'ja': "凹凸のある道でのフォースフィードバックハプティック"
     },
+    'cfg.wheel_physics_model': {
+        'en': "Wheel physics",
+        'ko': "핸들 물리",
+        'ja': "ハンドル物理"
+    },
+    'cfg.wheel_physics_kinematic': {
+        'en': "Hands set the angle",
+        'ko': "손이 각도를 결정",
+        'ja': "手が角度を決める"
+    },
+    'cfg.wheel_physics_torque': {
+        'en': "Torque (rim weight, friction and resistance)",
+        'ko': "토크 (림 무게, 마찰, 저항)",
+        'ja': "トルク（リムの重さ、摩擦、抵抗）"
+    },
+    'cfg.wheel_speed_source': {
+        'en': "Speed sensitive steering and centering from telemetry",
+        'ko': "텔레메트리 속도에 따른 조향 및 센터링",
+        'ja': "テレメトリーの速度に応じたステアリングとセンタリング"
+    },
+    'cfg.wheel_speed_off': {
+        'en': "Off",
+        'ko': "끄기",
+        'ja': "オフ"
+    },
+    'cfg.wheel_speed_scs': {
+        'en': "ETS2 / ATS",
+        'ko': "ETS2 / ATS",
+        'ja': "ETS2 / ATS"
+    },
+    'cfg.wheel_speed_ac': {
+        'en': "Assetto Corsa",
+        'ko': "어세토 코르사",
+        'ja': "アセットコルサ"
+    },
     'cfg.wheel_grab_behavior': {
         'en': "Grab Behavior",
         'ko': "잡기 방식",
@@ -395,6 +465,11 @@ LOCALE = {
         'ko': "시퀀셜 변속기 모드",
         'ja': "シーケンシャルモード"
     },
+    'cfg.shifter_layout': {
+        'en': "Gate Layout",
+        'ko': "기어 배치",
+        'ja': "ゲートレイアウト"
+    },
     'cfg.shifter_rev': {
         'en': "Reverse Gear Position",
         'ko': "후진 기어 위치",
@@ -1,6 +1,7 @@
 import os
 import sys
 from ctypes import *
+from time import perf_counter
 
 from .constants import *
 from .exceptions import *
@@ -14,6 +15,26 @@ except OSError:
     sys.exit("Unable to load vJoy SDK DLL.  Ensure that %s is present" % DLL_FILENAME)
 
 
+# Prototypes
+# cf https://github.com/jshafer817/vJoy/blob/v2.1.9.1/SDK/inc/vjoyinterface.h
+#
+# Setters take plain integers, which ctypes passes natively as C int when no
+# argtypes are declared. Declaring argtypes makes every call go through
+# from_param and measured about twice as slow (python -m steam_vr_wheel.bench vjoy),
+# so only restype is declared for them. Pointer arguments do get argtypes below,
+# otherwise 64 bit addresses would be truncated to int.
+for name in ["SetAxis", "SetBtn", "SetDiscPov", "SetContPov"]:
+    getattr(_vj, name).restype = wintypes.BOOL
+
+# Fast path
+# Cached function pointers with no validation and no exceptions
+# Pass ints only; they return the vJoy status as is, 0 meaning the call failed
+SetAxisRaw = _vj.SetAxis            # (value, rID, axis)
+SetBtnRaw = _vj.SetBtn              # (state, rID, button)
+SetDiscPovRaw = _vj.SetDiscPov      # (value, rID, pov)
+SetContPovRaw = _vj.SetContPov      # (value, rID, pov)
+
+
 def vJoyEnabled():
     """Returns True if vJoy is installed and enabled"""
 
@@ -114,15 +135,6 @@ def SetContPov(PovValue, rID, PovID):
 
 
 
-def SetBtn(state,rID,buttonID):
-    """Sets the state of vJoy Button to on or off.  SetBtn(state,rID,buttonID)"""
-    result = _vj.SetBtn(state,rID,buttonID)
-    if result == 0:
-        raise vJoyButtonError()
-    else:
-        return True
-
-
 def ResetVJD(rID):
     """Reset all axes and buttons to default for specified vJoy Device"""
     return _vj.ResetVJD(rID)
@@ -280,6 +292,27 @@ class FFB_EFF_ENVLP(Structure):
                 ("AttackTime", c_uint32), # DWORD
                 ("FadeTime", c_uint32)] # DWORD
 
+# FFB helpers take the packet as an address and write to the given out pointer
+_FFB_HELPERS = [
+    ("Ffb_h_DeviceID", POINTER(c_int)),
+    ("Ffb_h_Type", POINTER(c_int)),
+    ("Ffb_h_EBI", POINTER(c_int)),
+    ("Ffb_h_DevCtrl", POINTER(c_int)),
+    ("Ffb_h_EffNew", POINTER(c_int)),
+    ("Ffb_h_DevGain", POINTER(c_ubyte)),
+    ("Ffb_h_EffOp", POINTER(FFB_EFF_OP)),
+    ("Ffb_h_Eff_Report", POINTER(FFB_EFF_REPORT)),
+    ("Ffb_h_Eff_Constant", POINTER(FFB_EFF_CONSTANT)),
+    ("Ffb_h_Eff_Ramp", POINTER(FFB_EFF_RAMP)),
+    ("Ffb_h_Eff_Period", POINTER(FFB_EFF_PERIOD)),
+    ("Ffb_h_Eff_Cond", POINTER(FFB_EFF_COND)),
+    ("Ffb_h_Eff_Envlp", POINTER(FFB_EFF_ENVLP)),
+]
+for name, out_type in _FFB_HELPERS:
+    fn = getattr(_vj, name)
+    fn.argtypes = [c_void_p, out_type]
+    fn.restype = wintypes.DWORD
+
 def IsDeviceFfb(rID):
     return _vj.IsDeviceFfb(rID)
 
@@ -305,116 +338,388 @@ def debug_structure_hex(struct):
 
 FFB_GEN_CB = WINFUNCTYPE(None, c_void_p, c_void_p)
 
+# Packet types that carry no effect block index
+FFB_NO_EBI = (FFBPType.PT_CTRLREP, FFBPType.PT_SMPLREP, FFBPType.PT_GAINREP,
+              FFBPType.PT_POOLREP, FFBPType.PT_NEWEFREP)
+
+class FfbPacket:
+    """
+    Decoded FFB packet, flat so that reading it is an attribute access
+
+    DeviceID, Type and EBI are always set; EBI is None for FFB_NO_EBI types
+    The rest are only meaningful for the packet type they belong to:
+      PT_CTRLREP   DevCtrl
+      PT_NEWEFREP  EffNew
+      PT_GAINREP   Gain
+      PT_EFOPREP   EffectOp, LoopCount
+      PT_EFFREP    EffectType, Duration, TriggerRepeatInterval, SamplePeriod, EffGain,
+                   TriggerButton, Polar, Direction, DirX, DirY
+      PT_CONSTREP  Magnitude
+      PT_RAMPREP   Start, End
+      PT_PRIDREP   Magnitude, Offset, Phase, Period
+      PT_CONDREP   isY, CenterPointOffset, PosCoeff, NegCoeff, PosSatur, NegSatur, DeadBand
+      PT_ENVREP    AttackLevel, FadeLevel, AttackTime, FadeTime
+    """
+    __slots__ = (
+        'DeviceID', 'Type', 'EBI',
+        'DevCtrl', 'EffNew', 'Gain',
+        'EffectOp', 'LoopCount',
+        'EffectType', 'Duration', 'TriggerRepeatInterval', 'SamplePeriod', 'EffGain',
+        'TriggerButton', 'Polar', 'Direction', 'DirX', 'DirY',
+        'Magnitude', 'Start', 'End', 'Offset', 'Phase', 'Period',
+        'isY', 'CenterPointOffset', 'PosCoeff', 'NegCoeff', 'PosSatur', 'NegSatur', 'DeadBand',
+        'AttackLevel', 'FadeLevel', 'AttackTime', 'FadeTime')
+
+    def __init__(self):
+        for k in self.__slots__:
+            setattr(self, k, 0)
+        self.EBI = None
+        self.Polar = False
+
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class FfbDecoder:
+    """
+    Decodes FFB_DATA packets into one reused FfbPacket
+
+    Reads the type first and calls only the helper for it, writing into
+    structs allocated once; nothing is allocated per packet
+    decode() returns the record, or None if the packet could not be read
+    The record is overwritten by the next decode(), copy what you need out of it
+    """
+
+    def __init__(self):
+        self.packet = FfbPacket()
+
+        self._i = c_int()
+        self._b = c_ubyte()
+        self._op = FFB_EFF_OP()
+        self._report = FFB_EFF_REPORT()
+        self._cnst = FFB_EFF_CONSTANT()
+        self._ramp = FFB_EFF_RAMP()
+        self._prd = FFB_EFF_PERIOD()
+        self._cond = FFB_EFF_COND()
+        self._envlp = FFB_EFF_ENVLP()
+
+        self._i_ref = byref(self._i)
+        self._b_ref = byref(self._b)
+        self._op_ref = byref(self._op)
+        self._report_ref = byref(self._report)
+        self._cnst_ref = byref(self._cnst)
+        self._ramp_ref = byref(self._ramp)
+        self._prd_ref = byref(self._prd)
+        self._cond_ref = byref(self._cond)
+        self._envlp_ref = byref(self._envlp)
+
+        # Indexed by packet type
+        self._has_ebi = [t not in FFB_NO_EBI for t in range(0x20)]
+        self._decoders = [None] * 0x20
+        self._decoders[FFBPType.PT_CTRLREP] = self._decode_ctrl
+        self._decoders[FFBPType.PT_NEWEFREP] = self._decode_new
+        self._decoders[FFBPType.PT_GAINREP] = self._decode_gain
+        self._decoders[FFBPType.PT_EFOPREP] = self._decode_op
+        self._decoders[FFBPType.PT_EFFREP] = self._decode_report
+        self._decoders[FFBPType.PT_CONSTREP] = self._decode_constant
+        self._decoders[FFBPType.PT_RAMPREP] = self._decode_ramp
+        self._decoders[FFBPType.PT_PRIDREP] = self._decode_period
+        self._decoders[FFBPType.PT_CONDREP] = self._decode_cond
+        self._decoders[FFBPType.PT_ENVREP] = self._decode_envlp
+
+    def decode(self, data):
+        # data is the address of an FFB_DATA
+        # cf https://github.com/jshafer817/vJoy/blob/v2.1.9.1/apps/common/vJoyInterface.cpp
+        p = self.packet
+        i = self._i
+
+        if ERROR_SUCCESS != _vj.Ffb_h_DeviceID(data, self._i_ref):
+            return None
+        p.DeviceID = i.value
+
+        if ERROR_SUCCESS != _vj.Ffb_h_Type(data, self._i_ref):
+            return None
+        typ = i.value
+        p.Type = typ
+
+        if typ < 0 or typ >= 0x20:
+            p.EBI = None
+            return p
+
+        if self._has_ebi[typ] and ERROR_SUCCESS == _vj.Ffb_h_EBI(data, self._i_ref):
+            p.EBI = i.value
+        else:
+            p.EBI = None
+
+        decoder = self._decoders[typ]
+        if decoder is not None and not decoder(data, p):
+            return None
+        return p
+
+    def _decode_ctrl(self, data, p):
+        if ERROR_SUCCESS != _vj.Ffb_h_DevCtrl(data, self._i_ref):
+            return False
+        p.DevCtrl = self._i.value
+        return True
+
+    def _decode_new(self, data, p):
+        if ERROR_SUCCESS != _vj.Ffb_h_EffNew(data, self._i_ref):
+            return False
+        p.EffNew = self._i.value
+        return True
+
+    def _decode_gain(self, data, p):
+        if ERROR_SUCCESS != _vj.Ffb_h_DevGain(data, self._b_ref):
+            return False
+        p.Gain = self._b.value
+        return True
+
+    def _decode_op(self, data, p):
+        if ERROR_SUCCESS != _vj.Ffb_h_EffOp(data, self._op_ref):
+            return False
+        op = self._op
+        p.EffectOp = op.EffectOp
+        p.LoopCount = op.LoopCount
+        return True
+
+    def _decode_report(self, data, p):
+        if ERROR_SUCCESS != _vj.Ffb_h_Eff_Report(data, self._report_ref):
+            return False
+        effect = self._report
+        p.EffectType = effect.EffectType
+        p.Duration = effect.Duration # Value in milliseconds. 0xFFFF means infinite
+        p.TriggerRepeatInterval = effect.TrigerRpt
+        p.SamplePeriod = effect.SamplePrd
+        p.EffGain = effect.Gain
+        p.TriggerButton = effect.TrigerBtn
+        p.Polar = effect.Polar == 1
+        p.Direction = effect.Direction      # Polar direction: (0x00-0xFF correspond to 0-360°)
+        p.DirX = _twos_comp(effect.DirX, 8) # X direction: Positive values are To the right of the center (X); Negative are Two's complement
+        p.DirY = _twos_comp(effect.DirY, 8) # Y direction: Positive values are below the center (Y); Negative are Two's complement
+        return True
+
+    def _decode_constant(self, data, p):
+        if ERROR_SUCCESS != _vj.Ffb_h_Eff_Constant(data, self._cnst_ref):
+            return False
+        p.Magnitude = self._cnst.Magnitude
+        return True
+
+    def _decode_ramp(self, data, p):
+        if ERROR_SUCCESS != _vj.Ffb_h_Eff_Ramp(data, self._ramp_ref):
+            return False
+        ramp = self._ramp
+        p.Start = ramp.Start
+        p.End = ramp.End
+        return True
+
+    # cf https://learn.microsoft.com/en-us/previous-versions/windows/desktop/ee418719(v=vs.85)
+    def _decode_period(self, data, p):
+        if ERROR_SUCCESS != _vj.Ffb_h_Eff_Period(data, self._prd_ref):
+            return False
+        prd = self._prd
+        p.Magnitude = prd.Magnitude
+        p.Offset = prd.Offset
+        p.Phase = prd.Phase
+        p.Period = prd.Period
+        return True
+
+    def _decode_cond(self, data, p):
+        if ERROR_SUCCESS != _vj.Ffb_h_Eff_Cond(data, self._cond_ref):
+            return False
+        cond = self._cond
+        p.isY = cond.isY
+        p.CenterPointOffset = cond.CenterPointOffset
+        p.PosCoeff = cond.PosCoeff
+        p.NegCoeff = cond.NegCoeff
+        p.PosSatur = cond.PosSatur
+        p.NegSatur = cond.NegSatur
+        p.DeadBand = cond.DeadBand
+        return True
+
+    def _decode_envlp(self, data, p):
+        if ERROR_SUCCESS != _vj.Ffb_h_Eff_Envlp(data, self._envlp_ref):
+            return False
+        envlp = self._envlp
+        p.AttackLevel = envlp.AttackLevel
+        p.FadeLevel = envlp.FadeLevel
+        p.AttackTime = envlp.AttackTime
+        p.FadeTime = envlp.FadeTime
+        return True
+
+
 class FfbGenCB:
 
     def __init__(self, pyfunc):
+        # pyfunc(FfbPacket); the record is reused for every packet
         self.pyfunc = pyfunc
+        self.decoder = FfbDecoder()
+        decode = self.decoder.decode
         def f(data, userData):
-            # cf https://github.com/jshafer817/vJoy/blob/v2.1.9.1/apps/common/vJoyInterface.cpp
-            fData = cast(data, POINTER(FFB_DATA))
-
-            pydata = dict()
-
-            i = c_int()
-            b = c_ubyte()
-            op = FFB_EFF_OP()
-            effect = FFB_EFF_REPORT()
-            cnst = FFB_EFF_CONSTANT()
-            prd = FFB_EFF_PERIOD()
-
-            if ERROR_SUCCESS == _vj.Ffb_h_DeviceID(fData, byref(i)):
-                pydata['DeviceID'] = i.value
-
-            if ERROR_SUCCESS == _vj.Ffb_h_Type(fData, byref(i)):
-                pydata['Type'] = i.value
-
-            if ERROR_SUCCESS == _vj.Ffb_h_EBI(fData, byref(i)):
-                # This guarantees
-                # Ffb_h_Type(Packet, &Type) == ERROR_SUCCESS
-                # false == (Type == PT_CTRLREP || Type == PT_SMPLREP || Type == PT_GAINREP || 
-                #           Type == PT_POOLREP || Type == PT_NEWEFREP)
-                pydata['EBI'] = i.value
-
-            # From here they are all mutually exclusive conditions
-
-            if ERROR_SUCCESS == _vj.Ffb_h_DevCtrl(fData, byref(i)):
-                # This guarantees
-                # Ffb_h_Type(Packet, &Type) == ERROR_SUCCESS
-                # Type == PT_CTRLREP
-                pydata['DevCtrl'] = i.value
-
-            elif ERROR_SUCCESS == _vj.Ffb_h_EffNew(fData, byref(i)):
-                # This guarantees
-                # Ffb_h_Type(Packet, &Type) == ERROR_SUCCESS
-                # Type == PT_NEWEFREP
-                pydata['EffNew'] = i.value
-
-            elif ERROR_SUCCESS == _vj.Ffb_h_DevGain(fData, byref(b)):
-                # This guarantees
-                # Ffb_h_Type(Packet, &Type) == ERROR_SUCCESS
-                # Type == PT_GAINREP
-                pydata['Gain'] = b.value
-
-            elif ERROR_SUCCESS == _vj.Ffb_h_EffOp(fData, byref(op)):
-                # This guarantees
-                # Ffb_h_Type(Packet, &Type) == ERROR_SUCCESS
-                # Type == PT_EFOPREP
-                pydata['EffOp'] = dict({
-                    # EBI is not set here use pydata['EBI'] for shorthand
-                    "EffectOp": op.EffectOp,
-                    "LoopCount": op.LoopCount,
-                    })
-
-            elif ERROR_SUCCESS == _vj.Ffb_h_Eff_Report(fData, byref(effect)):
-                # This guarantees
-                # Ffb_h_Type(Packet, &Type) == ERROR_SUCCESS
-                # Type == PT_EFFREP
-                pydata['Eff_Report'] = dict({
-                    # EBI is not set here use pydata['EBI'] for shorthand
-                    "EffectType": effect.EffectType,
-                    "Duration": effect.Duration, # Value in milliseconds. 0xFFFF means infinite
-                    "TriggerRepeatInterval": effect.TrigerRpt,
-                    "SamplePeriod": effect.SamplePrd,
-                    "Gain": effect.Gain,
-                    "TriggerButton": effect.TrigerBtn,
-                    "Polar": True if effect.Polar == 1 else False, 
-                    "Direction": effect.Direction,      # Polar direction: (0x00-0xFF correspond to 0-360°)
-                    "DirX": _twos_comp(effect.DirX, 8), # X direction: Positive values are To the right of the center (X); Negative are Two's complement
-                    "DirY": _twos_comp(effect.DirY, 8), # Y direction: Positive values are below the center (Y); Negative are Two's complement
-                    })
-                #debug_structure_hex(effect)
-
-            # TODO Ffb_h_Eff_Cond
-            # TODO Ffb_h_Eff_Ramp
-
-            elif ERROR_SUCCESS == _vj.Ffb_h_Eff_Constant(fData, byref(cnst)):
-                # This guarantees
-                # Ffb_h_Type(Packet, &Type) == ERROR_SUCCESS
-                # Type == PT_CONSTREP
-                pydata['Eff_Constant'] = dict({
-                    # EBI is not set here use pydata['EBI'] for shorthand
-                    "Magnitude": cnst.Magnitude
-                    })
-                #debug_structure_hex(cnst)
-
-            # cf https://learn.microsoft.com/en-us/previous-versions/windows/desktop/ee418719(v=vs.85)
-            elif ERROR_SUCCESS == _vj.Ffb_h_Eff_Period(fData, byref(prd)):
-                # This guarantees
-                # Ffb_h_Type(Packet, &Type) == ERROR_SUCCESS
-                # Type == PT_PRIDREP
-                pydata['Eff_Period'] = dict({
-                    # EBI is not set here use pydata['EBI'] for shorthand
-                    "Magnitude": prd.Magnitude,
-                    "Offset": prd.Offset,
-                    "Phase": prd.Phase,
-                    "Period": prd.Period
-                    })
-
-            self.pyfunc(pydata)
+            packet = decode(data)
+            if packet is not None:
+                pyfunc(packet)
         self.cfunc = FFB_GEN_CB(f)
 
 
 def FfbRegisterGenCB(pyfunc):
     cb = FfbGenCB(pyfunc)
     _vj.FfbRegisterGenCB(cb.cfunc, None)
-    return cb
\ No newline at end of file
+    return cb
+
+
+class _FFB_DATA_HEADER(Structure):
+    # FFB_DATA with the data pointer read as a plain address
+    _fields_ = [("size", c_uint32),
+                ("cmd", c_uint32),
+                ("data", c_void_p)]
+
+FFB_PACKET_MAX = 64 # bytes; larger packets are truncated
+
+# Write reports that only set parameters of one effect block (the EBI in data[1]),
+# so that a later one of the same type replaces them
+_COALESCE_EBI = (FFBPType.PT_EFFREP, FFBPType.PT_ENVREP, FFBPType.PT_PRIDREP,
+                 FFBPType.PT_CONSTREP, FFBPType.PT_RAMPREP, FFBPType.PT_EFOPREP)
+
+class FfbPacketRing:
+    """
+    Single producer, single consumer ring of raw FFB packets
+
+    push() runs on the vJoy driver thread and only copies the packet bytes into
+    a preallocated slot with a perf_counter timestamp; it never blocks and counts
+    a drop when the ring is full
+    drain() runs on the consumer thread and hands each queued packet over as the
+    address of an FFB_DATA, valid until drain() returns, so FfbDecoder can read it
+    With coalesce on, drain() skips parameter and operation reports that a later
+    report of the same kind for the same effect block replaces, as long as no
+    other report comes in between; coalesced counts them. push() works out the
+    kind so that drain() only compares keys
+
+    Each index is written by one side only and the GIL orders the writes
+    """
+
+    def __init__(self, capacity=256):
+        assert capacity & (capacity - 1) == 0, "capacity must be a power of two"
+        self.capacity = capacity
+        self._mask = capacity - 1
+
+        self._bufs = (c_ubyte * (FFB_PACKET_MAX * capacity))()
+        self._raw = memoryview(self._bufs).cast('B')
+        buf_base = addressof(self._bufs)
+        self._buf_addresses = [buf_base + i * FFB_PACKET_MAX for i in range(capacity)]
+
+        # The list holds views into the array so push() does not create them per packet
+        self._slot_array = (FFB_DATA * capacity)()
+        self._slots = list(self._slot_array)
+        self._slot_addresses = [addressof(s) for s in self._slots]
+        for i, slot in enumerate(self._slots):
+            slot.data = cast(self._buf_addresses[i], POINTER(c_ubyte))
+
+        self._times = [0.0] * capacity
+        self._header = _FFB_DATA_HEADER()
+        self._header_address = addressof(self._header)
+        self._header_size = sizeof(_FFB_DATA_HEADER)
+
+        self._head = 0 # written by push only
+        self._tail = 0 # written by drain only
+        self.dropped = 0
+        self.truncated = 0
+        self.coalesced = 0
+        self._keys = [None] * capacity
+        self._skip = set()
+
+    def push(self, data, t=None):
+        # t defaults to now, as time.perf_counter()
+        head = self._head
+        if head - self._tail > self._mask or not data:
+            self.dropped += 1
+            return
+
+        i = head & self._mask
+        header = self._header
+        memmove(self._header_address, data, self._header_size)
+        src = header.data
+        if not src:
+            self.dropped += 1
+            return
+        size = header.size
+        if size > FFB_PACKET_MAX:
+            size = FFB_PACKET_MAX
+            self.truncated += 1
+
+        slot = self._slots[i]
+        slot.size = size
+        slot.cmd = cmd = header.cmd
+        memmove(self._buf_addresses[i], src, size)
+        self._keys[i] = self._coalesce_key(i, cmd, size)
+        self._times[i] = perf_counter() if t is None else t
+
+        self._head = head + 1
+
+    def _coalesce_key(self, i, cmd, size):
+        # None for reports that cannot be skipped nor skipped over
+        if cmd != IOCTL_HID_WRITE_REPORT or size < 3:
+            return None
+        raw = self._raw
+        base = i * FFB_PACKET_MAX
+        head = raw[base] # device and report ids
+        typ = head & 0x0F
+        if typ in _COALESCE_EBI:
+            # A solo start also stops the other effects
+            if typ == FFBPType.PT_EFOPREP and raw[base + 2] == FFBOP.EFF_SOLO:
+                return None
+            return (head << 8) | raw[base + 1]
+        if typ == FFBPType.PT_CONDREP:
+            # One per axis
+            return (head << 16) | (raw[base + 1] << 8) | raw[base + 2]
+        if typ == FFBPType.PT_GAINREP:
+            return head << 8
+        return None
+
+    def _coalesce(self, tail, head):
+        # Walks back from the newest packet; a key seen later since the last barrier is replaced
+        skip = self._skip
+        skip.clear()
+        seen = set()
+        mask = self._mask
+        keys = self._keys
+        for k in range(head - 1, tail - 1, -1):
+            kk = keys[k & mask]
+            if kk is None:
+                seen.clear()
+            elif kk in seen:
+                skip.add(k)
+            else:
+                seen.add(kk)
+        self.coalesced += len(skip)
+        return skip
+
+    def drain(self, f, coalesce=False):
+        # f(address, t) for every queued packet in order; returns how many
+        tail = self._tail
+        head = self._head
+        mask = self._mask
+        slot_addresses = self._slot_addresses
+        times = self._times
+        if coalesce and head - tail > 1 and self._coalesce(tail, head):
+            skip = self._skip
+            for k in range(tail, head):
+                if k not in skip:
+                    i = k & mask
+                    f(slot_addresses[i], times[i])
+        else:
+            for k in range(tail, head):
+                i = k & mask
+                f(slot_addresses[i], times[i])
+        self._tail = head
+        return head - tail
+
+    def __len__(self):
+        return self._head - self._tail
+
+
+def FfbRegisterGenRawCB(pyfunc):
+    # pyfunc(address of FFB_DATA) is called on the driver thread as is
+    # Keep the returned object alive for as long as the callback is registered
+    cfunc = FFB_GEN_CB(lambda data, userData: pyfunc(data))
+    _vj.FfbRegisterGenCB(cfunc, None)
+    return cfunc
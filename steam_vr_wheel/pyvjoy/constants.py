@@ -28,6 +28,10 @@ VJD_STAT_UNKN = 4 	# Unknown
 # FFB
 ERROR_SUCCESS = 0x0
 ERROR_INVALID_PARAMETER = 0x57
+
+# FFB_DATA.cmd; feature reports have their packet type offset by 0x10
+IOCTL_HID_WRITE_REPORT = 0x000B000F
+IOCTL_HID_SET_FEATURE = 0x000B0191
 ERROR_INVALID_DATA = 0xd
 
 ## HID Descriptor definitions - FFB Effects
@@ -64,19 +68,19 @@ HID_ID_POOLREP = 0x03 # Usage PID Pool Report
 
 # https://github.com/jshafer817/vJoy/blob/v2.1.9.1/apps/common/vJoyInterfaceCS/vJoyInterfaceWrap/Wrapper.cs#L57
 class FFBEType:
-	ET_NONE		=	0,	  # No Force
-	ET_CONST	=	1,    # Constant Force
-	ET_RAMP		=	2,    # Ramp
-	ET_SQR		=	3,    # Square
-	ET_SINE		=	4,    # Sine
-	ET_TRNGL	=	5,    # Triangle
-	ET_STUP		=	6,    # Sawtooth Up
-	ET_STDN		=	7,    # Sawtooth Down
-	ET_SPRNG	=	8,    # Spring
-	ET_DMPR		=	9,    # Damper
-	ET_INRT		=	10,   # Inertia
-	ET_FRCTN	=	11,   # Friction
-	ET_CSTM		=	12,   # Custom Force Data
+	ET_NONE		=	0	  # No Force
+	ET_CONST	=	1    # Constant Force
+	ET_RAMP		=	2    # Ramp
+	ET_SQR		=	3    # Square
+	ET_SINE		=	4    # Sine
+	ET_TRNGL	=	5    # Triangle
+	ET_STUP		=	6    # Sawtooth Up
+	ET_STDN		=	7    # Sawtooth Down
+	ET_SPRNG	=	8    # Spring
+	ET_DMPR		=	9    # Damper
+	ET_INRT		=	10   # Inertia
+	ET_FRCTN	=	11   # Friction
+	ET_CSTM		=	12   # Custom Force Data
 
 class FFBPType:
 	# Write
@@ -8,8 +8,12 @@ import steam_vr_wheel.pyvjoy._sdk as _sdk
 class VJoyDevice(object):
 	"""Object-oriented API for a vJoy Device"""
 
-	def __init__(self,rID=None, data=None):
-		"""Constructor"""
+	def __init__(self,rID=None, data=None, raise_errors=True):
+		"""Constructor
+
+		raise_errors=False swaps set_button, set_axis and the POV setters for
+		the bound prototypes; they return the vJoy status (0 on failure) instead of raising
+		"""
 
 		self.rID=rID
 		self._sdk= _sdk
@@ -29,6 +33,14 @@ class VJoyDevice(object):
 		except vJoyException:
 			raise
 
+		if not raise_errors:
+			SetBtnRaw, SetAxisRaw = _sdk.SetBtnRaw, _sdk.SetAxisRaw
+			SetDiscPovRaw, SetContPovRaw = _sdk.SetDiscPovRaw, _sdk.SetContPovRaw
+			self.set_button = lambda buttonID, state: SetBtnRaw(state, rID, buttonID)
+			self.set_axis = lambda AxisID, AxisValue: SetAxisRaw(AxisValue, rID, AxisID)
+			self.set_disc_pov = lambda PovID, PovValue: SetDiscPovRaw(PovValue, rID, PovID)
+			self.set_cont_pov = lambda PovID, PovValue: SetContPovRaw(PovValue, rID, PovID)
+
 			
 	def set_button(self,buttonID,state):
 		"""Set a given button (numbered from 1) to On (1 or True) or Off (0 or False)"""
@@ -38,6 +50,16 @@ class VJoyDevice(object):
 	def set_axis(self,AxisID, AxisValue):
 		"""Set a given Axis (one of pyvjoy.HID_USAGE_X etc) to a value (0x0000 - 0x8000)"""
 		return self._sdk.SetAxis(AxisValue,self.rID,AxisID)
+
+
+	def set_disc_pov(self,PovID, PovValue):
+		"""Set a given discrete POV (numbered from 1) to a direction (0 - 3, north first) or neutral (-1)"""
+		return self._sdk.SetDiscPov(PovValue,self.rID,PovID)
+
+
+	def set_cont_pov(self,PovID, PovValue):
+		"""Set a given continuous POV (numbered from 1) to hundredths of a degree (0 - 35999) or neutral (-1)"""
+		return self._sdk.SetContPov(PovValue,self.rID,PovID)
 		
 		
 	def reset(self):
@@ -70,13 +92,18 @@ class VJoyDevice(object):
 		return self._sdk.IsDeviceFfb(self.rID)
 
 	def ffb_callback(self, cb):
-		def wrapped(data):
-			if not "DeviceID" in data:
+		rID = self.rID
+		def wrapped(packet):
+			if packet.DeviceID != rID:
 				return
-			if data["DeviceID"] != self.rID:
-				return
-			cb(data)
+			cb(packet)
 		self._cb = wrapped
-		self._ffb_gen_cb = self._sdk.FfbRegisterGenCB(self._cb) # func(dict)
+		self._ffb_gen_cb = self._sdk.FfbRegisterGenCB(self._cb) # func(FfbPacket)
+
+	def ffb_queue(self, ring):
+		"""Have the driver thread copy raw FFB packets into an FfbPacketRing
+		Drain and decode them on another thread; packets of other devices are not filtered here"""
+		self._ffb_ring = ring
+		self._ffb_gen_cb = self._sdk.FfbRegisterGenRawCB(ring.push)
 
 	
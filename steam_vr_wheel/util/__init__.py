@@ -1,4 +1,5 @@
 
 from .math import *
 from .misc import *
-from .openvr import *
\ No newline at end of file
+from .openvr import *
+from .curve import *
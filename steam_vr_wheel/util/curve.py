@@ -0,0 +1,114 @@
+import numpy as np
+
+CURVE_LUT_SIZE = 0x4000 # steps per unit of input; half of the vJoy axis resolution
+
+
+def vjoy_centered(y):
+    # -1..1 to a vJoy axis value with 0 at the center
+    return int((y + 1) / 2 * 0x8000)
+
+def vjoy_magnitude(y):
+    # -1..1 or 0..1 to a vJoy axis value with 0 at rest
+    return int(abs(y) * 0x8000)
+
+
+class AxisCurve:
+    """
+    Response curve baked into a lookup table so that sampling is a single indexed read
+
+    deadzone   : input below this ratio maps to 0
+    saturation : input at or above this ratio maps to full output
+    gamma      : exponent applied between deadzone and saturation
+    bezier     : [x1, y1, x2, y2], inner control points of a cubic from (0, 0) to (1, 1)
+                 used instead of gamma when given
+    smoothing  : 0 disables it, values towards 1 smooth more (exponential moving average per sample)
+    symmetric  : input is -1..1 and the curve is mirrored, otherwise input is 0..1
+    out        : maps the shaped value before it is stored in the table
+    """
+
+    def __init__(self, deadzone=0.0, saturation=1.0, gamma=1.0, bezier=None, smoothing=0.0,
+                 symmetric=True, out=None, size=CURVE_LUT_SIZE):
+
+        deadzone = min(max(0.0, deadzone), 1.0)
+        saturation = min(max(deadzone, saturation), 1.0)
+
+        m = np.linspace(0.0, 1.0, size + 1)
+        if saturation - deadzone > 0:
+            t = np.clip((m - deadzone) / (saturation - deadzone), 0.0, 1.0)
+        else:
+            t = (m > deadzone).astype(float)
+
+        if bezier:
+            x1, y1, x2, y2 = [min(max(0.0, float(v)), 1.0) for v in bezier]
+            s = np.linspace(0.0, 1.0, 1025)
+            bx = 3*(1-s)**2*s*x1 + 3*(1-s)*s**2*x2 + s**3
+            by = 3*(1-s)**2*s*y1 + 3*(1-s)*s**2*y2 + s**3
+            y = np.interp(t, bx, by)
+        else:
+            y = t ** max(0.01, gamma)
+
+        if symmetric:
+            y = np.concatenate([-y[:0:-1], y])
+
+        if out is None:
+            self._lut = y.tolist()
+        else:
+            self._lut = [out(v) for v in y.tolist()]
+
+        self._scale = size
+        self._offset = size + 0.5 if symmetric else 0.5
+        self._max = len(self._lut) - 1
+
+        self._alpha = 1.0 - min(max(0.0, smoothing), 0.99)
+        self._smooth = self._alpha < 1.0
+        self._state = 0.0
+
+    @classmethod
+    def from_config(cls, cfg, deadzone=0, **kwargs):
+        # cfg is a dict from config; ratios are stored as percents there
+        return cls(deadzone=cfg.get('deadzone', deadzone) / 100,
+                   saturation=cfg.get('saturation', 100) / 100,
+                   gamma=cfg.get('gamma', 1.0),
+                   bezier=cfg.get('bezier'),
+                   smoothing=cfg.get('smoothing', 0) / 100,
+                   **kwargs)
+
+    def sample(self, v):
+        if self._smooth:
+            self._state += self._alpha * (v - self._state)
+            v = self._state
+
+        i = int(v * self._scale + self._offset)
+        if i < 0:
+            i = 0
+        elif i > self._max:
+            i = self._max
+        return self._lut[i]
+
+    def reset(self, v=0.0):
+        self._state = v
+
+
+SPEED_LUT_MAX = 400 # km/h covered by SpeedCurve, faster samples the last entry
+
+
+class SpeedCurve:
+    """
+    Value against vehicle speed baked into a lookup table with one entry per km/h
+
+    points : [[km/h, value], ...], linear in between and flat past either end
+    scale  : multiplies the values before they are stored in the table
+    """
+
+    def __init__(self, points, scale=1.0, max_speed=SPEED_LUT_MAX):
+        points = sorted(points)
+        speeds = [float(p[0]) for p in points]
+        values = [float(p[1]) * scale for p in points]
+        self._lut = np.interp(np.arange(max_speed + 1), speeds, values).tolist()
+        self._max = max_speed
+
+    def sample(self, kmh):
+        i = int(abs(kmh) + 0.5)
+        if i > self._max:
+            i = self._max
+        return self._lut[i]
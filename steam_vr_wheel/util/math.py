@@ -1,4 +1,7 @@
 
+from collections import deque
+from math import atan2, cos, sin, sqrt
+
 import numpy as np
 
 def clamp(x, m, M):
@@ -46,7 +49,19 @@ def rotation_matrix(theta1, theta2, theta3):
     return np.array([[c2*c3, -c2*s3, s2],
                          [c1*s3+c3*s1*s2, c1*c3-s1*s2*s3, -c2*s1],
                          [s1*s3-c1*c3*s2, c3*s1+c1*s2*s3, c1*c2]])
-                         
+
+def rotate_about_x(point, center, c, s, out=None):
+    # point rotated about the x axis through center by the angle with cosine c and sine s,
+    # rotation_matrix(angle, 0, 0) written out; out is a Point to reuse
+    dy = point.y - center.y
+    dz = point.z - center.z
+    y = c * dy - s * dz + center.y
+    z = s * dy + c * dz + center.z
+    if out is None:
+        return Point(point.x, y, z)
+    out.x, out.y, out.z = point.x, y, z
+    return out
+
 def rotation_matrix_around_vec(theta, vec):
     theta = theta * np.pi / 180
     m = sqrt(vec[0]**2 + vec[1]**2 + vec[2]**2)
@@ -57,4 +72,117 @@ def rotation_matrix_around_vec(theta, vec):
 
     return np.array([[c+ux**2*(1-c), ux*uy*(1-c)-uz*s, ux*uz*(1-c)+uy*s],
                     [uy*ux*(1-c)+uz*s, c+uy**2*(1-c), uy*uz*(1-c)-ux*s],
-                    [uz*ux*(1-c)-uy*s, uz*uy*(1-c)+ux*s, c+uz**2*(1-c)]])
\ No newline at end of file
+                    [uz*ux*(1-c)-uy*s, uz*uy*(1-c)+ux*s, c+uz**2*(1-c)]])
+
+class RotationFit:
+    """
+    Turn of a ring about its center fitted to the hands holding it
+
+    Each hand's grip on the ring is the weighted mean of its last samples, turned back
+    by the angle fitted when they were taken; the angle moves by the weighted least
+    squares (2D Procrustes) turn taking the grips to where the hands are now. A hand
+    taking hold or letting go only adds or drops its own term, so the angle carries on
+    without a jump. The grips are kept as running sums
+
+    That turn still carries the noise of the hands this frame, so angle is the end of
+    the straight line fitted to the last samples turns: a wheel turned steadily is
+    followed without lag while the noise from frame to frame drops, at a cost of
+    samples multiplications a frame
+
+    samples : kept per hand
+    radius  : of the ring, hands are weighted 1 / (1 + ((r - radius) / width)**2)
+              by their distance r from the center
+    center  : distance from the center within which the hands turn the ring less and less
+    """
+
+    def __init__(self, samples=8, radius=0.24, width=0.05, center=0.08):
+        self.angle = 0.0
+        self.samples = max(1, samples)
+        self.width = width
+        self.center = center
+        self.resize(radius)
+        self._grips = [deque(), deque()]
+        self._sums = [[0.0, 0.0, 0.0], [0.0, 0.0, 0.0]]
+
+        # Least squares line through the last m turns, evaluated at the newest:
+        # weight of each turn, oldest first, for every m up to samples
+        self._turn = 0.0
+        self._turns = deque(maxlen=self.samples)
+        self._line = [[1.0]]
+        for m in range(2, self.samples + 1):
+            mean = (m - 1) / 2
+            sxx = m * (m*m - 1) / 12
+            self._line.append([1/m + (m - 1 - mean) * (j - mean) / sxx for j in range(m)])
+
+    def resize(self, radius):
+        self.radius = radius
+        self._min_lever = self.weight(self.center) * self.center**2
+
+    def weight(self, r):
+        return 1 / (1 + ((r - self.radius) / self.width)**2)
+
+    def reset(self, angle):
+        self.angle = angle
+        self._turn = angle
+        self._turns.clear()
+        for h in range(len(self._grips)):
+            self._drop(h)
+
+    def _drop(self, h):
+        self._grips[h].clear()
+        self._sums[h] = [0.0, 0.0, 0.0]
+
+    def update(self, points):
+        """
+        points : (x, y) of each hand from the center in the plane of the ring, None for a hand off it
+        Returns the new angle
+        """
+        c, s = cos(self._turn), sin(self._turn)
+        cross = dot = 0.0
+        weights = [0.0, 0.0]
+        for h, p in enumerate(points):
+            if p is None:
+                if self._grips[h]:
+                    self._drop(h)
+                continue
+            x, y = p
+            w = weights[h] = self.weight(sqrt(x*x + y*y))
+            sx, sy, sw = self._sums[h]
+            if sw <= 0:
+                continue # A new hand's first sample is where the ring is now
+            gx, gy = sx / sw, sy / sw
+            gx, gy = c*gx - s*gy, s*gx + c*gy
+            cross += w * (gx*y - gy*x)
+            dot += w * (gx*x + gy*y)
+
+        lever = sqrt(cross*cross + dot*dot)
+        if lever > 0:
+            d = atan2(cross, dot)
+            if lever < self._min_lever:
+                d *= (lever / self._min_lever)**2
+            self._turn += d
+            c, s = cos(self._turn), sin(self._turn)
+
+        # Samples go in turned back into the ring's frame
+        for h, p in enumerate(points):
+            if p is None:
+                continue
+            x, y = p
+            w = weights[h]
+            grips = self._grips[h]
+            sums = self._sums[h]
+            if len(grips) == self.samples:
+                ox, oy, ow = grips.popleft()
+                sums[0] -= ox
+                sums[1] -= oy
+                sums[2] -= ow
+            q = (w * (c*x + s*y), w * (c*y - s*x), w)
+            grips.append(q)
+            sums[0] += q[0]
+            sums[1] += q[1]
+            sums[2] += q[2]
+
+        turns = self._turns
+        turns.append(self._turn)
+        self.angle = sum(w * a for w, a in zip(self._line[len(turns) - 1], turns))
+        return self.angle